@@ -1,13 +1,33 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, session, has_request_context, Response
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+from werkzeug.datastructures import MultiDict
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
-import io
-from datetime import datetime
-import pandas as pd
-import unicodedata
-from sqlalchemy import extract, inspect
+import math
+import click
+import hashlib
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta
+from sqlalchemy import Integer, bindparam, cast, extract, inspect, insert, text, update
+from importacion import CAMPOS_TABLA, leer_excel_por_bloques
+from persistencia import escribir_notificados
+from resumen import comparar_resumen, reconstruir_resumen, registrar_borrado, registrar_cambios
+from estadisticas import DIMENSIONES, contar_notificados, pivotar
+from proyeccion import DESGLOSES as DESGLOSES_PROYECCION, HORIZONTE, HORIZONTE_MAXIMO, ajustar_modelos, pronosticar
+from busqueda import LIMITE_PAGINA, fila_json, pagina_notificados, total_filtrado
+from cache import crear_cache
+from texto import eliminar_indice_texto, instalar_indice_texto, rellenar_texto_busqueda, texto_busqueda
+from duplicados import COLUMNAS as COLUMNAS_REVISION, ESTADOS as ESTADOS_REVISION, detectar_duplicados
+from identidad import CacheIdentidad, copia_usuario
+from metricas import Metricas
+from trabajos import (EjecutorTrabajos, FALLIDO, TERMINADO, abandonado, actualizar_trabajo, crear_trabajo,
+                      marcar_abandonados, obtener_trabajo, porcentaje, purgar_trabajos_vencidos)
+from exportacion import FORMATOS, generar_reporte
+from mantenimiento import (COLUMNAS_ARCHIVO, DESTINOS as DESTINOS_ARCHIVO, MODOS as MODOS_MANTENIMIENTO,
+                           ArchivoParquet, mantener_notificados, parquet_disponible, simular, validar)
+from filtros import FILTROS_EJEMPLO, condiciones_filtros, leer_filtros, plan_consulta, usa_indice
 
 # --- CONFIGURACIÓN DE LA APP ---
 # Se le indica a Flask que busque los templates en el directorio actual ('.')
@@ -27,6 +47,34 @@ if database_url and database_url.startswith("postgres://"):
 
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Filas por transacción al guardar un padrón en la base de datos
+app.config['GUARDAR_TAM_BLOQUE'] = int(os.environ.get('GUARDAR_TAM_BLOQUE', 1000))
+# Caché de conteos y totales: 'sqlite' (archivo compartido entre los workers de gunicorn y los
+# comandos flask, que ven cada escritura al instante) o 'memoria' (un solo proceso)
+app.config['CACHE_RESULTADOS'] = os.environ.get('CACHE_RESULTADOS', 'sqlite')
+# Un archivo por base de datos: la versión guardada en él solo vale para esa base
+app.config['CACHE_RUTA'] = os.environ.get('CACHE_RUTA', os.path.join(
+    tempfile.gettempdir(), f"cache_resultados_{hashlib.sha1(database_url.encode()).hexdigest()[:12]}.db"))
+app.config['CACHE_TAM_MAXIMO'] = int(os.environ.get('CACHE_TAM_MAXIMO', 512))
+# Vida de cada resultado en 'memoria': retraso máximo con que un worker ve lo que escribió otro proceso
+app.config['CACHE_SEGUNDOS'] = int(os.environ.get('CACHE_SEGUNDOS', 60))
+# Identidad del usuario logueado: segundos que vale la copia y si también se guarda en la cookie de sesión.
+# Es también el retraso máximo con que los otros workers notan un cambio o borrado del usuario.
+app.config['IDENTIDAD_SEGUNDOS'] = int(os.environ.get('IDENTIDAD_SEGUNDOS', 60))
+app.config['IDENTIDAD_EN_SESION'] = os.environ.get('IDENTIDAD_EN_SESION', 'false').lower() in ('1', 'true', 'yes')
+# Métricas (/metrics): umbral del registro de consultas lentas, cabecera Server-Timing, token y
+# direcciones que pueden leerlas sin token (por defecto solo la propia máquina)
+app.config['METRICAS_UMBRAL_LENTA_MS'] = int(os.environ.get('METRICAS_UMBRAL_LENTA_MS', 200))
+app.config['METRICAS_SERVER_TIMING'] = os.environ.get('METRICAS_SERVER_TIMING', 'false').lower() in ('1', 'true', 'yes')
+app.config['METRICAS_TOKEN'] = os.environ.get('METRICAS_TOKEN')
+app.config['METRICAS_IPS'] = [ip.strip() for ip in os.environ.get('METRICAS_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+# Trabajos en segundo plano (cargar Excel / exportar reporte): hilos por worker y carpeta de archivos
+app.config['TRABAJOS_HILOS'] = int(os.environ.get('TRABAJOS_HILOS', 2))
+app.config['TRABAJOS_DIR'] = os.environ.get('TRABAJOS_DIR', os.path.join(tempfile.gettempdir(), 'trabajos_notificados'))
+# Borrado / archivo masivo por filtros (ver mantenimiento.py). ARCHIVO_DIR guarda los Parquet:
+# debe ser un disco persistente, no la carpeta temporal de los trabajos.
+app.config['MANTENIMIENTO_TAM_LOTE'] = int(os.environ.get('MANTENIMIENTO_TAM_LOTE', 5000))
+app.config['ARCHIVO_DIR'] = os.environ.get('ARCHIVO_DIR', os.path.join(app.instance_path, 'archivo'))
 
 # Opciones del motor para evitar desconexiones en la nube (Production Grade)
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
@@ -43,6 +91,14 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# Instrumentación por ruta / acción y de SQL (ver metricas.py); crear el motor no abre conexiones
+metricas = Metricas(umbral_lenta_ms=app.config['METRICAS_UMBRAL_LENTA_MS'])
+metricas.instalar_flask(app, server_timing=app.config['METRICAS_SERVER_TIMING'])
+with app.app_context():
+    metricas.instalar_motor(db.engine)
+cache_resultados = crear_cache(app.config['CACHE_RESULTADOS'], app.config['CACHE_RUTA'],
+                               app.config['CACHE_TAM_MAXIMO'], app.config['CACHE_SEGUNDOS'])
+
 # --- BASE DE DATOS (MODELO) ---
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -60,8 +116,67 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+# Cualquier cambio del registro (datos o contraseña) descarta la copia guardada por load_user
+# en este worker; los demás la descartan al vencer IDENTIDAD_SEGUNDOS (ver identidad.py)
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def olvidar_identidad(mapper, connection, usuario):
+    cache_identidad.olvidar(usuario.id, session if has_request_context() else None)
+
 class Notificado(db.Model):
+    # Índices para los filtros de verificar_notificados / graficos_proyeccion (ver filtros.py)
+    __table_args__ = (
+        db.Index('ix_notificado_fecha_elaboracion', 'fecha_elaboracion', 'id'),
+        db.Index('ix_notificado_idioma_fecha', 'idioma', 'fecha_elaboracion'),
+        db.Index('ix_notificado_modalidad_fecha', 'modalidad', 'fecha_elaboracion'),
+        db.Index('ix_notificado_mes_idioma', 'mes_elaboracion', 'idioma'),
+        db.Index('ix_notificado_dni', 'dni'),
+        # Revisión de duplicados de la vista previa (ver duplicados.py)
+        db.Index('ix_notificado_libro_idioma', 'codigo_libro', 'idioma'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    nombres_apellidos = db.Column(db.String(200))
+    dni = db.Column(db.String(15))
+    idioma = db.Column(db.String(50))
+    codigo_libro = db.Column(db.String(100))
+    anio = db.Column(db.String(10))
+    fecha_elaboracion = db.Column(db.Date, nullable=True)
+    fecha_entrega = db.Column(db.Date, nullable=True)
+    correo_entrega = db.Column(db.String(100))
+    modalidad = db.Column(db.String(50))
+    # Año y mes de fecha_elaboracion guardados aparte: permiten filtrar "marzo de todos los años" con índice
+    anio_elaboracion = db.Column(db.Integer, nullable=True)
+    mes_elaboracion = db.Column(db.Integer, nullable=True)
+    # Nombre, DNI, libro y correo sin tildes ni signos para la búsqueda de texto (ver texto.py)
+    texto_busqueda = db.Column(db.String(500), nullable=True)
+
+def periodo_elaboracion(fecha):
+    # (anio_elaboracion, mes_elaboracion) a partir de la fecha; se usa en todas las escrituras
+    return (fecha.year, fecha.month) if fecha else (None, None)
+
+@db.event.listens_for(Notificado, 'before_insert')
+@db.event.listens_for(Notificado, 'before_update')
+def sincronizar_periodo(mapper, connection, notificado):
+    notificado.anio_elaboracion, notificado.mes_elaboracion = periodo_elaboracion(notificado.fecha_elaboracion)
+    notificado.texto_busqueda = texto_busqueda(notificado)
+
+# --- RESUMEN PARA GRÁFICOS ---
+# Conteo por (año, mes, idioma, modalidad) mantenido en cada escritura; ver resumen.py
+class ResumenNotificado(db.Model):
+    __tablename__ = 'resumen_notificado'
+    anio = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 0 = sin fecha
+    mes = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    idioma = db.Column(db.String(50), primary_key=True)  # '' = sin idioma
+    modalidad = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+# --- ARCHIVO ---
+# Notificados movidos por el mantenimiento masivo (modo archivar, destino tabla): mismas
+# columnas de datos, sin índices secundarios ni texto de búsqueda
+class NotificadoArchivo(db.Model):
+    __tablename__ = 'notificado_archivo'
     id = db.Column(db.Integer, primary_key=True)
+    id_original = db.Column(db.Integer, nullable=False)  # El id que tenía en notificado (puede repetirse)
     nombres_apellidos = db.Column(db.String(200))
     dni = db.Column(db.String(15))
     idioma = db.Column(db.String(50))
@@ -71,10 +186,330 @@ class Notificado(db.Model):
     fecha_entrega = db.Column(db.Date, nullable=True)
     correo_entrega = db.Column(db.String(100))
     modalidad = db.Column(db.String(50))
+    anio_elaboracion = db.Column(db.Integer, nullable=True)
+    mes_elaboracion = db.Column(db.Integer, nullable=True)
+    archivado = db.Column(db.DateTime, nullable=False)
+
+def actualizar_resumen(session, altas, bajas):
+    registrar_cambios(session, ResumenNotificado.__table__, altas, bajas)
+
+# --- STAGING DE IMPORTACIONES ---
+# Un Excel se parsea una sola vez y sus filas quedan en 'fila_importacion' bajo un ID de importación.
+# La vista previa pagina sobre estas filas y Guardar/Exportar trabajan contra ellas por ID,
+# en lugar de ir y volver con toda la tabla dentro del formulario.
+FILAS_POR_PAGINA = 100
+HORAS_VIDA_IMPORTACION = 24
+
+class Importacion(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    nombre_archivo = db.Column(db.String(255))
+    total_filas = db.Column(db.Integer, nullable=False, default=0)
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+class FilaImportacion(db.Model):
+    __tablename__ = 'fila_importacion'
+    __table_args__ = (db.Index('ix_fila_importacion_orden', 'importacion_id', 'fila'),)
+    id = db.Column(db.Integer, primary_key=True)
+    importacion_id = db.Column(db.String(32), nullable=False)
+    fila = db.Column(db.Integer, nullable=False)  # Posición 1..N dentro de la importación
+    nombres_apellidos = db.Column(db.String(255), default='')
+    dni = db.Column(db.String(255), default='')
+    idioma = db.Column(db.String(255), default='')
+    codigo_libro = db.Column(db.String(255), default='')
+    anio = db.Column(db.String(255), default='')
+    fecha_elaboracion = db.Column(db.String(255), default='')  # Texto YYYY-MM-DD, tal como lo edita el formulario
+    fecha_entrega = db.Column(db.String(255), default='')
+    correo_entrega = db.Column(db.String(255), default='')
+    modalidad = db.Column(db.String(255), default='')
+    # Resultado de revisar_duplicados: nuevo / duplicado / probable (NULL = sin DNI o sin revisar)
+    estado_duplicado = db.Column(db.String(20))
+    detalle_duplicado = db.Column(db.String(255))
+
+# --- TRABAJOS EN SEGUNDO PLANO ---
+# Cargar un Excel y exportar un reporte corren fuera de la petición (ver trabajos.py);
+# la página consulta /api/trabajos/<id> hasta que el trabajo termina.
+class Trabajo(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)  # 'importacion' / 'exportacion' / 'mantenimiento'
+    estado = db.Column(db.String(20), nullable=False)  # pendiente / en_curso / terminado / fallido
+    progreso = db.Column(db.Integer, nullable=False, default=0)  # Filas procesadas
+    total = db.Column(db.Integer, nullable=True)  # Filas esperadas, si se conocen
+    mensaje = db.Column(db.String(500))
+    resultado = db.Column(db.String(255))  # ID de importación o archivo generado en TRABAJOS_DIR
+    nombre_archivo = db.Column(db.String(255))  # Archivo subido / nombre de la descarga
+    creado = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    actualizado = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+ejecutor_trabajos = EjecutorTrabajos(app, db, Trabajo.__table__, max_hilos=app.config['TRABAJOS_HILOS'])
+
+def ruta_trabajo(nombre):
+    os.makedirs(app.config['TRABAJOS_DIR'], exist_ok=True)
+    return os.path.join(app.config['TRABAJOS_DIR'], nombre)
+
+def nuevo_trabajo(tipo, nombre_archivo):
+    # Limpieza al crear un trabajo (no en cada consulta de avance): vencidos y abandonados
+    purgar_trabajos_vencidos(db.session, Trabajo.__table__, app.config['TRABAJOS_DIR'])
+    marcar_abandonados(db.session, Trabajo.__table__)
+    return crear_trabajo(db.session, Trabajo.__table__, current_user.id, tipo, nombre_archivo)
+
+def lanzar_importacion(archivo):
+    # El Excel se guarda en disco y se lee en el hilo del trabajo; la petición termina enseguida
+    trabajo_id = nuevo_trabajo('importacion', archivo.filename)
+    ruta = ruta_trabajo(f"{trabajo_id}_entrada{os.path.splitext(archivo.filename)[1].lower()}")
+    archivo.save(ruta)
+    db.session.commit()
+    ejecutor_trabajos.lanzar(trabajo_id, importar_excel_trabajo, ruta, archivo.filename, current_user.id)
+    return trabajo_id
+
+@metricas.medido('trabajo', 'importacion')
+def bloques_excel(archivo, nombre_archivo):
+    # Como leer_excel_por_bloques, pero lo que falle al leer el archivo (zip dañado, un CSV o
+    # un PDF renombrado a .xlsx...) sale como ValueError, que el trabajo muestra tal cual
+    bloques = leer_excel_por_bloques(archivo, nombre_archivo)
+    while True:
+        try:
+            bloque = next(bloques)
+        except StopIteration:
+            return
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"No se pudo leer '{nombre_archivo}': el archivo está dañado o no es un "
+                             "Excel (.xlsx o .xls).") from e
+        yield bloque
+
+def importar_excel_trabajo(avance, ruta, nombre_archivo, usuario_id):
+    importacion = crear_importacion(nombre_archivo, usuario_id)
+    db.session.commit()
+    try:
+        with open(ruta, 'rb') as archivo:
+            for bloque in bloques_excel(archivo, nombre_archivo):
+                agregar_filas_importacion(importacion, bloque)
+                db.session.commit()
+                avance(importacion.total_filas)
+        revisar_duplicados(importacion)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        descartar_importacion(importacion)
+        db.session.commit()
+        raise
+    finally:
+        os.remove(ruta)
+    return importacion.id
+
+def lanzar_exportacion(filtros, formato):
+    nombre, _ = FORMATOS[formato]
+    trabajo_id = nuevo_trabajo('exportacion', nombre)
+    db.session.commit()
+    ejecutor_trabajos.lanzar(trabajo_id, exportar_reporte_trabajo, filtros, formato, f"{trabajo_id}.{formato}")
+    return trabajo_id
+
+@metricas.medido('trabajo', 'exportacion')
+def exportar_reporte_trabajo(avance, filtros, formato, nombre):
+    total = total_notificados(filtros)
+    avance(0, total)
+    with open(ruta_trabajo(nombre), 'wb') as salida:
+        for trozo in generar_reporte(db.session, Notificado.__table__, filtros, formato,
+                                     avance=lambda n: avance(n, total)):
+            salida.write(trozo)
+    return nombre
+
+def lanzar_mantenimiento(filtros, modo, destino):
+    # Los filtros viajan al trabajo, no los IDs: el trabajo recorre la tabla por lotes
+    trabajo_id = nuevo_trabajo('mantenimiento', f"{modo} ({destino})" if modo == 'archivar' else modo)
+    db.session.commit()
+    ejecutor_trabajos.lanzar(trabajo_id, mantenimiento_trabajo, filtros, modo, destino)
+    return trabajo_id
+
+def ejecutar_mantenimiento(filtros, modo, destino, avance=None):
+    # Compartido por el trabajo y el comando "flask mantenimiento"; devuelve (filas, destino)
+    tabla_archivo, archivo, destino_final = None, None, None
+    if modo == 'archivar' and destino == 'parquet':
+        archivo = ArchivoParquet(os.path.join(app.config['ARCHIVO_DIR'],
+                                              datetime.now().strftime('notificado_%Y%m%d_%H%M%S')))
+        destino_final = archivo.carpeta
+    elif modo == 'archivar':
+        tabla_archivo = NotificadoArchivo.__table__
+        destino_final = tabla_archivo.name
+    filas = mantener_notificados(db.session, Notificado.__table__, ResumenNotificado.__table__, filtros, modo,
+                                 tabla_archivo=tabla_archivo, archivo=archivo,
+                                 tam_lote=app.config['MANTENIMIENTO_TAM_LOTE'], avance=avance,
+                                 al_confirmar=cache_resultados.invalidar)
+    return filas, destino_final
+
+@metricas.medido('trabajo', 'mantenimiento')
+def mantenimiento_trabajo(avance, filtros, modo, destino):
+    total = simular(db.session, Notificado.__table__, filtros, ResumenNotificado.__table__)['total']
+    avance(0, total)
+    _, destino_final = ejecutar_mantenimiento(filtros, modo, destino, avance=lambda n: avance(n, total))
+    return destino_final
+
+def texto_simulacion(simulacion, modo):
+    por_anio = ', '.join(f"{anio or 'sin fecha'}: {n}" for anio, n in
+                         sorted(simulacion['por_anio'].items(), key=lambda x: (x[0] is None, x[0] or 0)))
+    verbo = 'archivarían' if modo == 'archivar' else 'eliminarían'
+    return f"{simulacion['total']} registros se {verbo}" + (f" ({por_anio})" if por_anio else '')
+
+def trabajo_json(trabajo):
+    datos = {c: trabajo[c] for c in ('id', 'tipo', 'estado', 'progreso', 'total', 'mensaje')}
+    datos['porcentaje'] = porcentaje(trabajo)
+    datos['url_estado'] = url_for('api_trabajo', trabajo_id=trabajo['id'])
+    if trabajo['estado'] == TERMINADO:
+        if trabajo['tipo'] == 'importacion':
+            datos['url_resultado'] = url_for('registrar_notificados', import_id=trabajo['resultado'])
+        elif trabajo['tipo'] == 'mantenimiento':
+            datos['destino'] = trabajo['resultado']  # Tabla o carpeta del archivo; nada que descargar
+        else:
+            datos['url_resultado'] = url_for('descargar_trabajo', trabajo_id=trabajo['id'])
+    return datos
+
+def trabajo_solicitado():
+    # Trabajo indicado con ?trabajo=<id> para seguir su avance en la página
+    trabajo = obtener_trabajo(db.session, Trabajo.__table__, request.args.get('trabajo'), current_user.id)
+    return trabajo_json(trabajo) if trabajo else None
+
+def purgar_importaciones_vencidas():
+    limite = datetime.now() - timedelta(hours=HORAS_VIDA_IMPORTACION)
+    vencidas = db.session.query(Importacion.id).filter(Importacion.creado < limite)
+    FilaImportacion.query.filter(FilaImportacion.importacion_id.in_(vencidas.scalar_subquery())).delete(synchronize_session=False)
+    Importacion.query.filter(Importacion.creado < limite).delete(synchronize_session=False)
+
+def crear_importacion(nombre_archivo, usuario_id=None):
+    # usuario_id se pasa explícito desde los trabajos en segundo plano (no hay current_user)
+    purgar_importaciones_vencidas()
+    importacion = Importacion(id=uuid.uuid4().hex, usuario_id=usuario_id or current_user.id,
+                              nombre_archivo=nombre_archivo, total_filas=0)
+    db.session.add(importacion)
+    db.session.flush()
+    return importacion
+
+def obtener_importacion(import_id):
+    # Solo el usuario que subió el archivo puede ver o modificar su importación
+    if not import_id:
+        return None
+    return Importacion.query.filter_by(id=import_id, usuario_id=current_user.id).first()
+
+def descartar_importacion(importacion):
+    FilaImportacion.query.filter_by(importacion_id=importacion.id).delete(synchronize_session=False)
+    db.session.delete(importacion)
+
+def agregar_filas_importacion(importacion, filas):
+    # Inserta un bloque completo en staging con un único executemany
+    if not filas:
+        return
+    base = importacion.total_filas
+    registros = []
+    for i, fila in enumerate(filas):
+        registro = {c: '' if fila.get(c) is None else str(fila.get(c)) for c in CAMPOS_TABLA}
+        registro.update(importacion_id=importacion.id, fila=base + i + 1)
+        registros.append(registro)
+    db.session.execute(insert(FilaImportacion), registros)
+    importacion.total_filas = base + len(registros)
+
+def aplicar_cambios_formulario(importacion):
+    # El formulario solo envía las filas editadas (con fila_id) y las agregadas a mano (fila_id vacío)
+    ids = request.form.getlist('fila_id[]')
+    columnas = {c: request.form.getlist(f'{c}[]') for c in CAMPOS_TABLA}
+    cambios, nuevas = {}, []
+    for i, fila_id in enumerate(ids):
+        valores = {c: columnas[c][i] if i < len(columnas[c]) else '' for c in CAMPOS_TABLA}
+        if fila_id.isdigit():
+            cambios[int(fila_id)] = valores
+        elif any(valores.values()):
+            nuevas.append(valores)
+
+    if cambios:
+        propias = db.session.query(FilaImportacion.id).filter(
+            FilaImportacion.importacion_id == importacion.id, FilaImportacion.id.in_(list(cambios))
+        )
+        registros = [dict(cambios[fid], id=fid) for (fid,) in propias]
+        if registros:
+            db.session.execute(update(FilaImportacion), registros)
+    agregar_filas_importacion(importacion, nuevas)
+    return bool(cambios or nuevas)
+
+def preparar_importacion_formulario(importacion, revisar=False):
+    # Las filas escritas a mano (sin Excel) también pasan por staging para usar el mismo camino.
+    # Con revisar=True, si hubo cambios se vuelve a marcar los duplicados de toda la importación.
+    if importacion is None:
+        importacion = crear_importacion(None)
+    if aplicar_cambios_formulario(importacion) and revisar:
+        revisar_duplicados(importacion)
+    db.session.commit()
+    return importacion
+
+def revisar_duplicados(importacion):
+    # Clasifica todas las filas de staging contra notificado y entre sí (ver duplicados.py)
+    tabla = FilaImportacion.__table__
+    filas = db.session.execute(db.select(tabla.c.id, tabla.c.fila, *[tabla.c[c] for c in COLUMNAS_REVISION])
+                               .where(tabla.c.importacion_id == importacion.id).order_by(tabla.c.fila)).all()
+    revision = detectar_duplicados(db.session, Notificado.__table__, filas)
+    # Las filas sin detalle (nuevas o sin DNI) se marcan con un UPDATE ... IN por estado;
+    # solo las duplicadas / probables llevan su propio detalle
+    por_estado, con_detalle = {}, []
+    for f in filas:
+        estado, detalle = revision.get(f.id, (None, None))
+        if detalle:
+            con_detalle.append({'fila_id': f.id, 'estado': estado, 'detalle': detalle})
+        else:
+            por_estado.setdefault(estado, []).append(f.id)
+    for estado, ids in por_estado.items():
+        for inicio in range(0, len(ids), 5000):
+            db.session.execute(update(tabla).where(tabla.c.id.in_(ids[inicio:inicio + 5000]))
+                               .values(estado_duplicado=estado, detalle_duplicado=None))
+    if con_detalle:
+        db.session.execute(update(tabla).where(tabla.c.id == bindparam('fila_id'))
+                           .values(estado_duplicado=bindparam('estado'), detalle_duplicado=bindparam('detalle')),
+                           con_detalle)
+
+def conteo_duplicados(importacion):
+    filas = db.session.query(FilaImportacion.estado_duplicado, db.func.count()).filter(
+        FilaImportacion.importacion_id == importacion.id).group_by(FilaImportacion.estado_duplicado)
+    conteo = dict.fromkeys(ESTADOS_REVISION, 0)
+    conteo.update((estado, total) for estado, total in filas if estado)
+    return conteo
+
+def filas_importacion(importacion):
+    return (FilaImportacion.query.filter_by(importacion_id=importacion.id)
+            .order_by(FilaImportacion.fila).yield_per(1000))
+
+def notificados_importacion(importacion, tam_pagina=1000):
+    # Filas de staging listas para Notificado, leídas por rangos de 'fila' (sin cursor abierto entre commits)
+    columnas = [getattr(FilaImportacion, c) for c in CAMPOS_TABLA]
+    ultima = 0
+    while True:
+        pagina = db.session.query(FilaImportacion.fila, *columnas).filter(
+            FilaImportacion.importacion_id == importacion.id, FilaImportacion.fila > ultima
+        ).order_by(FilaImportacion.fila).limit(tam_pagina).all()
+        if not pagina:
+            return
+        for fila in pagina:
+            # Validar que al menos haya DNI para guardar la fila
+            if not fila.dni:
+                continue
+            registro = {c: getattr(fila, c) for c in CAMPOS_TABLA}
+            # Convertir strings de fecha a objetos Date si no están vacíos
+            registro['fecha_elaboracion'] = datetime.strptime(fila.fecha_elaboracion, '%Y-%m-%d').date() if fila.fecha_elaboracion else None
+            registro['fecha_entrega'] = datetime.strptime(fila.fecha_entrega, '%Y-%m-%d').date() if fila.fecha_entrega else None
+            registro['anio_elaboracion'], registro['mes_elaboracion'] = periodo_elaboracion(registro['fecha_elaboracion'])
+            registro['texto_busqueda'] = texto_busqueda(registro)
+            yield registro
+        ultima = pagina[-1].fila
+
+def cargar_identidad(user_id):
+    usuario = db.session.get(User, user_id)
+    return copia_usuario(usuario) if usuario else None
+
+# current_user es una copia de solo lectura (identidad.UsuarioSesion); ver identidad.py
+cache_identidad = CacheIdentidad(cargar_identidad, segundos_vida=app.config['IDENTIDAD_SEGUNDOS'],
+                                 en_sesion=app.config['IDENTIDAD_EN_SESION'])
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return cache_identidad.usuario(int(user_id), session)
 
 # --- RUTAS Y LÓGICA ---
 
@@ -123,7 +558,9 @@ def login():
         user = User.query.filter_by(email=email).first()
 
         if user and user.check_password(password):
-            login_user(user)
+            identidad = copia_usuario(user)
+            login_user(identidad)
+            cache_identidad.recordar(identidad, session)
             return redirect(url_for('dashboard'))
         else:
             flash('Correo o contraseña incorrectos.')
@@ -139,6 +576,7 @@ def dashboard():
 @login_required
 def registrar_notificados():
     datos_tabla = [] # Lista para pre-llenar la tabla
+    importacion = obtener_importacion(request.values.get('import_id'))
 
     if request.method == 'POST':
         accion = request.form.get('accion')
@@ -153,218 +591,132 @@ def registrar_notificados():
                     flash('Archivo inválido.')
                 else:
                     try:
-                        df = pd.read_excel(file)
-                        
-                        # 1. Normalizar cabeceras (Mayúsculas, sin acentos y sin símbolos como . ° - /)
-                        def normalize_header(h):
-                            h = str(h).strip().upper()
-                            h = "".join(c for c in unicodedata.normalize('NFKD', h) if not unicodedata.combining(c))
-                            for char in [".", "°", "-", "_", "/", "\\", "(", ")", ":"]:
-                                h = h.replace(char, " ")
-                            return " ".join(h.split())
-                        df.columns = [normalize_header(col) for col in df.columns]
-
-                        # Función auxiliar para buscar columnas flexibles
-                        def get_val(row, aliases):
-                            for alias in aliases:
-                                if alias in row.index:
-                                    val = row[alias]
-                                    # Manejo de NaN
-                                    if pd.isna(val) or val == '': return ''
-                                    return val
-                            return ''
-
-                        # Función para formatear fechas de Excel a HTML (YYYY-MM-DD)
-                        def format_date(val):
-                            if pd.isna(val) or str(val).strip() == '': return ''
-                            try:
-                                if isinstance(val, (pd.Timestamp, datetime)):
-                                    return val.strftime('%Y-%m-%d')
-                                if isinstance(val, (int, float)): return pd.to_datetime(val, unit='D', origin='1899-12-30').strftime('%Y-%m-%d')
-                                # Intenta parsear diversos formatos de fecha de forma inteligente
-                                dt = pd.to_datetime(str(val).strip(), errors='coerce')
-                                return dt.strftime('%Y-%m-%d') if pd.notna(dt) else ''
-                            except:
-                                return ''
-
-                        # Función para limpiar DNI (quitar .0 si viene como float)
-                        def clean_dni(val):
-                            if not val: return ''
-                            try:
-                                return str(int(float(val)))
-                            except:
-                                return str(val).strip()
-
-                        # Función para normalizar Idiomas y Modalidades para los Selects
-                        def normalize_text(val):
-                            if not val: return ''
-                            val = str(val).upper().strip()
-                            # Mapeo de Idiomas (Excel -> Value del Select)
-                            if 'INGL' in val: return 'Ingles'
-                            if 'PORT' in val: return 'Portugues'
-                            if 'ITAL' in val: return 'Italiano'
-                            if 'QUECH' in val: return 'Quechua'
-                            return val # Si no coincide, devuelve el valor original
-
-                        for _, row in df.iterrows():
-                            # --- Lógica de Nombres y Apellidos (Unificados o Separados) ---
-                            nombres_full = get_val(row, ['NOMBRES Y APELLIDOS', 'APELLIDOS Y NOMBRES', 'ALUMNO', 'ESTUDIANTE', 'NOMBRE COMPLETO', 'PARTICIPANTE'])
-                            
-                            # 2. Si no se encontró columna única, buscar columnas separadas y concatenar
-                            if not nombres_full:
-                                nom = get_val(row, ['NOMBRES', 'NOMBRE'])
-                                ape = get_val(row, ['APELLIDOS', 'APELLIDO'])
-                                if nom or ape:
-                                    nombres_full = f"{nom} {ape}".strip()
-                            
-                            item = {
-                                'nombres_apellidos': nombres_full,
-                                'dni': clean_dni(get_val(row, ['DNI', 'DOCUMENTO', 'IDENTIFICACION', 'NUMERO DOCUMENTO', 'DOC', 'CEDULA'])),
-                                'idioma': normalize_text(get_val(row, ['IDIOMA', 'LENGUA', 'CURSO', 'LENGUA EXTRANJERA', 'MATERIA'])),
-                                'codigo_libro': get_val(row, ['CODIGO Y N DE LIBRO', 'COD Y N DE LIBRO', 'CODIGO Y NUMERO DE LIBRO', 'CODIGO', 'LIBRO', 'N LIBRO', 'NRO LIBRO', 'NUMERO DE LIBRO', 'COD LIBRO']),
-                                'anio': get_val(row, ['ANO', 'ANIO', 'YEAR', 'PERIODO', 'FECHA ANUAL', 'EJERCICIO']),
-                                'fecha_elaboracion': format_date(get_val(row, ['FECHA ELABORACION', 'FECHA DE ELABORACION', 'F ELABORACION', 'ELABORACION', 'F ELAB', 'FECHA ELAB', 'ELAB'])),
-                                'fecha_entrega': format_date(get_val(row, ['FECHA ENTREGA', 'FECHA DE ENTREGA', 'F ENTREGA', 'ENTREGA', 'F ENT', 'FECHA ENT', 'ENTREGADO'])),
-                                'correo_entrega': str(get_val(row, ['CORREO DE ENTREGA', 'CORREO', 'EMAIL', 'CORREO ELECTRONICO', 'MAIL', 'CONTACTO'])).strip().lower(),
-                                'modalidad': str(get_val(row, ['MODALIDAD', 'TIPO', 'MODALIDAD DE ESTUDIO', 'FORMA', 'CATEGORIA'])).upper().strip()
-                            }
-                            datos_tabla.append(item)
-                        
-                        flash('Excel cargado. Verifique los datos en la tabla antes de guardar.')
+                        # La lectura corre como trabajo en segundo plano; la página sigue su avance
+                        # y al terminar abre la importación en staging
+                        trabajo_id = lanzar_importacion(file)
+                        return redirect(url_for('registrar_notificados', trabajo=trabajo_id))
                     except Exception as e:
+                        db.session.rollback()
                         flash(f'Error al leer Excel: {str(e)}')
 
         # --- ACCIÓN 2: GUARDAR EN BD ---
         elif accion == 'guardar_bd':
             try:
-                # Obtener listas de los inputs del formulario
-                dnis = request.form.getlist('dni[]')
-                nombres = request.form.getlist('nombres_apellidos[]')
-                idiomas = request.form.getlist('idioma[]')
-                codigos = request.form.getlist('codigo_libro[]')
-                anios = request.form.getlist('anio[]')
-                correos = request.form.getlist('correo_entrega[]')
-                modalidades = request.form.getlist('modalidad[]')
-                # Fechas
-                f_elab = request.form.getlist('fecha_elaboracion[]')
-                f_ent = request.form.getlist('fecha_entrega[]')
-
-                count = 0
-                for i in range(len(dnis)):
-                    # Validar que al menos haya DNI para guardar la fila
-                    if not dnis[i]: 
-                        continue
-
-                    # Convertir strings de fecha a objetos Date si no están vacíos
-                    fecha_elab_obj = datetime.strptime(f_elab[i], '%Y-%m-%d').date() if f_elab[i] else None
-                    fecha_ent_obj = datetime.strptime(f_ent[i], '%Y-%m-%d').date() if f_ent[i] else None
-
-                    nuevo_notificado = Notificado(
-                        nombres_apellidos=nombres[i],
-                        dni=dnis[i],
-                        idioma=idiomas[i],
-                        codigo_libro=codigos[i],
-                        anio=anios[i],
-                        fecha_elaboracion=fecha_elab_obj,
-                        fecha_entrega=fecha_ent_obj,
-                        correo_entrega=correos[i],
-                        modalidad=modalidades[i]
-                    )
-                    db.session.add(nuevo_notificado)
-                    count += 1
+                importacion = preparar_importacion_formulario(importacion)
+
+                # Escritura por bloques con commit propio; en 'actualizar'/'omitir' se cruza por clave natural
+                modo = request.form.get('modo_guardado', 'insertar')
+                resumen = escribir_notificados(db.session, Notificado.__table__,
+                                               notificados_importacion(importacion), modo=modo,
+                                               tam_bloque=app.config['GUARDAR_TAM_BLOQUE'],
+                                               antes_de_confirmar=actualizar_resumen,
+                                               al_confirmar=lambda _: cache_resultados.invalidar())
+                descartar_importacion(importacion)
                 db.session.commit()
-                flash(f'Éxito: Se guardaron {count} registros en la base de datos.')
+                flash(f"Éxito: {resumen['insertados']} registros nuevos, {resumen['actualizados']} actualizados "
+                      f"y {resumen['omitidos']} omitidos ({resumen['bloques']} bloques).")
                 return redirect(url_for('registrar_notificados')) # Limpiar tabla
             except Exception as e:
                 db.session.rollback()
-                flash(f'Error al guardar: {str(e)}')
-                # Si falla, mantenemos los datos en la tabla (habría que reconstruir datos_tabla aquí idealmente)
+                flash(f'Error al guardar: {str(e)}. Los bloques ya confirmados quedaron guardados; '
+                      'vuelva a guardar con "Actualizar existentes" para completar sin duplicar.')
+                # Si falla, los datos siguen en staging y se vuelve a mostrar la importación
+                if importacion is not None:
+                    return redirect(url_for('registrar_notificados', import_id=importacion.id))
         
         # --- ACCIÓN 3: EXPORTAR TABLA ACTUAL A EXCEL ---
         elif accion == 'exportar_excel':
             try:
-                # Recopilar datos del formulario actual
-                data = {
-                    'NOMBRES Y APELLIDOS': request.form.getlist('nombres_apellidos[]'),
-                    'DNI': request.form.getlist('dni[]'),
-                    'IDIOMA': request.form.getlist('idioma[]'),
-                    'CODIGO Y N° LIBRO': request.form.getlist('codigo_libro[]'),
-                    'AÑO': request.form.getlist('anio[]'),
-                    'F. ELABORACION': request.form.getlist('fecha_elaboracion[]'),
-                    'F. ENTREGA': request.form.getlist('fecha_entrega[]'),
-                    'CORREO': request.form.getlist('correo_entrega[]'),
-                    'MODALIDAD': request.form.getlist('modalidad[]')
-                }
-                
-                # Crear DataFrame y filtrar filas vacías (donde no hay DNI)
-                df_export = pd.DataFrame(data)
-                df_export = df_export[df_export['DNI'] != '']
-
-                # Generar Excel en memoria
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df_export.to_excel(writer, index=False, sheet_name='Registros')
+                importacion = preparar_importacion_formulario(importacion)
+
+                # Workbook en modo write-only alimentado fila a fila desde staging
+                from openpyxl import Workbook  # Se carga al primer uso, no al arrancar la app
+                wb = Workbook(write_only=True)
+                ws = wb.create_sheet('Registros')
+                ws.append(['NOMBRES Y APELLIDOS', 'DNI', 'IDIOMA', 'CODIGO Y N° LIBRO', 'AÑO',
+                           'F. ELABORACION', 'F. ENTREGA', 'CORREO', 'MODALIDAD'])
+                for fila in filas_importacion(importacion):
+                    # Filtrar filas vacías (donde no hay DNI)
+                    if fila.dni:
+                        ws.append([getattr(fila, c) for c in CAMPOS_TABLA])
+
+                output = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+                wb.save(output)
                 output.seek(0)
                 
                 return send_file(output, download_name="registros_actuales.xlsx", as_attachment=True)
             except Exception as e:
+                db.session.rollback()
                 flash(f'Error al exportar: {str(e)}')
 
+        # --- ACCIÓN 4: CAMBIAR DE PÁGINA (guardando antes las filas editadas) ---
+        elif accion == 'cambiar_pagina':
+            importacion = preparar_importacion_formulario(importacion, revisar=True)
+            return redirect(url_for('registrar_notificados', import_id=importacion.id,
+                                    pagina=request.args.get('pagina', 1, type=int)))
+
+    paginacion = None
+    if importacion is not None:
+        total_paginas = max(1, math.ceil(importacion.total_filas / FILAS_POR_PAGINA))
+        pagina = min(max(request.args.get('pagina', 1, type=int), 1), total_paginas)
+        # Las filas están numeradas 1..N, así que cada página es un rango sobre el índice (importacion_id, fila)
+        datos_tabla = FilaImportacion.query.filter(
+            FilaImportacion.importacion_id == importacion.id,
+            FilaImportacion.fila > (pagina - 1) * FILAS_POR_PAGINA,
+            FilaImportacion.fila <= pagina * FILAS_POR_PAGINA
+        ).order_by(FilaImportacion.fila).all()
+        paginacion = {'pagina': pagina, 'total_paginas': total_paginas, 'total_filas': importacion.total_filas,
+                      'duplicados': conteo_duplicados(importacion)}
+
     # Si datos_tabla está vacío (inicio), creamos filas vacías por defecto
     if not datos_tabla:
         for _ in range(2):
             datos_tabla.append({})
 
-    return render_template('registrar_notificados.html', datos_tabla=datos_tabla)
+    return render_template('registrar_notificados.html', datos_tabla=datos_tabla,
+                           importacion=importacion, paginacion=paginacion, trabajo=trabajo_solicitado())
+
+# --- CONSULTAS CON CACHÉ (se invalidan al insertar o borrar notificados) ---
+def total_notificados(filtros):
+    return cache_resultados.obtener_o_calcular(
+        'total', filtros, lambda: total_filtrado(db.session, Notificado.__table__, filtros))
+
+def conteos_notificados(dimensiones, filtros):
+    # Una dimensión no válida lanza ValueError dentro de contar_notificados y no se guarda nada
+    return cache_resultados.obtener_o_calcular(
+        'conteos', filtros,
+        lambda: contar_notificados(db.session, Notificado.__table__, dimensiones, filtros,
+                                   tabla_resumen=ResumenNotificado.__table__),
+        dimensiones=dimensiones)
+
+def modelo_proyeccion(desglose, filtros):
+    # Solo idioma y modalidad acotan las series (la proyección usa todos los meses). El modelo
+    # ajustado queda en la caché: se recalcula con datos nuevos (versión) o al cambiar de mes.
+    filtros = {'idiomas': filtros.get('idiomas') or [], 'modalidades': filtros.get('modalidades') or []}
+    dimensiones = desglose.split(',')
+    hasta = date.today().replace(day=1)
+    return cache_resultados.obtener_o_calcular(
+        'proyeccion', filtros,
+        lambda: ajustar_modelos(conteos_notificados(['anio_elaboracion', 'mes_elaboracion'] + dimensiones, filtros),
+                                dimensiones, hasta),
+        desglose=desglose, hasta=hasta.isoformat())
 
 @app.route('/verificar_notificados', methods=['GET', 'POST'])
 @login_required
 def verificar_notificados():
     resultados = []
+    busqueda = None
     accion = request.form.get('accion') # Capturar la acción (buscar o exportar)
 
     if request.method == 'POST':
-        anio = request.form.get('anio') # Año ahora es único
-        meses = request.form.getlist('mes')
-        idiomas = request.form.getlist('idioma')
-        modalidades = request.form.getlist('modalidad')
-        
-        query = Notificado.query
-        
-        # Filtros Lógicos:
-        if anio:
-            query = query.filter(Notificado.fecha_elaboracion != None, extract('year', Notificado.fecha_elaboracion) == int(anio))
-        if meses:
-            # Convertimos los meses a enteros para compararlos con extract('month', ...)
-            query = query.filter(Notificado.fecha_elaboracion != None, extract('month', Notificado.fecha_elaboracion).in_([int(m) for m in meses]))
-        if idiomas:
-            query = query.filter(Notificado.idioma.in_(idiomas))
-        if modalidades:
-            query = query.filter(Notificado.modalidad.in_(modalidades))
+        # Filtros Lógicos (año, meses, idiomas, modalidades) como rangos de fecha e IN indexables
+        filtros = leer_filtros(request.form)
         
         if accion == 'exportar_excel':
-            # Obtener todos los resultados para exportar (sin límite o con uno alto)
-            lista_notificados = query.all()
-            
-            # Convertir a lista de diccionarios para DataFrame
-            data_export = []
-            for n in lista_notificados:
-                data_export.append({
-                    'NOMBRES Y APELLIDOS': n.nombres_apellidos,
-                    'DNI': n.dni,
-                    'IDIOMA': n.idioma,
-                    'CODIGO LIBRO': n.codigo_libro,
-                    'AÑO': n.fecha_elaboracion.year if n.fecha_elaboracion else '',
-                    'MES': n.fecha_elaboracion.strftime('%B') if n.fecha_elaboracion else '',
-                    'MODALIDAD': n.modalidad
-                })
-            
-            df = pd.DataFrame(data_export)
-            output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Filtrados')
-            output.seek(0)
-            return send_file(output, download_name="reporte_filtrado.xlsx", as_attachment=True)
+            # El reporte se genera como trabajo en segundo plano y se descarga al terminar
+            # (con JavaScript la página lo pide a /api/trabajos/exportacion sin recargar)
+            trabajo_id = lanzar_exportacion(filtros, formato_solicitado())
+            return redirect(url_for('verificar_notificados', trabajo=trabajo_id))
 
         # --- ACCIÓN 4: ELIMINAR REGISTROS SELECCIONADOS ---
         elif accion == 'eliminar':
@@ -373,8 +725,12 @@ def verificar_notificados():
                 if ids_eliminar:
                     # Convertir a enteros y borrar
                     ids_int = [int(i) for i in ids_eliminar]
+                    # Descontar del resumen en la misma transacción, antes de borrar
+                    registrar_borrado(db.session, Notificado.__table__, ResumenNotificado.__table__,
+                                      Notificado.id.in_(ids_int))
                     Notificado.query.filter(Notificado.id.in_(ids_int)).delete(synchronize_session=False)
                     db.session.commit()
+                    cache_resultados.invalidar()
                     flash(f'✅ Se eliminaron {len(ids_int)} registros correctamente.')
                 return redirect(url_for('verificar_notificados'))
             except Exception as e:
@@ -382,10 +738,99 @@ def verificar_notificados():
                 flash(f'❌ Error al eliminar: {str(e)}')
                 return redirect(url_for('verificar_notificados'))
 
-        # Búsqueda normal
-        resultados = query.limit(200).all()
+        # --- ACCIÓN 5: MANTENIMIENTO MASIVO POR FILTROS (simular / eliminar / archivar) ---
+        elif accion in ('simular_mantenimiento', 'mantenimiento'):
+            modo = request.form.get('modo_mantenimiento', 'eliminar')
+            destino = request.form.get('destino_archivo', 'tabla')
+            try:
+                validar(filtros, modo, destino)
+            except ValueError as e:
+                flash(f'❌ {e}')
+            else:
+                if accion == 'mantenimiento':
+                    trabajo_id = lanzar_mantenimiento(filtros, modo, destino)
+                    return redirect(url_for('verificar_notificados', trabajo=trabajo_id))
+                simulacion = simular(db.session, Notificado.__table__, filtros, ResumenNotificado.__table__)
+                flash(f"🔎 Simulación: {texto_simulacion(simulacion, modo)}. No se modificó nada.")
+
+        # Búsqueda normal: primera página keyset; las siguientes las pide la página a /api/notificados
+        resultados, siguiente = pagina_notificados(db.session, Notificado.__table__, filtros)
+        busqueda = {
+            'filtros': filtros,
+            'siguiente': siguiente,
+            'total': total_notificados(filtros)
+        }
 
-    return render_template('verificar_notificados.html', resultados=resultados)
+    return render_template('verificar_notificados.html', resultados=resultados, busqueda=busqueda,
+                           trabajo=trabajo_solicitado(), parquet_disponible=parquet_disponible())
+
+def formato_solicitado():
+    formato = request.form.get('formato', 'xlsx')
+    return formato if formato in FORMATOS else 'xlsx'
+
+@app.route('/api/trabajos/importacion', methods=['POST'])
+@login_required
+def api_trabajo_importacion():
+    # Sube un Excel (campo 'file') y devuelve el ID del trabajo que lo lee
+    archivo = request.files.get('file')
+    if archivo is None or not archivo.filename.endswith(('.xlsx', '.xls')):
+        return jsonify({'error': 'Archivo inválido.'}), 400
+    trabajo = obtener_trabajo(db.session, Trabajo.__table__, lanzar_importacion(archivo), current_user.id)
+    return jsonify(trabajo_json(trabajo)), 202
+
+@app.route('/api/trabajos/exportacion', methods=['POST'])
+@login_required
+def api_trabajo_exportacion():
+    # Mismos campos que el formulario de filtros de verificar_notificados, más 'formato'
+    trabajo_id = lanzar_exportacion(leer_filtros(request.form), formato_solicitado())
+    trabajo = obtener_trabajo(db.session, Trabajo.__table__, trabajo_id, current_user.id)
+    return jsonify(trabajo_json(trabajo)), 202
+
+@app.route('/api/trabajos/<trabajo_id>')
+@login_required
+def api_trabajo(trabajo_id):
+    # Solo lectura; se escribe únicamente si este trabajo quedó sin latido
+    trabajo = obtener_trabajo(db.session, Trabajo.__table__, trabajo_id, current_user.id)
+    if trabajo is not None and abandonado(trabajo):
+        marcar_abandonados(db.session, Trabajo.__table__)
+        db.session.commit()
+        trabajo = obtener_trabajo(db.session, Trabajo.__table__, trabajo_id, current_user.id)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado.'}), 404
+    return jsonify(trabajo_json(trabajo))
+
+@app.route('/trabajos/<trabajo_id>/descarga')
+@login_required
+def descargar_trabajo(trabajo_id):
+    trabajo = obtener_trabajo(db.session, Trabajo.__table__, trabajo_id, current_user.id)
+    if trabajo is None or trabajo['tipo'] != 'exportacion' or trabajo['estado'] != TERMINADO:
+        flash('El reporte no está disponible.')
+        return redirect(url_for('verificar_notificados'))
+    if not os.path.isfile(ruta_trabajo(trabajo['resultado'])):
+        # La carpeta de trabajos se perdió (p. ej. /tmp tras un reinicio): el trabajo queda vencido
+        actualizar_trabajo(db.session, Trabajo.__table__, trabajo_id, estado=FALLIDO,
+                           mensaje='El archivo del reporte ya no existe. Vuelva a generarlo.')
+        db.session.commit()
+        flash('El reporte ya no existe en el servidor. Vuelva a generarlo.')
+        return redirect(url_for('verificar_notificados'))
+    return send_file(ruta_trabajo(trabajo['resultado']), download_name=trabajo['nombre_archivo'], as_attachment=True)
+
+@app.route('/api/notificados')
+@login_required
+def api_notificados():
+    # Búsqueda paginada: ?anio=2024&idioma=Ingles&limite=100&cursor=<siguiente de la página anterior>
+    filtros = leer_filtros(request.args)
+    try:
+        filas, siguiente = pagina_notificados(db.session, Notificado.__table__, filtros,
+                                              cursor=request.args.get('cursor') or None,
+                                              limite=request.args.get('limite', LIMITE_PAGINA, type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    respuesta = {'filas': [fila_json(f) for f in filas], 'siguiente': siguiente}
+    if not request.args.get('cursor'):
+        # El total solo hace falta con la primera página
+        respuesta['total'] = total_notificados(filtros)
+    return jsonify(respuesta)
 
 @app.route('/graficos_proyeccion', methods=['GET', 'POST'])
 @login_required
@@ -396,39 +841,26 @@ def graficos_proyeccion():
     idiomas = request.form.getlist('idioma')
     modalidades = request.form.getlist('modalidad')
     tipo_grafico = request.form.get('tipo_grafico', 'bar')
+    desglose = request.form.get('desglose', 'idioma')
     
     show_results = False
     chart_data = {}
 
     if request.method == 'POST':
         show_results = True
-        query = Notificado.query
-
-        if anios:
-            anios_ints = [int(a) for a in anios if a.isdigit()]
-            query = query.filter(Notificado.fecha_elaboracion != None, extract('year', Notificado.fecha_elaboracion).in_(anios_ints))
-        if meses:
-            meses_ints = [int(m) for m in meses if m.isdigit()]
-            query = query.filter(Notificado.fecha_elaboracion != None, extract('month', Notificado.fecha_elaboracion).in_(meses_ints))
-        if idiomas:
-            query = query.filter(Notificado.idioma.in_(idiomas))
-        if modalidades:
-            query = query.filter(Notificado.modalidad.in_(modalidades))
-
-        datos_filtrados = query.all()
-        total = len(datos_filtrados)
-
-        # Agrupar datos para el gráfico único (basado en Idioma para mostrar diversidad)
-        # Si el usuario selecciona idiomas específicos, mostramos el conteo por esos idiomas
+
+        # Agrupar datos para el gráfico único (basado en Idioma para mostrar diversidad).
+        # El conteo se hace con GROUP BY en la base de datos: solo vuelven los totales por idioma.
+        conteos = conteos_notificados(['idioma'], leer_filtros(request.form))
         agrupados = {}
-        for d in datos_filtrados:
-            label = d.idioma or "Sin Idioma"
-            agrupados[label] = agrupados.get(label, 0) + 1
+        for fila in conteos:
+            label = fila['idioma'] or "Sin Idioma"
+            agrupados[label] = agrupados.get(label, 0) + fila['total']
         
         chart_data = {
             'labels': list(agrupados.keys()),
             'values': list(agrupados.values()),
-            'total': total
+            'total': sum(agrupados.values())
         }
 
     return render_template('graficos_proyeccion.html', 
@@ -437,26 +869,209 @@ def graficos_proyeccion():
                            filtros={
                                'anio': anios, 'meses': meses, 'idiomas': idiomas, 
                                'modalidades': modalidades,
-                               'tipo_grafico': tipo_grafico
+                               'tipo_grafico': tipo_grafico,
+                               'desglose': desglose
                            })
 
+@app.route('/api/graficos/conteos')
+@login_required
+def api_graficos_conteos():
+    # Desgloses para Chart.js sin recargar la página, p. ej.
+    # ?dimensiones=anio_elaboracion,mes_elaboracion,idioma&anio=2024&modalidad=ESTUDIO
+    dimensiones = [d for d in request.args.get('dimensiones', 'idioma').split(',') if d]
+    try:
+        filas = conteos_notificados(dimensiones, leer_filtros(request.args))
+    except ValueError as e:
+        return jsonify({'error': str(e), 'dimensiones_validas': list(DIMENSIONES)}), 400
+    return jsonify({
+        'dimensiones': dimensiones,
+        'filas': filas,
+        'total': sum(f['total'] for f in filas),
+        **pivotar(filas, dimensiones)
+    })
+
+@app.route('/api/graficos/proyeccion')
+@login_required
+def api_graficos_proyeccion():
+    # Pronóstico mensual con bandas del 95 %, p. ej. ?desglose=idioma&horizonte=12&modalidad=ESTUDIO
+    desglose = request.args.get('desglose', 'idioma')
+    if desglose not in DESGLOSES_PROYECCION:
+        return jsonify({'error': f'Desglose no válido: {desglose}', 'desgloses_validos': list(DESGLOSES_PROYECCION)}), 400
+    horizonte = max(1, min(request.args.get('horizonte', HORIZONTE, type=int), HORIZONTE_MAXIMO))
+    modelo = modelo_proyeccion(desglose, leer_filtros(request.args))
+    if modelo is None:
+        return jsonify({'desglose': desglose, 'series': [], 'mensaje': 'No hay suficientes meses con datos para proyectar.'})
+    return jsonify({'desglose': desglose, **pronosticar(modelo, horizonte)})
+
+@app.route('/metrics')
+def metrics():
+    # Formato texto de Prometheus. Se exige "Authorization: Bearer <METRICAS_TOKEN>", salvo desde
+    # las direcciones de METRICAS_IPS (un Prometheus en la misma máquina o red privada)
+    token = app.config['METRICAS_TOKEN']
+    con_token = bool(token) and request.headers.get('Authorization') == f'Bearer {token}'
+    if not con_token and request.remote_addr not in app.config['METRICAS_IPS']:
+        return Response('No autorizado\n', status=401, mimetype='text/plain')
+    return Response(metricas.texto_prometheus(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/metrics/consultas-lentas')
+@login_required
+def consultas_lentas():
+    # Las últimas consultas lentas con sus parámetros (pueden incluir DNIs: requiere sesión)
+    return jsonify(list(metricas.lentas))
+
+@app.route('/api/cache')
+@login_required
+def api_cache():
+    # Aciertos / fallos de la caché de resultados (por worker) y estado del almacén, más las
+    # consultas a la tabla user que se evitó load_user
+    return jsonify({**cache_resultados.estadisticas(), 'identidad': cache_identidad.estadisticas()})
+
 @app.route('/logout')
 @login_required
 def logout():
+    cache_identidad.olvidar(current_user.id, session)
     logout_user()
     return redirect(url_for('home'))
 
-with app.app_context():
+def actualizar_esquema():
     # --- AUTO-CORRECCIÓN DE BASE DE DATOS PARA PRODUCCIÓN ---
+    # No corre al importar app.py: se ejecuta una vez por despliegue con "flask --app app esquema"
+    # (ver render.yaml) o al levantar el servidor local con "python app.py".
     inspector = inspect(db.engine)
+    resumen_nuevo = not inspector.has_table("resumen_notificado")
     if inspector.has_table("notificado"):
         columns = [c['name'] for c in inspector.get_columns("notificado")]
         if "nombres_apellidos" not in columns:
             print("⚠️ Esquema desactualizado detectado. Recreando tabla 'Notificado'...")
             Notificado.__table__.drop(db.engine)
+            eliminar_indice_texto(db.engine)
+            resumen_nuevo = True
+            columns = []
+        elif "mes_elaboracion" not in columns:
+            # Columnas de año/mes agregadas después: se crean y se rellenan una sola vez
+            print("⚠️ Agregando columnas anio_elaboracion / mes_elaboracion a 'Notificado'...")
+            with db.engine.begin() as conn:
+                conn.execute(text("ALTER TABLE notificado ADD COLUMN anio_elaboracion INTEGER"))
+                conn.execute(text("ALTER TABLE notificado ADD COLUMN mes_elaboracion INTEGER"))
+                conn.execute(update(Notificado.__table__)
+                             .where(Notificado.fecha_elaboracion != None)
+                             .values(anio_elaboracion=cast(extract('year', Notificado.fecha_elaboracion), Integer),
+                                     mes_elaboracion=cast(extract('month', Notificado.fecha_elaboracion), Integer)))
+        if columns and "texto_busqueda" not in columns:
+            # El texto doblado se calcula en Python (mismo doblado que normalize_header), por lotes
+            print("⚠️ Agregando la columna texto_busqueda a 'Notificado'...")
+            with db.engine.begin() as conn:
+                conn.execute(text("ALTER TABLE notificado ADD COLUMN texto_busqueda VARCHAR(500)"))
+            print(f"   {rellenar_texto_busqueda(db.session, Notificado.__table__)} registros indexados.")
+    if inspector.has_table("fila_importacion"):
+        columns = [c['name'] for c in inspector.get_columns("fila_importacion")]
+        if "estado_duplicado" not in columns:
+            print("⚠️ Agregando columnas de revisión de duplicados a 'fila_importacion'...")
+            with db.engine.begin() as conn:
+                conn.execute(text("ALTER TABLE fila_importacion ADD COLUMN estado_duplicado VARCHAR(20)"))
+                conn.execute(text("ALTER TABLE fila_importacion ADD COLUMN detalle_duplicado VARCHAR(255)"))
+    archivo_anterior = False
+    if inspector.has_table("notificado_archivo"):
+        columns = [c['name'] for c in inspector.get_columns("notificado_archivo")]
+        if "id_original" not in columns:
+            # La primera versión usaba el id de notificado como clave: se copia aparte (CREATE TABLE AS
+            # no arrastra la clave primaria ni su nombre) y se vuelca en la tabla nueva
+            print("⚠️ Recreando 'notificado_archivo' con su propio id...")
+            with db.engine.begin() as conn:
+                conn.execute(text("CREATE TABLE notificado_archivo_anterior AS SELECT * FROM notificado_archivo"))
+                conn.execute(text("DROP TABLE notificado_archivo"))
+            archivo_anterior = True
     db.create_all()
+    if archivo_anterior:
+        datos = ', '.join(COLUMNAS_ARCHIVO + ('archivado',))
+        with db.engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO notificado_archivo (id_original, {datos}) "
+                              f"SELECT id, {datos} FROM notificado_archivo_anterior ORDER BY id"))
+            conn.execute(text("DROP TABLE notificado_archivo_anterior"))
+    if resumen_nuevo:
+        # Primera vez: el resumen se llena con los datos que ya existían
+        reconstruir_resumen(db.session, Notificado.__table__, ResumenNotificado.__table__)
+        db.session.commit()
+        cache_resultados.invalidar()
+    # create_all no agrega índices a tablas que ya existían
+    for indice in Notificado.__table__.indexes:
+        indice.create(db.engine, checkfirst=True)
+    # Índice de texto: FTS5 con triggers en SQLite, pg_trgm en PostgreSQL
+    instalar_indice_texto(db.engine, Notificado.__table__)
+
+@app.cli.command('esquema')
+def esquema_cli():
+    """Crea o actualiza las tablas e índices (una vez por despliegue, antes de gunicorn)."""
+    actualizar_esquema()
+    print("Esquema actualizado.")
+
+@app.cli.command('resumen')
+@click.option('--reconstruir', is_flag=True, help='Recalcula el resumen desde cero si hay diferencias.')
+def resumen_cli(reconstruir):
+    """Verifica la tabla resumen_notificado contra notificado."""
+    diferencias = comparar_resumen(db.session, Notificado.__table__, ResumenNotificado.__table__)
+    for clave, guardado, real in diferencias:
+        print(f"  {clave}: resumen={guardado} real={real}")
+    print(f"{len(diferencias)} diferencias encontradas.")
+    if diferencias and reconstruir:
+        grupos = reconstruir_resumen(db.session, Notificado.__table__, ResumenNotificado.__table__)
+        db.session.commit()
+        cache_resultados.invalidar()
+        print(f"Resumen reconstruido: {grupos} grupos.")
+        aviso_cache_cli()
+
+def aviso_cache_cli():
+    # invalidar() desde un comando solo llega a los workers si la caché es compartida
+    if cache_resultados.almacen.nombre == 'memoria':
+        print(f"Caché en memoria: los workers en marcha verán el cambio en a lo sumo "
+              f"{app.config['CACHE_SEGUNDOS']} s (use CACHE_RESULTADOS=sqlite para que sea inmediato).")
+
+@app.cli.command('mantenimiento')
+@click.option('--modo', type=click.Choice(MODOS_MANTENIMIENTO), required=True)
+@click.option('--destino', type=click.Choice(DESTINOS_ARCHIVO), default='tabla', help='Solo en modo archivar.')
+@click.option('--anio', multiple=True)
+@click.option('--mes', multiple=True)
+@click.option('--idioma', multiple=True)
+@click.option('--modalidad', multiple=True)
+@click.option('--q', default='', help='Texto libre, como el buscador de verificar_notificados.')
+@click.option('--simular', 'solo_simular', is_flag=True, help='Solo cuenta las filas afectadas.')
+@click.option('--si', is_flag=True, help='No pedir confirmación.')
+def mantenimiento_cli(modo, destino, anio, mes, idioma, modalidad, q, solo_simular, si):
+    """Elimina o archiva notificados por filtros, por lotes (p. ej. --modo archivar --anio 2020)."""
+    filtros = leer_filtros(MultiDict([('anio', a) for a in anio] + [('mes', m) for m in mes] +
+                                     [('idioma', i) for i in idioma] + [('modalidad', m) for m in modalidad] +
+                                     [('q', q)]))
+    try:
+        validar(filtros, modo, destino)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    simulacion = simular(db.session, Notificado.__table__, filtros, ResumenNotificado.__table__)
+    print(texto_simulacion(simulacion, modo) + '.')
+    if solo_simular or not simulacion['total']:
+        return
+    if not si:
+        click.confirm('¿Continuar?', abort=True)
+    total = simulacion['total']
+    filas, destino_final = ejecutar_mantenimiento(
+        filtros, modo, destino, avance=lambda n: print(f"  {n} de {total} filas", end='\r', flush=True))
+    print(f"\n{filas} registros procesados" + (f" (archivo: {destino_final})." if destino_final else '.'))
+    aviso_cache_cli()
+
+@app.cli.command('explicar-filtros')
+def explicar_filtros():
+    """Muestra el plan de ejecución de los filtros típicos y si usan índice."""
+    tabla = Notificado.__table__
+    for filtros in FILTROS_EJEMPLO:
+        consulta = db.select(tabla.c.id).where(*condiciones_filtros(tabla, filtros))
+        plan = plan_consulta(db.session, consulta)
+        print(f"{'OK  ' if usa_indice(plan) else 'SCAN'} {filtros}")
+        for linea in plan:
+            print(f"       {linea}")
+        db.session.rollback()
 
 if __name__ == '__main__':
+    with app.app_context():
+        actualizar_esquema()
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_DEBUG', 'false').lower() in ('1', 'true', 'yes')
     app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
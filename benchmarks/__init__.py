@@ -0,0 +1 @@
+"""Benchmarks del sistema de notificados (se ejecutan con ``python -m benchmarks.<modulo>``)."""
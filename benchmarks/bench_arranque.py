@@ -0,0 +1,59 @@
+"""Tiempo de arranque: importar app.py y atender la primera petición, en un proceso nuevo.
+
+Cada medición corre en un intérprete limpio (como un worker de gunicorn recién creado),
+y por separado se mide "flask esquema", que ya no forma parte del arranque.
+
+Uso:  python -m benchmarks.bench_arranque [repeticiones]     (por defecto 5)
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEDICION = r"""
+import json, sys, time
+inicio = time.perf_counter()
+import app
+importado = time.perf_counter()
+cliente = app.app.test_client()
+respuesta = cliente.get('/login')
+primera = time.perf_counter()
+print(json.dumps({
+    'importar': importado - inicio,
+    'primera_peticion': primera - importado,
+    'estado': respuesta.status_code,
+    'modulos_pesados': [m for m in ('pandas', 'numpy', 'openpyxl') if m in sys.modules],
+}))
+"""
+
+
+def medir(entorno):
+    salida = subprocess.run([sys.executable, '-c', MEDICION], cwd=RAIZ, env=entorno,
+                            capture_output=True, text=True, check=True)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    entorno = dict(os.environ)
+    entorno.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_arranque.db'))
+
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'esquema'], cwd=RAIZ, env=entorno,
+                   capture_output=True, check=True)
+    print(f'flask esquema (una vez por despliegue)   {time.perf_counter() - inicio:6.2f} s')
+
+    mediciones = [medir(entorno) for _ in range(repeticiones)]
+    for clave, nombre in (('importar', 'import app'), ('primera_peticion', 'primera petición (GET /login)')):
+        valores = [m[clave] for m in mediciones]
+        print(f'{nombre:<40} {statistics.median(valores):6.3f} s   (mín {min(valores):.3f}, máx {max(valores):.3f})')
+    print(f"módulos pesados cargados al arrancar: {mediciones[-1]['modulos_pesados'] or 'ninguno'}")
+
+
+if __name__ == '__main__':
+    main()
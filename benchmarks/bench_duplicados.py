@@ -0,0 +1,127 @@
+"""Tiempo de la revisión de duplicados de la vista previa: archivo de N filas contra la tabla.
+
+El archivo mezcla filas que ya están en notificado, variantes "sucias" de ellas (DNI sin
+ceros, un dígito cambiado, nombre sin tildes o en otro orden), filas repetidas dentro del
+mismo archivo y filas nuevas; al final se compara lo detectado con lo esperado.
+
+Uso:  python -m benchmarks.bench_duplicados [filas_tabla] [filas_archivo]   (por defecto 1000000 y 20000)
+      python -m benchmarks.bench_duplicados --database-url postgresql://localhost/bench --limpiar
+
+Por defecto usa un SQLite temporal. Con --database-url la base debe estar vacía o se
+debe pasar --limpiar (borra TODAS las tablas de la app antes de empezar).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import select
+
+from benchmarks.generador import notificados_sinteticos, poblar_notificados
+from duplicados import DUPLICADO, NUEVO, PROBABLE, normalizar_nombre
+from importacion import CAMPOS_TABLA
+
+SIN_TILDES = str.maketrans('ÁÉÍÓÚÑ', 'AEIOUN')
+
+
+def cambiar_digito(rnd, dni):
+    i = rnd.randrange(len(dni))
+    return dni[:i] + str((int(dni[i]) + rnd.randint(1, 9)) % 10) + dni[i + 1:]
+
+
+def archivo_sintetico(existentes, filas, semilla=5):
+    # Devuelve (filas del archivo, estado esperado de cada una)
+    rnd = random.Random(semilla)
+    nuevas = notificados_sinteticos(filas, semilla=semilla + 1000)
+    salida, esperado = [], []
+    for i in range(filas):
+        tipo = rnd.random()
+        base = dict(rnd.choice(existentes))
+        if tipo < 0.25:
+            fila, estado = base, DUPLICADO
+        elif tipo < 0.30 and base['dni'].startswith('0'):
+            fila, estado = dict(base, dni=base['dni'].lstrip('0')), PROBABLE
+        elif tipo < 0.35:
+            # Otro DNI para el mismo libro (error de tipeo), con el nombre sin tildes y en otro orden
+            nombre = base['nombres_apellidos'].translate(SIN_TILDES).split()
+            fila = dict(base, dni=cambiar_digito(rnd, base['dni']), nombres_apellidos=' '.join(nombre[-1:] + nombre[:-1]))
+            estado = PROBABLE
+        elif tipo < 0.40 and salida:
+            fila, estado = dict(rnd.choice(salida)), DUPLICADO  # Repetida dentro del archivo
+        else:
+            fila = next(nuevas)
+            fila['codigo_libro'] = f"NUEVO-{i:07d}"
+            fila['dni'] = f"9{fila['dni'][1:]}"  # Fuera del rango de la tabla
+            estado = None  # Nuevo, salvo que choque con otra fila nueva del archivo
+        salida.append({c: '' if fila.get(c) is None else str(fila.get(c)) for c in CAMPOS_TABLA})
+        esperado.append(estado)
+    return salida, esperado
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tiempo de la revisión de duplicados de la vista previa.')
+    parser.add_argument('filas_tabla', type=int, nargs='?', default=1000000)
+    parser.add_argument('filas_archivo', type=int, nargs='?', default=20000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--database-url', help='Por defecto, un SQLite temporal.')
+    parser.add_argument('--limpiar', action='store_true', help='Borra las tablas de la app antes de empezar.')
+    args = parser.parse_args()
+    filas_tabla, filas_archivo = args.filas_tabla, args.filas_archivo
+
+    # app.py lee DATABASE_URL al importarse
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_duplicados.db')
+    from app import (app, db, Notificado, FilaImportacion, ResumenNotificado, actualizar_esquema,
+                     agregar_filas_importacion, cache_resultados, conteo_duplicados, crear_importacion,
+                     revisar_duplicados)
+    from resumen import reconstruir_resumen
+
+    with app.app_context():
+        if args.limpiar:
+            db.drop_all()
+        actualizar_esquema()
+        tabla = Notificado.__table__
+        if Notificado.query.first() is not None:
+            sys.exit('La base de datos no está vacía; use --limpiar o una base nueva.')
+        inicio = time.perf_counter()
+        poblar_notificados(db.session, tabla, filas_tabla)
+        reconstruir_resumen(db.session, tabla, ResumenNotificado.__table__)
+        db.session.commit()
+        cache_resultados.invalidar()
+        print(f"tabla: {filas_tabla} filas en {time.perf_counter() - inicio:.1f} s")
+
+        rnd = random.Random(3)
+        ids = rnd.sample(range(1, filas_tabla + 1), min(filas_tabla, filas_archivo))
+        existentes = [dict(f) for f in db.session.execute(
+            select(tabla.c.nombres_apellidos, tabla.c.dni, tabla.c.idioma, tabla.c.codigo_libro)
+            .where(tabla.c.id.in_(ids))).mappings()]
+        filas, esperado = archivo_sintetico(existentes, filas_archivo)
+
+        importacion = crear_importacion('bench.xlsx', usuario_id=1)
+        agregar_filas_importacion(importacion, filas)
+        db.session.commit()
+
+        tiempos = []
+        for _ in range(args.repeticiones):
+            normalizar_nombre.cache_clear()  # Cada repetición en frío, como una importación nueva
+            inicio = time.perf_counter()
+            revisar_duplicados(importacion)
+            db.session.commit()
+            tiempos.append(time.perf_counter() - inicio)
+        print(f"archivo: {filas_archivo} filas  ->  revisión en {statistics.median(tiempos) * 1000:.0f} ms"
+              f" (mediana; mín {min(tiempos) * 1000:.0f} ms)")
+        print(f"  {conteo_duplicados(importacion)}")
+
+        obtenidos = [e for (e,) in db.session.query(FilaImportacion.estado_duplicado).filter(
+            FilaImportacion.importacion_id == importacion.id).order_by(FilaImportacion.fila)]
+        for estado in (DUPLICADO, PROBABLE):
+            casos = [o for e, o in zip(esperado, obtenidos) if e == estado]
+            print(f"  esperados {estado:9s} {len(casos):6d}  detectados como tal {casos.count(estado):6d}")
+        nuevas = [o for e, o in zip(esperado, obtenidos) if e is None]
+        print(f"  filas nuevas      {len(nuevas):6d}  marcadas nuevo {nuevas.count(NUEVO):6d}")
+
+
+if __name__ == '__main__':
+    main()
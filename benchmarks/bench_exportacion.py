@@ -0,0 +1,116 @@
+"""Memoria pico de la exportación de reporte_filtrado: versión en memoria vs. streaming.
+
+Uso:  python -m benchmarks.bench_exportacion [filas ...]     (por defecto 1000 y 50000)
+      python -m benchmarks.bench_exportacion 50000 --database-url postgresql://localhost/bench --limpiar
+
+Por defecto usa un SQLite temporal. Con --database-url la base debe estar vacía o se
+debe pasar --limpiar (borra TODAS las tablas de la app antes de empezar).
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import pandas as pd
+from sqlalchemy import delete, insert
+
+# app.py lee DATABASE_URL al importarse: se importa en main(), después de fijarla
+app = db = Notificado = ResumenNotificado = cache_resultados = None
+
+
+def poblar(filas, semilla=11):
+    from resumen import reconstruir_resumen
+
+    rnd = random.Random(semilla)
+    tabla = Notificado.__table__
+    db.session.execute(delete(tabla))  # Solo filas de la corrida anterior: la base empezó vacía
+    base = date(2020, 1, 1)
+    for inicio in range(0, filas, 10000):
+        lote = []
+        for i in range(inicio, min(filas, inicio + 10000)):
+            fecha = base + timedelta(days=rnd.randint(0, 3650))
+            lote.append({
+                'nombres_apellidos': f'PARTICIPANTE {i}', 'dni': str(rnd.randint(10000000, 79999999)),
+                'idioma': rnd.choice(['Ingles', 'Portugues', 'Italiano', 'Quechua']),
+                'codigo_libro': f'L-{rnd.randint(1, 999)}', 'anio': str(fecha.year),
+                'fecha_elaboracion': fecha, 'anio_elaboracion': fecha.year, 'mes_elaboracion': fecha.month,
+                'modalidad': rnd.choice(['UBICACIÓN', 'ACREDITACIÓN', 'SUFICIENCIA', 'ESTUDIO']),
+            })
+        db.session.execute(insert(tabla), lote)
+    reconstruir_resumen(db.session, tabla, ResumenNotificado.__table__)
+    db.session.commit()
+    cache_resultados.invalidar()
+
+
+def exportar_en_memoria(filtros):
+    from filtros import condiciones_filtros
+
+    # Camino anterior: query.all() -> lista de dicts -> DataFrame -> workbook en BytesIO
+    query = Notificado.query.filter(*condiciones_filtros(Notificado.__table__, filtros))
+    data_export = []
+    for n in query.all():
+        data_export.append({
+            'NOMBRES Y APELLIDOS': n.nombres_apellidos, 'DNI': n.dni, 'IDIOMA': n.idioma,
+            'CODIGO LIBRO': n.codigo_libro,
+            'AÑO': n.fecha_elaboracion.year if n.fecha_elaboracion else '',
+            'MES': n.fecha_elaboracion.strftime('%B') if n.fecha_elaboracion else '',
+            'MODALIDAD': n.modalidad
+        })
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        pd.DataFrame(data_export).to_excel(writer, index=False, sheet_name='Filtrados')
+    return len(output.getvalue())
+
+
+def exportar_streaming(filtros, formato):
+    from exportacion import generar_reporte
+
+    return sum(len(trozo) for trozo in generar_reporte(db.session, Notificado.__table__, filtros, formato))
+
+
+def medir(funcion, *args):
+    db.session.expunge_all()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    tamanio = funcion(*args)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return segundos, pico / 1024 / 1024, tamanio
+
+
+def main():
+    global app, db, Notificado, ResumenNotificado, cache_resultados
+
+    parser = argparse.ArgumentParser(description='Memoria pico de la exportación de reportes.')
+    parser.add_argument('filas', type=int, nargs='*', default=[1000, 50000])
+    parser.add_argument('--database-url', help='Por defecto, un SQLite temporal.')
+    parser.add_argument('--limpiar', action='store_true', help='Borra las tablas de la app antes de empezar.')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_exportacion.db')
+    from app import app, db, Notificado, ResumenNotificado, actualizar_esquema, cache_resultados
+
+    with app.app_context():
+        if args.limpiar:
+            db.drop_all()
+        actualizar_esquema()
+        if Notificado.query.first() is not None:
+            sys.exit('La base de datos no está vacía; use --limpiar o una base nueva.')
+        for filas in args.filas:
+            poblar(filas)
+            print(f'filas={filas}')
+            casos = [('en memoria xlsx', exportar_en_memoria, {})]
+            casos += [(f'streaming {f}', exportar_streaming, {}, f) for f in ('xlsx', 'csv')]
+            for nombre, funcion, *args in casos:
+                segundos, pico, tamanio = medir(funcion, *args)
+                print(f'  {nombre:16s} {segundos:7.2f} s   pico {pico:8.1f} MB   archivo {tamanio / 1024:9.0f} KB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Compara el mapeo vectorizado de importacion.py con el recorrido fila por fila original.
+
+Uso:  python -m benchmarks.bench_importacion [filas]
+"""
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.generador import roster_sintetico
+from importacion import construir_datos_tabla, normalize_header
+
+
+def datos_tabla_por_filas(df):
+    # Implementación original de cargar_excel (df.iterrows + get_val por campo), conservada como referencia
+    df = df.copy()
+    df.columns = [normalize_header(col) for col in df.columns]
+
+    def get_val(row, aliases):
+        for alias in aliases:
+            if alias in row.index:
+                val = row[alias]
+                if pd.isna(val) or val == '': return ''
+                return val
+        return ''
+
+    def format_date(val):
+        if pd.isna(val) or str(val).strip() == '': return ''
+        try:
+            if isinstance(val, (pd.Timestamp, datetime)):
+                return val.strftime('%Y-%m-%d')
+            if isinstance(val, (int, float)): return pd.to_datetime(val, unit='D', origin='1899-12-30').strftime('%Y-%m-%d')
+            dt = pd.to_datetime(str(val).strip(), errors='coerce')
+            return dt.strftime('%Y-%m-%d') if pd.notna(dt) else ''
+        except:
+            return ''
+
+    def clean_dni(val):
+        if not val: return ''
+        try:
+            return str(int(float(val)))
+        except:
+            return str(val).strip()
+
+    def normalize_text(val):
+        if not val: return ''
+        val = str(val).upper().strip()
+        if 'INGL' in val: return 'Ingles'
+        if 'PORT' in val: return 'Portugues'
+        if 'ITAL' in val: return 'Italiano'
+        if 'QUECH' in val: return 'Quechua'
+        return val
+
+    datos_tabla = []
+    for _, row in df.iterrows():
+        nombres_full = get_val(row, ['NOMBRES Y APELLIDOS', 'APELLIDOS Y NOMBRES', 'ALUMNO', 'ESTUDIANTE', 'NOMBRE COMPLETO', 'PARTICIPANTE'])
+        if not nombres_full:
+            nom = get_val(row, ['NOMBRES', 'NOMBRE'])
+            ape = get_val(row, ['APELLIDOS', 'APELLIDO'])
+            if nom or ape:
+                nombres_full = f"{nom} {ape}".strip()
+        datos_tabla.append({
+            'nombres_apellidos': nombres_full,
+            'dni': clean_dni(get_val(row, ['DNI', 'DOCUMENTO', 'IDENTIFICACION', 'NUMERO DOCUMENTO', 'DOC', 'CEDULA'])),
+            'idioma': normalize_text(get_val(row, ['IDIOMA', 'LENGUA', 'CURSO', 'LENGUA EXTRANJERA', 'MATERIA'])),
+            'codigo_libro': get_val(row, ['CODIGO Y N DE LIBRO', 'COD Y N DE LIBRO', 'CODIGO Y NUMERO DE LIBRO', 'CODIGO', 'LIBRO', 'N LIBRO', 'NRO LIBRO', 'NUMERO DE LIBRO', 'COD LIBRO']),
+            'anio': get_val(row, ['ANO', 'ANIO', 'YEAR', 'PERIODO', 'FECHA ANUAL', 'EJERCICIO']),
+            'fecha_elaboracion': format_date(get_val(row, ['FECHA ELABORACION', 'FECHA DE ELABORACION', 'F ELABORACION', 'ELABORACION', 'F ELAB', 'FECHA ELAB', 'ELAB'])),
+            'fecha_entrega': format_date(get_val(row, ['FECHA ENTREGA', 'FECHA DE ENTREGA', 'F ENTREGA', 'ENTREGA', 'F ENT', 'FECHA ENT', 'ENTREGADO'])),
+            'correo_entrega': str(get_val(row, ['CORREO DE ENTREGA', 'CORREO', 'EMAIL', 'CORREO ELECTRONICO', 'MAIL', 'CONTACTO'])).strip().lower(),
+            'modalidad': str(get_val(row, ['MODALIDAD', 'TIPO', 'MODALIDAD DE ESTUDIO', 'FORMA', 'CATEGORIA'])).upper().strip()
+        })
+    return datos_tabla
+
+
+def medir(funcion, df, repeticiones=3):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(df)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos), resultado
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    df = roster_sintetico(filas)
+    t_filas, esperado = medir(datos_tabla_por_filas, df, repeticiones=1)
+    t_vector, obtenido = medir(construir_datos_tabla, df)
+
+    diferencias = [i for i, (a, b) in enumerate(zip(esperado, obtenido)) if a != b]
+    print(f"filas={filas}")
+    print(f"por filas:    {t_filas * 1000:9.1f} ms")
+    print(f"vectorizado:  {t_vector * 1000:9.1f} ms  (x{t_filas / t_vector:.1f})")
+    print(f"resultados idénticos: {len(esperado) == len(obtenido) and not diferencias}")
+    for i in diferencias[:5]:
+        print(f"  fila {i}: {esperado[i]} != {obtenido[i]}")
+
+
+if __name__ == '__main__':
+    main()
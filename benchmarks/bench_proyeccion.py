@@ -0,0 +1,66 @@
+"""Costo del ajuste de proyecciones según el número de series (ver proyeccion.py).
+
+Genera conteos mensuales sintéticos (tendencia, picos en marzo, julio y diciembre y
+ruido) para S series y mide ajustar_modelos, que resuelve todas en un solo lstsq, contra
+el mismo ajuste serie por serie; luego mide pronosticar sobre el modelo ya ajustado,
+que es lo que cuesta una petición con el modelo en caché.
+
+Uso:  python -m benchmarks.bench_proyeccion [series] [meses]     (por defecto 500 y 72)
+"""
+import random
+import sys
+import time
+from datetime import date
+
+from proyeccion import HORIZONTE, ajustar_modelos, pronosticar
+
+PICOS = (3, 7, 12)
+
+
+def conteos_sinteticos(series, meses, hasta, semilla=1):
+    rnd = random.Random(semilla)
+    fin = hasta.year * 12 + hasta.month - 1
+    filas = []
+    for s in range(series):
+        base, crecimiento = rnd.uniform(5, 500), rnd.uniform(-0.005, 0.02)
+        for i in range(meses):
+            indice = fin - meses + i
+            anio, mes = divmod(indice, 12)
+            valor = base * (1 + crecimiento * i) * (1.8 if mes + 1 in PICOS else 1) + rnd.gauss(0, base * 0.1)
+            filas.append({'anio_elaboracion': anio, 'mes_elaboracion': mes + 1, 'serie': f'S{s:04d}',
+                          'total': max(0, int(valor))})
+    return filas
+
+
+def cronometrar(funcion, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos) * 1000, resultado
+
+
+def main():
+    series = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    meses = int(sys.argv[2]) if len(sys.argv) > 2 else 72
+    hasta = date.today()
+    filas = conteos_sinteticos(series, meses, hasta)
+    por_serie = {}
+    for fila in filas:
+        por_serie.setdefault(fila['serie'], []).append(fila)
+
+    ms_lote, modelo = cronometrar(lambda: ajustar_modelos(filas, ['serie'], hasta))
+    ms_uno_a_uno, _ = cronometrar(lambda: [ajustar_modelos(f, ['serie'], hasta) for f in por_serie.values()], 1)
+    ms_pronostico, resultado = cronometrar(lambda: pronosticar(modelo, HORIZONTE))
+
+    print(f"{series} series x {meses} meses ({len(filas)} conteos), {modelo['armonicos']} armónicos")
+    print(f"  ajuste en lote      {ms_lote:8.1f} ms")
+    print(f"  ajuste serie a serie{ms_uno_a_uno:8.1f} ms")
+    print(f"  pronóstico {HORIZONTE} meses {ms_pronostico:8.1f} ms")
+    total = resultado['series'][-1]
+    print(f"  {total['nombre']}: {total['pronostico'][:3]} ... banda [{total['inferior'][0]}, {total['superior'][0]}]")
+
+
+if __name__ == '__main__':
+    main()
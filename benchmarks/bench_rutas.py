@@ -0,0 +1,291 @@
+"""Suite de benchmarks por ruta con datos sintéticos (ver benchmarks/generador.py).
+
+Llena notificado y user con datos deterministas y recorre con el cliente de pruebas de
+Flask los caminos críticos: cargar_excel, guardar_bd, la búsqueda (por filtros y por
+texto), la paginación, la exportación y el borrado de verificar_notificados, graficos_proyeccion y el endpoint de
+conteos. El resultado es un JSON con percentiles de latencia, memoria pico y filas por
+segundo, para comparar entre versiones. La memoria se mide con tracemalloc en una
+repetición extra, fuera de las cronometradas (tracemalloc hace todo varias veces más lento).
+La caché de resultados se vacía antes de cada escenario: ``frio_ms`` es la primera
+repetición (sin aciertos) y ``caliente_p50_ms`` la mediana de las demás.
+
+Uso:
+  python -m benchmarks.bench_rutas --filas 10000 --salida resultados.json
+  python -m benchmarks.bench_rutas --filas 1000000 --comparar resultados.json
+  python -m benchmarks.bench_rutas --database-url postgresql://localhost/bench --limpiar
+
+Por defecto usa un SQLite temporal. Con --database-url la base debe estar vacía o se
+debe pasar --limpiar (borra TODAS las tablas de la app antes de empezar).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ESCENARIOS = ['cargar_excel', 'guardar_bd', 'buscar', 'buscar_texto', 'paginar', 'exportar', 'graficos', 'conteos', 'eliminar']
+UMBRAL_REGRESION = 1.2
+CLAVE_BENCHMARK = 'benchmark'
+
+
+def percentil(valores, p):
+    # Rango más cercano: suficiente para las pocas repeticiones de un benchmark
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))]
+
+
+def filtros_aleatorios(rnd):
+    from benchmarks.generador import ANIO_FIN, ANIO_INICIO, IDIOMAS, MODALIDADES
+
+    datos = {}
+    if rnd.random() < 0.7:
+        datos['anio'] = [str(a) for a in rnd.sample(range(ANIO_INICIO, ANIO_FIN + 1), rnd.randint(1, 2))]
+    if rnd.random() < 0.3:
+        datos['mes'] = [str(m) for m in rnd.sample(range(1, 13), rnd.randint(1, 3))]
+    if rnd.random() < 0.5:
+        datos['idioma'] = [rnd.choice([i for i, _ in IDIOMAS if i])]
+    if rnd.random() < 0.3:
+        datos['modalidad'] = [rnd.choice([m for m, _ in MODALIDADES if m])]
+    return datos
+
+
+class Suite:
+    def __init__(self, m, args):
+        self.m = m  # módulo app
+        self.args = args
+        self.rnd = random.Random(args.semilla)
+        self.cliente = m.app.test_client()
+        self.importaciones = []
+        self.rosters = []
+
+    def esperar_trabajo(self, respuesta):
+        trabajo = respuesta.get_json()
+        while trabajo['estado'] not in ('terminado', 'fallido'):
+            time.sleep(0.02)
+            trabajo = self.cliente.get(trabajo['url_estado']).get_json()
+        if trabajo['estado'] == 'fallido':
+            raise RuntimeError(f"Trabajo fallido: {trabajo['mensaje']}")
+        return trabajo
+
+    # --- Escenarios: cada uno devuelve las filas procesadas (o None si no aplica) ---
+    def cargar_excel(self, i):
+        roster = self.rosters[i]
+        roster.seek(0)
+        respuesta = self.cliente.post('/api/trabajos/importacion', data={'file': (roster, 'padron.xlsx')},
+                                      content_type='multipart/form-data')
+        trabajo = self.esperar_trabajo(respuesta)
+        self.importaciones.append(trabajo['url_resultado'].split('import_id=')[1])
+        return trabajo['progreso']
+
+    def guardar_bd(self, i):
+        import_id = self.importaciones[i]
+        with self.m.app.app_context():
+            filas = self.m.db.session.get(self.m.Importacion, import_id).total_filas
+        self.cliente.post(f'/registrar_notificados?import_id={import_id}',
+                          data={'accion': 'guardar_bd', 'modo_guardado': 'actualizar'})
+        return filas
+
+    def buscar(self, i):
+        respuesta = self.cliente.post('/verificar_notificados', data=filtros_aleatorios(self.rnd))
+        return respuesta.data.count(b'name="eliminar_ids"')
+
+    def buscar_texto(self, i):
+        # Apellido y nombre, un apellido sin tildes o el inicio de un DNI, como los escribe un usuario
+        from benchmarks.generador import APELLIDOS, NOMBRES
+
+        consulta = self.rnd.choice([
+            f"{self.rnd.choice(APELLIDOS)} {self.rnd.choice(NOMBRES)}".lower(),
+            self.rnd.choice(APELLIDOS).translate(str.maketrans('ÁÉÍÓÚÑ', 'AEIOUN')),
+            str(self.rnd.randint(10000, 79999)),
+        ])
+        respuesta = self.cliente.post('/verificar_notificados', data={'q': consulta})
+        return respuesta.data.count(b'name="eliminar_ids"')
+
+    def paginar(self, i):
+        # Primera página y diez más siguiendo el cursor keyset
+        filtros = filtros_aleatorios(self.rnd)
+        datos = self.cliente.get('/api/notificados', query_string=filtros).get_json()
+        filas = len(datos['filas'])
+        for _ in range(10):
+            if not datos['siguiente']:
+                break
+            datos = self.cliente.get('/api/notificados', query_string={**filtros, 'cursor': datos['siguiente']}).get_json()
+            filas += len(datos['filas'])
+        return filas
+
+    def exportar(self, i):
+        respuesta = self.cliente.post('/api/trabajos/exportacion',
+                                      data={**filtros_aleatorios(self.rnd), 'formato': self.args.formato})
+        trabajo = self.esperar_trabajo(respuesta)
+        self.cliente.get(trabajo['url_resultado']).close()
+        return trabajo['progreso']
+
+    def graficos(self, i):
+        self.cliente.post('/graficos_proyeccion', data={**filtros_aleatorios(self.rnd), 'tipo_grafico': 'bar'})
+        return None
+
+    def conteos(self, i):
+        self.cliente.get('/api/graficos/conteos', query_string={
+            **filtros_aleatorios(self.rnd), 'dimensiones': 'anio_elaboracion,mes_elaboracion,idioma'})
+        return None
+
+    def eliminar(self, i):
+        with self.m.app.app_context():
+            tabla = self.m.Notificado.__table__
+            desde = self.rnd.randint(1, max(1, self.args.filas - 100))
+            ids = [fila.id for fila in self.m.db.session.execute(
+                self.m.db.select(tabla.c.id).where(tabla.c.id >= desde).order_by(tabla.c.id).limit(100))]
+        self.cliente.post('/verificar_notificados', data={'accion': 'eliminar', 'eliminar_ids': [str(x) for x in ids]})
+        return len(ids)
+
+    def medir(self, nombre):
+        funcion = getattr(self, nombre)
+        tiempos, filas = [], 0
+        # Cada escenario empieza con la caché vacía (no hereda aciertos del anterior): la primera
+        # repetición mide en frío y las demás pueden acertar si repiten filtros
+        self.m.cache_resultados.invalidar()
+        for i in range(self.args.repeticiones):
+            inicio = time.perf_counter()
+            procesadas = funcion(i)
+            tiempos.append(time.perf_counter() - inicio)
+            filas = None if procesadas is None else filas + procesadas
+        tracemalloc.start()
+        funcion(self.args.repeticiones)
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {
+            'repeticiones': len(tiempos),
+            'p50_ms': round(percentil(tiempos, 50) * 1000, 2),
+            'p90_ms': round(percentil(tiempos, 90) * 1000, 2),
+            'p99_ms': round(percentil(tiempos, 99) * 1000, 2),
+            'max_ms': round(max(tiempos) * 1000, 2),
+            'media_ms': round(sum(tiempos) / len(tiempos) * 1000, 2),
+            'frio_ms': round(tiempos[0] * 1000, 2),
+            'caliente_p50_ms': round(percentil(tiempos[1:], 50) * 1000, 2) if len(tiempos) > 1 else None,
+            'pico_memoria_mb': round(pico / 1024 / 1024, 2),
+            'filas_por_segundo': round(filas / sum(tiempos), 1) if filas else None,
+        }
+
+
+def preparar(m, args):
+    from werkzeug.security import generate_password_hash
+
+    from benchmarks.generador import poblar_notificados, poblar_usuarios
+    from resumen import reconstruir_resumen
+
+    with m.app.app_context():
+        if args.limpiar:
+            m.db.drop_all()
+        m.actualizar_esquema()
+        if m.Notificado.query.first() is not None or m.User.query.first() is not None:
+            sys.exit('La base de datos no está vacía; use --limpiar o una base nueva.')
+
+        emails = poblar_usuarios(m.db.session, m.User.__table__, args.usuarios,
+                                 generate_password_hash(CLAVE_BENCHMARK), semilla=args.semilla)
+        inicio = time.perf_counter()
+        poblar_notificados(m.db.session, m.Notificado.__table__, args.filas, semilla=args.semilla)
+        segundos = time.perf_counter() - inicio
+        reconstruir_resumen(m.db.session, m.Notificado.__table__, m.ResumenNotificado.__table__)
+        m.db.session.commit()
+        m.cache_resultados.invalidar()
+        motor = m.db.engine.dialect.name
+    return emails[0], motor, {'poblar_s': round(segundos, 2), 'filas_por_segundo': round(args.filas / segundos, 1)}
+
+
+def version_codigo():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, ruta_anterior):
+    with open(ruta_anterior, encoding='utf-8') as archivo:
+        anterior = json.load(archivo)
+    print(f"\nComparación con {ruta_anterior} (versión {anterior.get('version')}):")
+    for nombre, datos in actual['escenarios'].items():
+        previo = anterior.get('escenarios', {}).get(nombre)
+        if not previo:
+            continue
+        razon = datos['p50_ms'] / previo['p50_ms'] if previo['p50_ms'] else float('inf')
+        marca = 'REGRESIÓN' if razon > UMBRAL_REGRESION else ''
+        print(f"  {nombre:<14} p50 {previo['p50_ms']:>9.1f} -> {datos['p50_ms']:>9.1f} ms  x{razon:.2f} {marca}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de las rutas principales con datos sintéticos.')
+    parser.add_argument('--filas', type=int, default=10000, help='Filas de notificado (10k a 5M).')
+    parser.add_argument('--usuarios', type=int, default=1000)
+    parser.add_argument('--filas-excel', type=int, default=2000, help='Filas de cada padrón subido.')
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--formato', choices=['xlsx', 'csv', 'tsv'], default='xlsx')
+    parser.add_argument('--escenarios', default=','.join(ESCENARIOS), help='Lista separada por comas.')
+    parser.add_argument('--database-url', help='Por defecto, un SQLite temporal.')
+    parser.add_argument('--limpiar', action='store_true', help='Borra las tablas de la app antes de empezar.')
+    parser.add_argument('--sin-cache', action='store_true', help='Desactiva la caché de resultados.')
+    parser.add_argument('--salida', help='Archivo JSON donde guardar los resultados.')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior para detectar regresiones.')
+    args = parser.parse_args()
+
+    escenarios = [e for e in args.escenarios.split(',') if e]
+    desconocidos = set(escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    # La configuración de app.py se lee del entorno al importarla
+    os.environ['DATABASE_URL'] = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['TRABAJOS_DIR'] = tempfile.mkdtemp()
+    if args.sin_cache:
+        os.environ['CACHE_TAM_MAXIMO'] = '0'
+    import app as m
+    from benchmarks.generador import roster_excel
+
+    email, motor, preparacion = preparar(m, args)
+    suite = Suite(m, args)
+    # Una repetición más que las cronometradas: la de la medición de memoria
+    suite.rosters = [roster_excel(args.filas_excel, semilla=args.semilla + 100 + i) for i in range(args.repeticiones + 1)]
+    suite.cliente.post('/login', data={'email': email, 'password': CLAVE_BENCHMARK})
+    if 'guardar_bd' in escenarios and 'cargar_excel' not in escenarios:
+        escenarios.insert(escenarios.index('guardar_bd'), 'cargar_excel')  # guardar_bd usa lo que se cargó
+
+    resultados = {}
+    for nombre in escenarios:
+        resultados[nombre] = suite.medir(nombre)
+        datos = resultados[nombre]
+        filas_s = f"{datos['filas_por_segundo']:>10.0f} filas/s" if datos['filas_por_segundo'] else ''
+        print(f"{nombre:<14} p50 {datos['p50_ms']:>9.1f} ms  p90 {datos['p90_ms']:>9.1f} ms  "
+              f"frío {datos['frio_ms']:>9.1f} ms  pico {datos['pico_memoria_mb']:>7.1f} MB  {filas_s}")
+
+    actual = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'version': version_codigo(),
+        'python': platform.python_version(),
+        'motor': motor,
+        'filas_notificado': args.filas,
+        'usuarios': args.usuarios,
+        'filas_excel': args.filas_excel,
+        'repeticiones': args.repeticiones,
+        'semilla': args.semilla,
+        'cache': not args.sin_cache,
+        'preparacion': preparacion,
+        'escenarios': resultados,
+    }
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(actual, archivo, ensure_ascii=False, indent=2)
+        print(f"Resultados guardados en {args.salida}")
+    if args.comparar:
+        comparar(actual, args.comparar)
+
+
+if __name__ == '__main__':
+    main()
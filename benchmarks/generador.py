@@ -0,0 +1,170 @@
+"""Datos sintéticos deterministas para los benchmarks.
+
+- ``notificados_sinteticos`` / ``poblar_notificados``: filas de notificado con las
+  distribuciones reales aproximadas (idiomas y modalidades de los formularios, fechas
+  2020-2030 con meses pico, DNIs peruanos de 8 dígitos y personas con varios libros).
+- ``poblar_usuarios``: cuentas de User con el mismo hash de contraseña.
+- ``roster_sintetico`` / ``roster_excel``: padrones Excel "sucios" como los que se
+  suben en registrar_notificados (cabeceras variadas, tildes, fechas mezcladas).
+
+La misma semilla produce siempre los mismos datos, a cualquier tamaño (10k a 5M filas).
+"""
+import io
+import random
+from datetime import date, datetime, timedelta
+
+from persistencia import insertar_bloque
+from texto import texto_busqueda
+
+IDIOMAS = [('Ingles', 55), ('Portugues', 20), ('Italiano', 12), ('Quechua', 10), (None, 3)]
+MODALIDADES = [('ESTUDIO', 40), ('UBICACIÓN', 20), ('SUFICIENCIA', 15), ('ACREDITACIÓN', 15),
+               ('ACTUALIZACIÓN', 7), (None, 3)]
+# Más certificados en los cierres de ciclo (marzo, julio, diciembre)
+PESOS_MESES = [6, 7, 12, 8, 8, 7, 12, 8, 8, 8, 7, 9]
+ANIO_INICIO, ANIO_FIN = 2020, 2030
+
+NOMBRES = ['JUAN', 'MARÍA', 'JOSÉ', 'ROSA', 'LUIS', 'CARMEN', 'CARLOS', 'ANA', 'JORGE', 'LUZ',
+           'MIGUEL', 'ELENA', 'PEDRO', 'JULIA', 'ÁNGEL', 'SOFÍA', 'CÉSAR', 'PATRICIA', 'RAÚL', 'NOEMÍ']
+APELLIDOS = ['QUISPE', 'FLORES', 'SÁNCHEZ', 'RODRÍGUEZ', 'GARCÍA', 'MAMANI', 'HUAMÁN', 'CHÁVEZ',
+             'RAMOS', 'TORRES', 'ROJAS', 'MENDOZA', 'VARGAS', 'CASTILLO', 'ESPINOZA', 'CONDORI',
+             'GUTIÉRREZ', 'PÉREZ', 'CCAHUANA', 'ÑAUPARI']
+
+# Variantes de cabecera por campo; todas se normalizan a un alias de importacion.ALIAS_CAMPOS
+CABECERAS_SUCIAS = {
+    'nombres_apellidos': ['Apellidos y Nombres', 'NOMBRES Y APELLIDOS', ' Alumno ', 'Participante', 'Nombre completo'],
+    'dni': ['DNI', 'Documento', 'Número Documento', 'Doc.', 'Identificación'],
+    'idioma': ['Idioma', 'Lengua', 'Curso', 'Lengua Extranjera'],
+    'codigo_libro': ['Código y N° de Libro', 'Cod. y N° de libro', 'Nro. Libro', 'Código'],
+    'anio': ['Año', 'AÑO', 'Periodo', 'Ejercicio'],
+    'fecha_elaboracion': ['F. Elaboración', 'Fecha de Elaboración', 'FECHA_ELAB', 'Elab.'],
+    'fecha_entrega': ['Fecha de Entrega', 'F. Entrega', 'Entregado', 'fecha-entrega'],
+    'correo_entrega': ['Correo', 'Email', 'Correo Electrónico', 'Correo de Entrega'],
+    'modalidad': ['Modalidad', 'Tipo', 'Categoría', 'Modalidad de Estudio'],
+}
+
+
+def _elegir(rnd, opciones):
+    valores, pesos = zip(*opciones)
+    return rnd.choices(valores, weights=pesos)[0]
+
+
+def dni_peruano(rnd):
+    # 8 dígitos; los DNI antiguos empiezan con 0 (se pierden si el Excel los guarda como número)
+    return f"{rnd.randint(1000000, 79999999):08d}"
+
+
+def fecha_elaboracion(rnd):
+    mes = rnd.choices(range(1, 13), weights=PESOS_MESES)[0]
+    return date(rnd.randint(ANIO_INICIO, ANIO_FIN), mes, rnd.randint(1, 28))
+
+
+def notificados_sinteticos(filas, semilla=1):
+    # Genera dicts listos para insertar en notificado (incluye anio/mes_elaboracion y texto_busqueda)
+    rnd = random.Random(semilla)
+    personas = max(1, int(filas * 0.7))  # ~30 % de las filas son una persona con otro idioma o libro
+    for i in range(filas):
+        persona = rnd.randrange(personas)
+        gen = random.Random(persona * 7919 + semilla)  # Misma persona -> mismo nombre y DNI
+        nombre = f"{gen.choice(APELLIDOS)} {gen.choice(APELLIDOS)} {gen.choice(NOMBRES)}"
+        dni = dni_peruano(gen)
+        fecha = fecha_elaboracion(rnd) if rnd.random() > 0.03 else None
+        entrega = fecha + timedelta(days=rnd.randint(0, 60)) if fecha and rnd.random() > 0.2 else None
+        idioma = _elegir(rnd, IDIOMAS)
+        registro = {
+            'nombres_apellidos': nombre,
+            'dni': dni,
+            'idioma': idioma,
+            'codigo_libro': f"{(idioma or 'GEN')[:3].upper()}-{rnd.randint(1, 40):02d}-{i:07d}",
+            'anio': str(fecha.year) if fecha else '',
+            'fecha_elaboracion': fecha,
+            'fecha_entrega': entrega,
+            'correo_entrega': f"{nombre.split()[-1].lower()}{persona}@correo.pe" if rnd.random() > 0.3 else '',
+            'modalidad': _elegir(rnd, MODALIDADES),
+            'anio_elaboracion': fecha.year if fecha else None,
+            'mes_elaboracion': fecha.month if fecha else None,
+        }
+        registro['texto_busqueda'] = texto_busqueda(registro)
+        yield registro
+
+
+def poblar_notificados(session, tabla, filas, semilla=1, tam_lote=10000):
+    # Inserción masiva por lotes (COPY en PostgreSQL); el resumen se reconstruye aparte
+    lote = []
+    for registro in notificados_sinteticos(filas, semilla):
+        lote.append(registro)
+        if len(lote) >= tam_lote:
+            insertar_bloque(session, tabla, lote)
+            session.commit()
+            lote = []
+    insertar_bloque(session, tabla, lote)
+    session.commit()
+    return filas
+
+
+def poblar_usuarios(session, tabla, filas, password_hash, semilla=2):
+    # password_hash se calcula una sola vez: generar miles de hashes mediría solo a werkzeug
+    rnd = random.Random(semilla)
+    dnis = rnd.sample(range(1000000, 79999999), filas)
+    registros = [{
+        'nombres': rnd.choice(NOMBRES), 'apellidos': f"{rnd.choice(APELLIDOS)} {rnd.choice(APELLIDOS)}",
+        'dni': f"{dni:08d}", 'celular': f"9{rnd.randint(10000000, 99999999)}",
+        'email': f"usuario{i}@colegio.pe", 'fecha_nacimiento': date(rnd.randint(1960, 2005), rnd.randint(1, 12), 1),
+        'password_hash': password_hash,
+    } for i, dni in enumerate(dnis)]
+    insertar_bloque(session, tabla, registros)
+    session.commit()
+    return [r['email'] for r in registros]
+
+
+def roster_sintetico(filas, semilla=7):
+    # Roster con cabeceras "sucias" y celdas mezcladas como las que llegan en los Excel reales
+    import pandas as pd
+
+    rnd = random.Random(semilla)
+    cabecera = {campo: rnd.choice(variantes) for campo, variantes in CABECERAS_SUCIAS.items()}
+    idiomas = ['Inglés', 'INGLES BASICO', 'portugués', 'Italiano', 'QUECHUA', 'Francés', None]
+    modalidades = ['ubicación', 'ACREDITACIÓN', 'Suficiencia', 'actualización', 'ESTUDIO', None]
+    fechas = []
+    for _ in range(filas):
+        tipo = rnd.random()
+        if tipo < 0.4:
+            fechas.append(datetime(rnd.randint(2020, 2029), rnd.randint(1, 12), rnd.randint(1, 28)))
+        elif tipo < 0.6:
+            fechas.append(float(rnd.randint(43831, 47000)))
+        elif tipo < 0.85:
+            fechas.append(f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/{rnd.randint(2020, 2029)}")
+        elif tipo < 0.95:
+            fechas.append(None)
+        else:
+            fechas.append('pendiente')
+    return pd.DataFrame({
+        cabecera['nombres_apellidos']: [f"ALUMNO {i}" if rnd.random() > 0.05 else None for i in range(filas)],
+        'Nombres': [f"Nombre{i}" for i in range(filas)],
+        'Apellidos': [f"Apellido{i}" for i in range(filas)],
+        cabecera['dni']: [rnd.choice([float(rnd.randint(10000000, 79999999)), str(rnd.randint(10000000, 79999999)),
+                                      ' 0712345 ', None, 'S/N'])
+                          for _ in range(filas)],
+        cabecera['idioma']: [rnd.choice(idiomas) for _ in range(filas)],
+        cabecera['codigo_libro']: [f"L-{rnd.randint(1, 999)}" for _ in range(filas)],
+        cabecera['anio']: [rnd.choice([2023, 2024, 2025]) for _ in range(filas)],
+        cabecera['fecha_elaboracion']: fechas,
+        cabecera['fecha_entrega']: [datetime(2024, rnd.randint(1, 12), rnd.randint(1, 28)) for _ in range(filas)],
+        cabecera['correo_entrega']: [f" Usuario{i}@Mail.COM " if i % 7 else None for i in range(filas)],
+        cabecera['modalidad']: [rnd.choice(modalidades) for _ in range(filas)],
+    })
+
+
+def roster_excel(filas, semilla=7):
+    # El mismo roster como .xlsx en memoria (openpyxl write-only: rápido también con 100k filas)
+    from openpyxl import Workbook
+
+    df = roster_sintetico(filas, semilla)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Padron')
+    ws.append(list(df.columns))
+    for fila in df.itertuples(index=False):
+        ws.append([None if isinstance(v, float) and v != v else v for v in fila])
+    salida = io.BytesIO()
+    wb.save(salida)
+    salida.seek(0)
+    return salida
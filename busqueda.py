@@ -0,0 +1,114 @@
+"""Búsqueda paginada de notificados con cursores keyset.
+
+El orden es estable: (fecha_elaboracion DESC, id DESC) y, al final, las filas sin
+fecha por id DESC. Cada página continúa desde la última fila vista en lugar de usar
+OFFSET, así que la página 500 cuesta lo mismo que la primera (índice
+ix_notificado_fecha_elaboracion).
+
+Con texto de búsqueda las filas salen por relevancia (ver texto.orden_relevancia) y el
+cursor es la posición (OFFSET): cada página vuelve a ordenar todas las coincidencias, así
+que su costo crece con ellas y con la profundidad. Por eso se llega hasta
+MAX_POSICION_RELEVANCIA filas; más allá no hay página siguiente y conviene afinar la
+búsqueda (o exportarla, que no tiene ese tope).
+"""
+import base64
+import json
+from datetime import date
+
+from sqlalchemy import func, select, tuple_
+
+from filtros import condiciones_filtros
+from texto import orden_relevancia
+
+LIMITE_PAGINA = 100
+LIMITE_MAXIMO = 500
+MAX_POSICION_RELEVANCIA = 5000  # Filas que se pueden recorrer en una búsqueda por texto
+
+# Columnas que muestra la tabla de verificar_notificados (nada más viaja al navegador)
+COLUMNAS_LISTADO = ['id', 'nombres_apellidos', 'dni', 'idioma', 'codigo_libro',
+                    'fecha_elaboracion', 'fecha_entrega', 'correo_entrega', 'modalidad']
+
+
+def codificar_cursor(fila):
+    fecha = fila['fecha_elaboracion']
+    datos = {'f': fecha.isoformat() if fecha else None, 'i': fila['id']}
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    # Devuelve (fecha o None, id); un cursor manipulado se trata como error de parámetros
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        fecha = date.fromisoformat(datos['f']) if datos['f'] else None
+        return fecha, int(datos['i'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError('Cursor inválido') from e
+
+
+def decodificar_posicion(cursor):
+    # Cursor de una búsqueda por relevancia: {'p': filas ya mostradas}
+    try:
+        posicion = int(json.loads(base64.urlsafe_b64decode(cursor.encode()))['p'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError('Cursor inválido') from e
+    if posicion < 0 or posicion >= MAX_POSICION_RELEVANCIA:
+        raise ValueError('Cursor inválido')
+    return posicion
+
+
+def codificar_posicion(posicion):
+    return base64.urlsafe_b64encode(json.dumps({'p': posicion}).encode()).decode()
+
+
+def _consulta(tabla, condiciones, limite):
+    return select(*(tabla.c[c] for c in COLUMNAS_LISTADO)).where(*condiciones).limit(limite)
+
+
+def pagina_notificados(session, tabla, filtros, cursor=None, limite=LIMITE_PAGINA):
+    # Devuelve (filas como dicts, cursor de la página siguiente o None)
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    base = condiciones_filtros(tabla, filtros)
+    if filtros.get('texto'):
+        return _pagina_relevancia(session, tabla, base, filtros['texto'], cursor, limite)
+    fecha, id_ = tabla.c.fecha_elaboracion, tabla.c.id
+    cursor_fecha, cursor_id = decodificar_cursor(cursor) if cursor else (None, None)
+
+    filas = []
+    # Tramo 1: filas con fecha, mientras el cursor no haya pasado ya a las filas sin fecha
+    if cursor is None or cursor_fecha is not None:
+        condiciones = base + [fecha != None]
+        if cursor is not None:
+            condiciones.append(tuple_(fecha, id_) < tuple_(cursor_fecha, cursor_id))
+        consulta = _consulta(tabla, condiciones, limite + 1).order_by(fecha.desc(), id_.desc())
+        filas = [dict(f._mapping) for f in session.execute(consulta)]
+
+    # Tramo 2: filas sin fecha (solo si el tramo 1 no llenó la página)
+    if len(filas) <= limite:
+        condiciones = base + [fecha == None]
+        if cursor is not None and cursor_fecha is None:
+            condiciones.append(id_ < cursor_id)
+        consulta = _consulta(tabla, condiciones, limite + 1 - len(filas)).order_by(id_.desc())
+        filas += [dict(f._mapping) for f in session.execute(consulta)]
+
+    siguiente = codificar_cursor(filas[limite - 1]) if len(filas) > limite else None
+    return filas[:limite], siguiente
+
+
+def _pagina_relevancia(session, tabla, condiciones, texto, cursor, limite):
+    posicion = decodificar_posicion(cursor) if cursor else 0
+    consulta = (_consulta(tabla, condiciones, limite + 1).order_by(*orden_relevancia(tabla, texto))
+                .offset(posicion))
+    filas = [dict(f._mapping) for f in session.execute(consulta)]
+    hay_mas = len(filas) > limite and posicion + limite < MAX_POSICION_RELEVANCIA
+    siguiente = codificar_posicion(posicion + limite) if hay_mas else None
+    return filas[:limite], siguiente
+
+
+def total_filtrado(session, tabla, filtros):
+    # COUNT(*) con los mismos filtros; app.py lo guarda en la caché de resultados
+    return session.execute(select(func.count()).select_from(tabla)
+                           .where(*condiciones_filtros(tabla, filtros))).scalar()
+
+
+def fila_json(fila):
+    return {c: v.isoformat() if isinstance(v, date) else v for c, v in fila.items()}
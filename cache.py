@@ -0,0 +1,184 @@
+"""Caché de resultados para los conteos de gráficos y los totales de búsqueda.
+
+La clave es el conjunto de filtros normalizado (años, meses, idiomas y modalidades
+ordenados y sin repetir, más el texto de búsqueda ya doblado; cualquier otro campo del
+formulario, como tipo_grafico, se descarta) más la versión de los datos. Cada escritura
+en notificado incrementa la versión, así un resultado guardado nunca se sirve después de
+un cambio.
+
+Hay dos almacenes:
+- ``AlmacenSQLite`` (el de la app por defecto): archivo SQLite compartido, para que varios
+  workers de gunicorn (y los comandos) compartan aciertos y la versión de los datos.
+- ``AlmacenMemoria``: LRU en el proceso (un solo worker). La versión también es del
+  proceso: lo que escribe otro proceso (otro worker de gunicorn o un comando ``flask``
+  como ``mantenimiento`` o ``resumen --reconstruir``) no la cambia, así que cada resultado
+  vence además a los ``segundos_vida`` de guardado; ese es el retraso máximo con que se
+  ven esos cambios.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CLAVES_FILTROS = ('anios', 'meses', 'idiomas', 'modalidades')
+TAM_MAXIMO = 512
+SEGUNDOS_VIDA_MEMORIA = 60
+
+
+def normalizar_filtros(filtros):
+    normalizados = {c: sorted(set(filtros.get(c) or [])) for c in CLAVES_FILTROS}
+    normalizados['texto'] = filtros.get('texto') or ''
+    return normalizados
+
+
+def clave_cache(espacio, filtros, version, **extra):
+    # espacio: tipo de resultado ('conteos', 'total'); extra: p. ej. las dimensiones pedidas
+    return json.dumps([espacio, version, normalizar_filtros(filtros), extra], sort_keys=True)
+
+
+class AlmacenMemoria:
+    nombre = 'memoria'
+
+    def __init__(self, tam_maximo=TAM_MAXIMO, segundos_vida=SEGUNDOS_VIDA_MEMORIA):
+        self.tam_maximo = tam_maximo
+        self.segundos_vida = segundos_vida
+        self._datos = OrderedDict()  # clave -> (vence, valor)
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def version(self):
+        return self._version
+
+    def incrementar_version(self):
+        with self._lock:
+            self._version += 1
+            self._datos.clear()
+            return self._version
+
+    def obtener(self, clave):
+        # Devuelve (encontrado, valor)
+        with self._lock:
+            guardado = self._datos.get(clave)
+            if guardado is None:
+                return False, None
+            if guardado[0] <= time.monotonic():
+                del self._datos[clave]
+                return False, None
+            self._datos.move_to_end(clave)
+            return True, guardado[1]
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.segundos_vida, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tam_maximo:
+                self._datos.popitem(last=False)
+
+    def tamano(self):
+        return len(self._datos)
+
+
+class AlmacenSQLite:
+    nombre = 'sqlite'
+
+    def __init__(self, ruta, tam_maximo=TAM_MAXIMO):
+        self.ruta = ruta
+        self.tam_maximo = tam_maximo
+        with self._conectar() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_resultado '
+                         '(clave TEXT PRIMARY KEY, valor TEXT NOT NULL, usado REAL NOT NULL)')
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_resultado_usado ON cache_resultado (usado)')
+            conn.execute('CREATE TABLE IF NOT EXISTS cache_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL)')
+            conn.execute('INSERT OR IGNORE INTO cache_version (id, version) VALUES (1, 0)')
+
+    def _conectar(self):
+        # Una conexión por operación: es seguro entre hilos y procesos, y SQLite abre rápido
+        return sqlite3.connect(self.ruta, timeout=5)
+
+    def _usar(self, operacion):
+        conn = self._conectar()
+        try:
+            with conn:
+                return operacion(conn)
+        finally:
+            conn.close()
+
+    def version(self):
+        return self._usar(lambda c: c.execute('SELECT version FROM cache_version WHERE id = 1').fetchone()[0])
+
+    def incrementar_version(self):
+        def operacion(conn):
+            conn.execute('UPDATE cache_version SET version = version + 1 WHERE id = 1')
+            conn.execute('DELETE FROM cache_resultado')
+            return conn.execute('SELECT version FROM cache_version WHERE id = 1').fetchone()[0]
+        return self._usar(operacion)
+
+    def obtener(self, clave):
+        def operacion(conn):
+            fila = conn.execute('SELECT valor FROM cache_resultado WHERE clave = ?', (clave,)).fetchone()
+            if fila is None:
+                return False, None
+            conn.execute('UPDATE cache_resultado SET usado = ? WHERE clave = ?', (time.time(), clave))
+            return True, json.loads(fila[0])
+        return self._usar(operacion)
+
+    def guardar(self, clave, valor):
+        def operacion(conn):
+            conn.execute('INSERT OR REPLACE INTO cache_resultado (clave, valor, usado) VALUES (?, ?, ?)',
+                         (clave, json.dumps(valor), time.time()))
+            conn.execute('DELETE FROM cache_resultado WHERE clave NOT IN '
+                         '(SELECT clave FROM cache_resultado ORDER BY usado DESC LIMIT ?)', (self.tam_maximo,))
+        self._usar(operacion)
+
+    def tamano(self):
+        return self._usar(lambda c: c.execute('SELECT COUNT(*) FROM cache_resultado').fetchone()[0])
+
+
+class CacheResultados:
+    def __init__(self, almacen):
+        self.almacen = almacen
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener_o_calcular(self, espacio, filtros, calcular, **extra):
+        # La versión se lee antes de calcular: si otra petición escribe mientras tanto,
+        # el resultado queda guardado bajo la versión vieja y nadie lo vuelve a leer.
+        clave = clave_cache(espacio, filtros, self.almacen.version(), **extra)
+        encontrado, valor = self.almacen.obtener(clave)
+        if encontrado:
+            self.aciertos += 1
+            return valor
+        self.fallos += 1
+        valor = calcular()
+        self.almacen.guardar(clave, valor)
+        return valor
+
+    def invalidar(self):
+        # Llamar después de cada commit que inserte, actualice o borre notificados
+        return self.almacen.incrementar_version()
+
+    def estadisticas(self):
+        # Aciertos y fallos son de este proceso; versión y tamaño son los del almacén
+        consultas = self.aciertos + self.fallos
+        return {
+            'almacen': self.almacen.nombre,
+            'pid': os.getpid(),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': round(self.aciertos / consultas, 3) if consultas else None,
+            'version': self.almacen.version(),
+            'tamano': self.almacen.tamano(),
+            'tam_maximo': self.almacen.tam_maximo,
+        }
+
+
+def crear_cache(tipo='memoria', ruta=None, tam_maximo=TAM_MAXIMO, segundos_vida=SEGUNDOS_VIDA_MEMORIA):
+    # segundos_vida solo se usa con 'memoria'; en 'sqlite' la versión compartida basta
+    if tipo == 'sqlite':
+        return CacheResultados(AlmacenSQLite(ruta, tam_maximo))
+    if tipo != 'memoria':
+        raise ValueError(f'Almacén de caché desconocido: {tipo}')
+    return CacheResultados(AlmacenMemoria(tam_maximo, segundos_vida))
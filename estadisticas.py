@@ -0,0 +1,115 @@
+"""Conteos agregados de notificados calculados en la base de datos.
+
+La agrupación se hace con GROUP BY y solo viajan los conteos, nunca las filas:
+sirve tanto al render de graficos_proyeccion como al endpoint JSON de Chart.js.
+"""
+from sqlalchemy import Integer, cast, extract, func, select
+
+from filtros import condiciones_filtros
+
+# Dimensiones y filtros que puede contestar la tabla resumen (columna en resumen_notificado)
+COLUMNAS_RESUMEN = {
+    'idioma': 'idioma',
+    'modalidad': 'modalidad',
+    'anio_elaboracion': 'anio',
+    'mes_elaboracion': 'mes',
+}
+
+# Dimensiones por las que se puede desglosar; cada una es una expresión sobre la tabla notificado
+DIMENSIONES = {
+    'idioma': lambda t: func.coalesce(t.c.idioma, ''),
+    'modalidad': lambda t: func.coalesce(t.c.modalidad, ''),
+    'anio_elaboracion': lambda t: t.c.anio_elaboracion,
+    'mes_elaboracion': lambda t: t.c.mes_elaboracion,
+    'anio_entrega': lambda t: cast(extract('year', t.c.fecha_entrega), Integer),
+    'mes_entrega': lambda t: cast(extract('month', t.c.fecha_entrega), Integer),
+}
+
+ETIQUETAS_VACIAS = {
+    'idioma': 'Sin Idioma',
+    'modalidad': 'Sin Modalidad',
+}
+
+
+def contar_notificados(session, tabla, dimensiones, filtros, tabla_resumen=None):
+    # Devuelve [{dim1: valor, ..., 'total': n}] con una sola consulta GROUP BY.
+    # Si se pasa tabla_resumen y las dimensiones lo permiten, se cuenta sobre el resumen
+    # (salvo con texto de búsqueda: el resumen no guarda nombres).
+    desconocidas = [d for d in dimensiones if d not in DIMENSIONES]
+    if desconocidas:
+        raise ValueError(f"Dimensiones no válidas: {', '.join(desconocidas)}")
+    if tabla_resumen is not None and not filtros.get('texto') and all(d in COLUMNAS_RESUMEN for d in dimensiones):
+        return contar_resumen(session, tabla_resumen, dimensiones, filtros)
+
+    expresiones = [DIMENSIONES[d](tabla) for d in dimensiones]
+    consulta = (select(*(e.label(d) for e, d in zip(expresiones, dimensiones)), func.count().label('total'))
+                .select_from(tabla)
+                .where(*condiciones_filtros(tabla, filtros)))
+    if expresiones:
+        consulta = consulta.group_by(*expresiones).order_by(*expresiones)
+    return [dict(fila._mapping) for fila in session.execute(consulta)]
+
+
+def contar_resumen(session, tabla_resumen, dimensiones, filtros):
+    # Mismo resultado que contar_notificados, pero sumando las filas del resumen
+    r = tabla_resumen.c
+    condiciones = []
+    if filtros.get('anios'):
+        condiciones.append(r.anio.in_(filtros['anios']))
+    if filtros.get('meses'):
+        condiciones.append(r.mes.in_(filtros['meses']))
+    if filtros.get('idiomas'):
+        condiciones.append(r.idioma.in_(filtros['idiomas']))
+    if filtros.get('modalidades'):
+        condiciones.append(r.modalidad.in_(filtros['modalidades']))
+
+    columnas = [r[COLUMNAS_RESUMEN[d]] for d in dimensiones]
+    consulta = (select(*(c.label(d) for c, d in zip(columnas, dimensiones)),
+                       func.coalesce(func.sum(r.total), 0).label('total'))
+                .where(*condiciones))
+    if columnas:
+        consulta = consulta.group_by(*columnas).order_by(*columnas)
+    filas = []
+    for fila in session.execute(consulta):
+        fila = dict(fila._mapping)
+        for d in ('anio_elaboracion', 'mes_elaboracion'):
+            if fila.get(d) == 0:
+                fila[d] = None  # 0 = sin fecha en el resumen
+        fila['total'] = int(fila['total'])
+        filas.append(fila)
+    return filas
+
+
+def _etiqueta(dimension, valor):
+    if valor is None or valor == '':
+        return ETIQUETAS_VACIAS.get(dimension, 'Sin fecha')
+    if dimension.startswith('mes_'):
+        return f'{valor:02d}'
+    return str(valor)
+
+
+def pivotar(filas, dimensiones):
+    # Formato listo para Chart.js: la última dimensión forma las series (apiladas o de tiempo)
+    # y las demás, unidas con '-', forman las etiquetas del eje (p. ej. '2024-03').
+    if not dimensiones:
+        total = sum(f['total'] for f in filas)
+        return {'labels': ['Total'], 'series': {'Total': [total]}}
+
+    ejes = dimensiones[:-1] if len(dimensiones) > 1 else dimensiones
+    serie_dim = dimensiones[-1] if len(dimensiones) > 1 else None
+
+    labels, series = [], {}
+    posiciones = {}
+    for fila in filas:
+        label = '-'.join(_etiqueta(d, fila[d]) for d in ejes)
+        if label not in posiciones:
+            posiciones[label] = len(labels)
+            labels.append(label)
+        nombre = _etiqueta(serie_dim, fila[serie_dim]) if serie_dim else 'Cantidad de Personas'
+        series.setdefault(nombre, {})
+        series[nombre][label] = series[nombre].get(label, 0) + fila['total']
+
+    return {
+        'labels': labels,
+        'series': {nombre: [valores.get(label, 0) for label in labels] for nombre, valores in series.items()},
+    }
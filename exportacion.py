@@ -0,0 +1,86 @@
+"""Exportación en streaming del reporte filtrado de notificados.
+
+Las filas se leen por lotes (rangos de id) y se escriben directamente al formato de
+salida como un generador, así que la memoria usada no depende de cuántas filas tenga
+el reporte. El trabajo de exportación (ver trabajos.py) vuelca ese generador a un archivo.
+"""
+import csv
+import io
+import tempfile
+
+from sqlalchemy import select
+
+from filtros import condiciones_filtros
+
+FORMATOS = {
+    'xlsx': ('reporte_filtrado.xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('reporte_filtrado.csv', 'text/csv; charset=utf-8'),
+    'tsv': ('reporte_filtrado.tsv', 'text/tab-separated-values; charset=utf-8'),
+}
+
+CABECERAS = ['NOMBRES Y APELLIDOS', 'DNI', 'IDIOMA', 'CODIGO LIBRO', 'AÑO', 'MES', 'MODALIDAD']
+TAM_LOTE = 1000
+TAM_TROZO = 64 * 1024
+
+
+def filas_reporte(session, tabla, filtros, tam_lote=TAM_LOTE, avance=None):
+    # Lotes por rango de id (keyset): ningún cursor queda abierto entre lotes, así
+    # avance(filas) puede hacer commit del progreso del trabajo entre uno y otro
+    columnas = (tabla.c.id, tabla.c.nombres_apellidos, tabla.c.dni, tabla.c.idioma, tabla.c.codigo_libro,
+                tabla.c.fecha_elaboracion, tabla.c.modalidad)
+    condiciones = condiciones_filtros(tabla, filtros)
+    ultimo, leidas = 0, 0
+    while True:
+        lote = session.execute(select(*columnas).where(*condiciones, tabla.c.id > ultimo)
+                               .order_by(tabla.c.id).limit(tam_lote)).all()
+        if not lote:
+            return
+        for n in lote:
+            fecha = n.fecha_elaboracion
+            yield [n.nombres_apellidos, n.dni, n.idioma, n.codigo_libro,
+                   fecha.year if fecha else '', fecha.strftime('%B') if fecha else '', n.modalidad]
+        ultimo = lote[-1].id
+        leidas += len(lote)
+        if avance:
+            avance(leidas)
+
+
+def generar_csv(filas, separador=','):
+    # BOM para que Excel reconozca UTF-8 (tildes y Ñ); se envía cada ~64 KB
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=separador)
+    buffer.write('﻿')
+    escritor.writerow(CABECERAS)
+    for fila in filas:
+        escritor.writerow(fila)
+        if buffer.tell() >= TAM_TROZO:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def generar_xlsx(filas):
+    # Workbook write-only: openpyxl vuelca cada fila a un archivo temporal, no la guarda en memoria.
+    # El .xlsx (zip) se arma en un SpooledTemporaryFile y se envía por trozos.
+    from openpyxl import Workbook  # Se carga al primer uso, no al arrancar la app
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Filtrados')
+    ws.append(CABECERAS)
+    for fila in filas:
+        ws.append(fila)
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as salida:
+        wb.save(salida)
+        salida.seek(0)
+        while True:
+            trozo = salida.read(TAM_TROZO)
+            if not trozo:
+                break
+            yield trozo
+
+
+def generar_reporte(session, tabla, filtros, formato, avance=None):
+    filas = filas_reporte(session, tabla, filtros, avance=avance)
+    if formato == 'xlsx':
+        return generar_xlsx(filas)
+    return generar_csv(filas, separador='\t' if formato == 'tsv' else ',')
@@ -0,0 +1,101 @@
+"""Constructor de filtros compartido para las consultas sobre notificado.
+
+verificar_notificados, graficos_proyeccion y las APIs leen los filtros del formulario
+con ``leer_filtros`` y los convierten en predicados con ``condiciones_filtros``. Los años
+(y años+meses) se expresan como rangos de fechas sobre ``fecha_elaboracion`` para que
+usen el índice; "marzo de todos los años" no cabe en un rango y usa la columna
+almacenada ``mes_elaboracion``. El texto libre (campo ``q``) se resuelve con el índice de
+texto de texto.py.
+"""
+import re
+from datetime import date
+
+from sqlalchemy import and_, or_, text
+
+from texto import coincide_texto, doblar
+
+# Años aceptados en los filtros: fuera de este rango date() fallaría o no hay certificados
+ANIO_MINIMO, ANIO_MAXIMO = 1900, 2100
+
+# Conjuntos de filtros representativos que revisa el comando "flask explicar-filtros"
+FILTROS_EJEMPLO = [
+    {'anios': [2024]},
+    {'anios': [2023, 2024]},
+    {'anios': [2024], 'meses': [3, 4]},
+    {'meses': [3]},
+    {'idiomas': ['Ingles']},
+    {'modalidades': ['ESTUDIO']},
+    {'anios': [2024], 'idiomas': ['Ingles', 'Quechua']},
+    {'texto': 'QUISPE'},
+    {'anios': [2024], 'texto': 'MAMANI ROSA'},
+]
+
+
+def leer_filtros(fuente):
+    # fuente: request.form o request.args. Los años y meses se quedan solo si son números
+    # dentro de su rango; el texto se guarda ya doblado (sin tildes, en mayúsculas).
+    return {
+        'anios': sorted({int(a) for a in fuente.getlist('anio') if a.isdigit() and ANIO_MINIMO <= int(a) <= ANIO_MAXIMO}),
+        'meses': sorted({int(m) for m in fuente.getlist('mes') if m.isdigit() and 1 <= int(m) <= 12}),
+        'idiomas': sorted({i for i in fuente.getlist('idioma') if i}),
+        'modalidades': sorted({m for m in fuente.getlist('modalidad') if m}),
+        'texto': doblar(fuente.get('q', '')),
+    }
+
+
+def _siguiente_mes(anio, mes):
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+
+def rangos_fechas(anios, meses=None):
+    # Devuelve [(desde, hasta)] semiabiertos; los periodos contiguos se fusionan en un solo rango
+    periodos = sorted((a, m) for a in anios for m in (meses or range(1, 13)))
+    rangos = []
+    for anio, mes in periodos:
+        desde = date(anio, mes, 1)
+        hasta = date(*_siguiente_mes(anio, mes), 1)
+        if rangos and rangos[-1][1] == desde:
+            rangos[-1] = (rangos[-1][0], hasta)
+        else:
+            rangos.append((desde, hasta))
+    return rangos
+
+
+def condiciones_filtros(tabla, filtros):
+    condiciones = []
+    fecha = tabla.c.fecha_elaboracion
+    if filtros.get('anios'):
+        rangos = rangos_fechas(filtros['anios'], filtros.get('meses'))
+        condiciones.append(or_(*(and_(fecha >= desde, fecha < hasta) for desde, hasta in rangos)))
+    elif filtros.get('meses'):
+        # Mismo mes en todos los años: no es un rango, se usa la columna almacenada
+        condiciones.append(tabla.c.mes_elaboracion.in_(filtros['meses']))
+    if filtros.get('idiomas'):
+        condiciones.append(tabla.c.idioma.in_(filtros['idiomas']))
+    if filtros.get('modalidades'):
+        condiciones.append(tabla.c.modalidad.in_(filtros['modalidades']))
+    if filtros.get('texto'):
+        coincide = coincide_texto(tabla, filtros['texto'])
+        if coincide is not None:
+            condiciones.append(coincide)
+    return condiciones
+
+
+def plan_consulta(session, consulta):
+    # Plan de ejecución como líneas de texto (EXPLAIN QUERY PLAN en SQLite, EXPLAIN en PostgreSQL)
+    dialecto = session.get_bind().dialect
+    compilada = consulta.compile(dialect=dialecto, compile_kwargs={'literal_binds': True})
+    if dialecto.name == 'sqlite':
+        prefijo = 'EXPLAIN QUERY PLAN '
+    else:
+        # En tablas pequeñas PostgreSQL prefiere el Seq Scan; se desactiva para ver si el índice es utilizable
+        session.execute(text('SET LOCAL enable_seqscan = off'))
+        prefijo = 'EXPLAIN '
+    filas = session.execute(text(prefijo + str(compilada))).fetchall()
+    return [str(fila[-1]) for fila in filas]
+
+
+def usa_indice(plan):
+    # Un plan sin ningún recorrido completo de notificado ("SCAN notificado" / "Seq Scan on notificado");
+    # "SCAN notificado_fts VIRTUAL TABLE INDEX" es la búsqueda en el índice de texto
+    return not any(re.search(r'(SCAN|Seq Scan on) notificado\b', linea) for linea in plan)
@@ -0,0 +1,94 @@
+"""Caché de identidad delante del user_loader de Flask-Login.
+
+En lugar de leer la tabla user en cada petición autenticada, se guarda una copia
+compacta y de solo lectura del usuario (``UsuarioSesion``) durante ``segundos_vida``:
+- en memoria del proceso;
+- opcionalmente también en la sesión firmada (cookie), así la mayoría de las
+  peticiones no consultan la base de datos en ningún worker.
+
+Cuando el registro cambia, ``olvidar`` borra la copia solo en el proceso que hizo el
+cambio (y en la sesión de esa petición). Los demás workers de gunicorn y las cookies
+de otros navegadores siguen usando su copia hasta que vence: un cambio de datos o de
+contraseña, o un usuario borrado, se nota ahí como máximo ``segundos_vida`` después.
+Por eso la vida por defecto es corta (un minuto).
+"""
+import time
+from dataclasses import asdict, dataclass
+
+from flask_login import UserMixin
+
+SEGUNDOS_VIDA = 60
+CLAVE_SESION = 'identidad'
+
+
+@dataclass(frozen=True)
+class UsuarioSesion(UserMixin):
+    # Solo los campos que usan las vistas; nunca el hash de la contraseña
+    id: int
+    nombres: str
+    apellidos: str
+    email: str
+
+
+def copia_usuario(usuario):
+    return UsuarioSesion(id=usuario.id, nombres=usuario.nombres, apellidos=usuario.apellidos, email=usuario.email)
+
+
+class CacheIdentidad:
+    def __init__(self, cargar, segundos_vida=SEGUNDOS_VIDA, en_sesion=False):
+        # cargar(user_id) -> UsuarioSesion o None; es la única consulta a la base de datos
+        self.cargar = cargar
+        self.segundos_vida = segundos_vida
+        self.en_sesion = en_sesion
+        self._usuarios = {}
+        self.consultas_bd = 0
+        self.aciertos_memoria = 0
+        self.aciertos_sesion = 0
+
+    def usuario(self, user_id, sesion):
+        guardado = self._usuarios.get(user_id)
+        if guardado and guardado[0] > time.monotonic():
+            self.aciertos_memoria += 1
+            return guardado[1]
+
+        if self.en_sesion:
+            datos = sesion.get(CLAVE_SESION)
+            if datos and datos['usuario']['id'] == user_id and datos['expira'] > time.time():
+                self.aciertos_sesion += 1
+                usuario = UsuarioSesion(**datos['usuario'])
+                self._usuarios[user_id] = (time.monotonic() + self.segundos_vida, usuario)
+                return usuario
+
+        self.consultas_bd += 1
+        usuario = self.cargar(user_id)
+        if usuario is None:
+            self.olvidar(user_id, sesion)
+            return None
+        self.recordar(usuario, sesion)
+        return usuario
+
+    def recordar(self, usuario, sesion=None):
+        self._usuarios[usuario.id] = (time.monotonic() + self.segundos_vida, usuario)
+        if self.en_sesion and sesion is not None:
+            sesion[CLAVE_SESION] = {'usuario': asdict(usuario), 'expira': time.time() + self.segundos_vida}
+
+    def olvidar(self, user_id, sesion=None):
+        # Llamar cuando cambian los datos o la contraseña del usuario (o al cerrar sesión)
+        self._usuarios.pop(user_id, None)
+        if sesion is not None:
+            datos = sesion.get(CLAVE_SESION)
+            if datos and datos['usuario']['id'] == user_id:
+                sesion.pop(CLAVE_SESION)
+
+    def estadisticas(self):
+        evitadas = self.aciertos_memoria + self.aciertos_sesion
+        total = evitadas + self.consultas_bd
+        return {
+            'consultas_bd': self.consultas_bd,
+            'consultas_evitadas': evitadas,
+            'aciertos_memoria': self.aciertos_memoria,
+            'aciertos_sesion': self.aciertos_sesion,
+            'tasa_evitadas': round(evitadas / total, 3) if total else None,
+            'en_sesion': self.en_sesion,
+            'segundos_vida': self.segundos_vida,
+        }
@@ -0,0 +1,223 @@
+"""Motor de mapeo de columnas para la importación de Excel de notificados.
+
+Las cabeceras se normalizan y se asocian a los campos canónicos UNA sola vez por
+archivo; después cada columna de salida se construye con operaciones vectorizadas
+de pandas/NumPy en lugar de recorrer el DataFrame fila por fila.
+
+pandas, NumPy y openpyxl se importan al primer uso (``_cargar_dependencias``): importar
+este módulo para leer CAMPOS_TABLA no los carga, así el arranque de la app es liviano.
+"""
+import unicodedata
+from datetime import datetime
+
+np = pd = load_workbook = None
+
+# Orden de las columnas que espera la tabla de registrar_notificados.html
+CAMPOS_TABLA = [
+    'nombres_apellidos', 'dni', 'idioma', 'codigo_libro', 'anio',
+    'fecha_elaboracion', 'fecha_entrega', 'correo_entrega', 'modalidad'
+]
+
+# Alias aceptados para cada campo (ya normalizados). Gana el primero que exista en el archivo.
+ALIAS_CAMPOS = {
+    'nombres_apellidos': ['NOMBRES Y APELLIDOS', 'APELLIDOS Y NOMBRES', 'ALUMNO', 'ESTUDIANTE', 'NOMBRE COMPLETO', 'PARTICIPANTE'],
+    'nombres': ['NOMBRES', 'NOMBRE'],
+    'apellidos': ['APELLIDOS', 'APELLIDO'],
+    'dni': ['DNI', 'DOCUMENTO', 'IDENTIFICACION', 'NUMERO DOCUMENTO', 'DOC', 'CEDULA'],
+    'idioma': ['IDIOMA', 'LENGUA', 'CURSO', 'LENGUA EXTRANJERA', 'MATERIA'],
+    'codigo_libro': ['CODIGO Y N DE LIBRO', 'COD Y N DE LIBRO', 'CODIGO Y NUMERO DE LIBRO', 'CODIGO', 'LIBRO', 'N LIBRO', 'NRO LIBRO', 'NUMERO DE LIBRO', 'COD LIBRO'],
+    'anio': ['ANO', 'ANIO', 'YEAR', 'PERIODO', 'FECHA ANUAL', 'EJERCICIO'],
+    'fecha_elaboracion': ['FECHA ELABORACION', 'FECHA DE ELABORACION', 'F ELABORACION', 'ELABORACION', 'F ELAB', 'FECHA ELAB', 'ELAB'],
+    'fecha_entrega': ['FECHA ENTREGA', 'FECHA DE ENTREGA', 'F ENTREGA', 'ENTREGA', 'F ENT', 'FECHA ENT', 'ENTREGADO'],
+    'correo_entrega': ['CORREO DE ENTREGA', 'CORREO', 'EMAIL', 'CORREO ELECTRONICO', 'MAIL', 'CONTACTO'],
+    'modalidad': ['MODALIDAD', 'TIPO', 'MODALIDAD DE ESTUDIO', 'FORMA', 'CATEGORIA'],
+}
+
+# Filas que se procesan juntas al leer un Excel en streaming
+TAM_BLOQUE = 5000
+
+# Mapeo de Idiomas (Excel -> Value del Select). Se evalúa en orden.
+TABLA_IDIOMAS = [('INGL', 'Ingles'), ('PORT', 'Portugues'), ('ITAL', 'Italiano'), ('QUECH', 'Quechua')]
+
+
+# Las vocales con tilde y la Ñ se reemplazan directo (mismo resultado que NFKD, mucho más
+# barato); NFKD queda para el resto de caracteres no ASCII
+_SIN_TILDES = str.maketrans('ÁÉÍÓÚÀÈÌÒÙÄËÏÖÜÑ', 'AEIOUAEIOUAEIOUN')
+_SIGNOS = str.maketrans(dict.fromkeys('.°-_/\\():', ' '))
+
+
+def normalize_header(h):
+    # Mayúsculas, sin acentos y sin símbolos como . ° - /
+    h = str(h).strip().upper().translate(_SIN_TILDES)
+    if not h.isascii():
+        h = "".join(c for c in unicodedata.normalize('NFKD', h) if not unicodedata.combining(c))
+    return " ".join(h.translate(_SIGNOS).split())
+
+
+def mapear_columnas(columnas):
+    # Devuelve {campo: posición de la columna} usando el primer alias presente en el archivo
+    posiciones = {}
+    for i, col in enumerate(columnas):
+        posiciones.setdefault(col, i)
+    mapa = {}
+    for campo, aliases in ALIAS_CAMPOS.items():
+        mapa[campo] = next((posiciones[a] for a in aliases if a in posiciones), None)
+    return mapa
+
+
+def _valores(df, posicion):
+    # Columna cruda como objetos, con NaN / '' convertidos a '' (igual que el antiguo get_val)
+    if posicion is None:
+        return pd.Series([''] * len(df), index=df.index, dtype=object)
+    s = df.iloc[:, posicion].astype(object)
+    vacio = s.isna() | (s == '')
+    return s.where(~vacio, '')
+
+
+def _falsos(s):
+    # Equivalente vectorizado de "not val" para los valores que devuelve _valores
+    return (s == '') | (s == 0)
+
+
+def _como_texto(s):
+    return s.astype(str).astype(object)
+
+
+def _limpiar_dni(s):
+    # Quitar .0 si viene como float: str(int(float(val))) o, si no es número, str(val).strip()
+    texto = _como_texto(s).str.strip()
+    numeros = pd.to_numeric(texto, errors='coerce').astype('float64').to_numpy()
+    resultado = texto.to_numpy(dtype=object).copy()
+
+    finitos = np.isfinite(numeros)
+    enteros = np.trunc(numeros[finitos])
+    convertidos = np.empty(len(enteros), dtype=object)
+    seguros = np.abs(enteros) < 2 ** 63
+    convertidos[seguros] = enteros[seguros].astype(np.int64).astype(str)
+    convertidos[~seguros] = [str(int(x)) for x in enteros[~seguros]]
+    resultado[finitos] = convertidos
+
+    resultado[_falsos(s).to_numpy()] = ''
+    return pd.Series(resultado, index=s.index, dtype=object)
+
+
+def _normalizar_idioma(valor):
+    for clave, canonico in TABLA_IDIOMAS:
+        if clave in valor:
+            return canonico
+    return valor  # Si no coincide, devuelve el valor original
+
+
+def _mapear_idiomas(s):
+    # Normaliza cada valor distinto una sola vez y reparte el resultado con una tabla de búsqueda
+    texto = _como_texto(s).str.upper().str.strip()
+    tabla = {valor: _normalizar_idioma(valor) for valor in texto.unique()}
+    resultado = texto.map(tabla)
+    return resultado.where(~_falsos(s), '')
+
+
+def _formatear_fechas(s):
+    # Fechas de Excel (seriales, datetime o texto) a formato HTML (YYYY-MM-DD)
+    resultado = pd.Series('', index=s.index, dtype=object)
+    texto = _como_texto(s).str.strip()
+    validos = texto != ''
+
+    # Clasificar por tipo una vez por tipo distinto (datetime, número o texto), no por celda
+    tipos = s.map(type)
+    clases = {t: ('fecha' if issubclass(t, datetime) else 'numero' if issubclass(t, (int, float)) else 'texto')
+              for t in tipos.unique()}
+    clase = tipos.map(clases)
+    es_fecha = validos & (clase == 'fecha')
+    es_numero = validos & (clase == 'numero')
+    es_texto = validos & (clase == 'texto')
+
+    fechas = pd.Series(pd.NaT, index=s.index, dtype='datetime64[ns]')
+    if es_fecha.any():
+        fechas[es_fecha] = pd.to_datetime(s[es_fecha], errors='coerce')
+    if es_numero.any():
+        seriales = pd.to_numeric(s[es_numero], errors='coerce').astype('float64')
+        fechas[es_numero] = pd.to_datetime(seriales, unit='D', origin='1899-12-30', errors='coerce')
+    if es_texto.any():
+        fechas[es_texto] = pd.to_datetime(texto[es_texto], errors='coerce', format='mixed')
+
+    con_fecha = fechas.notna()
+    resultado[con_fecha] = fechas[con_fecha].dt.strftime('%Y-%m-%d')
+    return resultado
+
+
+def _cargar_dependencias():
+    global np, pd, load_workbook
+    if pd is None:
+        import numpy as np
+        import pandas as pd
+        from openpyxl import load_workbook
+
+
+def construir_datos_tabla(df):
+    # Normaliza las cabeceras, mapea los campos una vez y construye cada columna de golpe
+    _cargar_dependencias()
+    mapa = mapear_columnas([normalize_header(col) for col in df.columns])
+    return _construir_filas(df, mapa)
+
+
+def leer_excel_por_bloques(archivo, nombre_archivo, tam_bloque=TAM_BLOQUE):
+    # Recorre el Excel en modo streaming (openpyxl read-only) y devuelve datos_tabla por bloques,
+    # de modo que la memoria depende del tamaño del bloque y no del número de filas del archivo.
+    _cargar_dependencias()
+    if nombre_archivo.lower().endswith('.xls'):
+        # openpyxl no lee el formato antiguo; se carga completo con pandas y se trocea
+        df = pd.read_excel(archivo)
+        mapa = mapear_columnas([normalize_header(col) for col in df.columns])
+        for inicio in range(0, len(df), tam_bloque):
+            yield _construir_filas(df.iloc[inicio:inicio + tam_bloque], mapa)
+        return
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        cabeceras = next(filas, None)
+        if cabeceras is None:
+            return
+        ancho = len(cabeceras)
+        mapa = mapear_columnas([normalize_header(col) for col in cabeceras])
+
+        bloque = []
+        for fila in filas:
+            fila = fila[:ancho]
+            if all(v is None or v == '' for v in fila):
+                continue  # Filas en blanco del Excel
+            bloque.append(fila)
+            if len(bloque) >= tam_bloque:
+                yield _construir_filas(pd.DataFrame.from_records(bloque), mapa)
+                bloque = []
+        if bloque:
+            yield _construir_filas(pd.DataFrame.from_records(bloque), mapa)
+    finally:
+        libro.close()
+
+
+def _construir_filas(df, mapa):
+    if len(df) == 0:
+        return []
+
+    # --- Lógica de Nombres y Apellidos (Unificados o Separados) ---
+    nombres_full = _valores(df, mapa['nombres_apellidos'])
+    nom = _valores(df, mapa['nombres'])
+    ape = _valores(df, mapa['apellidos'])
+    unidos = (_como_texto(nom) + ' ' + _como_texto(ape)).str.strip()
+    usar_separados = _falsos(nombres_full) & ~(_falsos(nom) & _falsos(ape))
+    nombres_full = nombres_full.where(~usar_separados, unidos)
+
+    columnas = {
+        'nombres_apellidos': nombres_full,
+        'dni': _limpiar_dni(_valores(df, mapa['dni'])),
+        'idioma': _mapear_idiomas(_valores(df, mapa['idioma'])),
+        'codigo_libro': _valores(df, mapa['codigo_libro']),
+        'anio': _valores(df, mapa['anio']),
+        'fecha_elaboracion': _formatear_fechas(_valores(df, mapa['fecha_elaboracion'])),
+        'fecha_entrega': _formatear_fechas(_valores(df, mapa['fecha_entrega'])),
+        'correo_entrega': _como_texto(_valores(df, mapa['correo_entrega'])).str.strip().str.lower(),
+        'modalidad': _como_texto(_valores(df, mapa['modalidad'])).str.upper().str.strip(),
+    }
+    listas = [columnas[campo].tolist() for campo in CAMPOS_TABLA]
+    return [dict(zip(CAMPOS_TABLA, fila)) for fila in zip(*listas)]
@@ -0,0 +1,124 @@
+"""Borrado y archivo masivo de notificados por filtros (los mismos de la búsqueda).
+
+En lugar de mandar los IDs por el formulario, el trabajo recorre la tabla por lotes de
+IDs (keyset por id, con ``condiciones_filtros``) y cada lote es una transacción corta:
+descontar del resumen, copiar al archivo si corresponde, borrar y confirmar. Así una
+limpieza de millones de filas nunca bloquea la tabla más que un lote, y un corte a mitad
+de camino deja confirmado lo ya procesado (volver a lanzarlo continúa con lo que quede).
+
+Destinos del modo ``archivar``:
+- ``tabla``: ``notificado_archivo``, con las mismas columnas de datos pero sin índices
+  secundarios ni texto de búsqueda, para que la tabla caliente quede chica. Tiene su
+  propio id: el de notificado se guarda en ``id_original``, porque SQLite reutiliza los
+  ids de una tabla vaciada y el mismo id puede archivarse más de una vez.
+- ``parquet``: un archivo Parquet por lote dentro de una carpeta (se lee como un solo
+  dataset con ``pandas.read_parquet(carpeta)``). Cada parte se escribe y se cierra antes
+  de borrar su lote, así nunca se borra algo que no quedó archivado. Requiere pyarrow.
+
+``simular`` contesta cuántas filas tocaría, por año, sin modificar nada.
+"""
+import os
+from datetime import datetime
+from importlib.util import find_spec
+
+from sqlalchemy import delete, insert, select
+
+from estadisticas import contar_notificados
+from filtros import condiciones_filtros
+from resumen import registrar_borrado
+
+MODOS = ('eliminar', 'archivar')
+DESTINOS = ('tabla', 'parquet')
+TAM_LOTE = 5000
+CLAVES_FILTROS = ('anios', 'meses', 'idiomas', 'modalidades', 'texto')
+# Columnas que se conservan al archivar, además del id como id_original
+# (texto_busqueda se recalcula si alguna vez se restauran)
+COLUMNAS_ARCHIVO = ('nombres_apellidos', 'dni', 'idioma', 'codigo_libro', 'anio', 'fecha_elaboracion',
+                    'fecha_entrega', 'correo_entrega', 'modalidad', 'anio_elaboracion', 'mes_elaboracion')
+
+
+def parquet_disponible():
+    return find_spec('pyarrow') is not None
+
+
+def validar(filtros, modo, destino=None):
+    # Un filtro vacío abarcaría toda la tabla: para eso no se usa este mantenimiento
+    if modo not in MODOS:
+        raise ValueError(f'Modo de mantenimiento desconocido: {modo}')
+    if not any(filtros.get(c) for c in CLAVES_FILTROS):
+        raise ValueError('Seleccione al menos un filtro (año, mes, idioma, modalidad o texto).')
+    if modo == 'archivar':
+        if destino not in DESTINOS:
+            raise ValueError(f'Destino de archivo desconocido: {destino}')
+        if destino == 'parquet' and not parquet_disponible():
+            raise ValueError('El archivo Parquet requiere pyarrow; use el destino "tabla".')
+
+
+def simular(session, tabla, filtros, tabla_resumen=None):
+    # Filas que se borrarían o archivarían, en total y por año de elaboración (None = sin fecha)
+    filas = contar_notificados(session, tabla, ['anio_elaboracion'], filtros, tabla_resumen=tabla_resumen)
+    return {'total': sum(f['total'] for f in filas),
+            'por_anio': {f['anio_elaboracion']: f['total'] for f in filas}}
+
+
+def _lotes_ids(session, tabla, condiciones, tam_lote):
+    # Cada lote se pide después de confirmar el anterior: no queda ningún cursor abierto
+    ultimo = 0
+    while True:
+        ids = session.scalars(select(tabla.c.id).where(*condiciones, tabla.c.id > ultimo)
+                              .order_by(tabla.c.id).limit(tam_lote)).all()
+        if not ids:
+            return
+        yield ids
+        ultimo = ids[-1]
+
+
+class ArchivoParquet:
+    # Carpeta con una parte por lote: parte-00001.parquet, parte-00002.parquet, ...
+    def __init__(self, carpeta):
+        import pyarrow  # noqa: F401  (se carga al primer uso, como pandas en importacion.py)
+        import pyarrow.parquet
+
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.carpeta = carpeta
+        self.partes = 0
+        os.makedirs(carpeta, exist_ok=True)
+
+    def escribir(self, filas):
+        self.partes += 1
+        ruta = os.path.join(self.carpeta, f'parte-{self.partes:05d}.parquet')
+        temporal = ruta + '.tmp'
+        tabla = self.pa.Table.from_pylist([dict(f) for f in filas])
+        self.pq.write_table(tabla, temporal, compression='zstd')
+        os.replace(temporal, ruta)  # La parte aparece completa o no aparece
+
+
+def mantener_notificados(session, tabla, tabla_resumen, filtros, modo, tabla_archivo=None, archivo=None,
+                         tam_lote=TAM_LOTE, avance=None, al_confirmar=None):
+    # Borra (o archiva y borra) las filas que cumplen los filtros, lote por lote.
+    # tabla_archivo o archivo (ArchivoParquet) solo en modo 'archivar'. avance(filas) y
+    # al_confirmar() se llaman después de cada commit (p. ej. para el trabajo y la caché).
+    if modo == 'archivar' and tabla_archivo is None and archivo is None:
+        raise ValueError('Falta el destino del archivo.')
+    condiciones = condiciones_filtros(tabla, filtros)
+    columnas = [tabla.c.id.label('id_original')] + [tabla.c[c] for c in COLUMNAS_ARCHIVO]
+    procesadas = 0
+    for ids in _lotes_ids(session, tabla, condiciones, tam_lote):
+        en_lote = tabla.c.id.in_(ids)
+        if modo == 'archivar':
+            filas = session.execute(select(*columnas).where(en_lote)).mappings().all()
+            if archivo is not None:
+                archivo.escribir(filas)
+            else:
+                archivado = datetime.now()
+                session.execute(insert(tabla_archivo), [dict(f, archivado=archivado) for f in filas])
+        registrar_borrado(session, tabla, tabla_resumen, en_lote)
+        session.execute(delete(tabla).where(en_lote))
+        session.commit()
+        procesadas += len(ids)
+        if al_confirmar:
+            al_confirmar()
+        if avance:
+            avance(procesadas)
+    return procesadas
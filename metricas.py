@@ -0,0 +1,206 @@
+"""Instrumentación de peticiones y SQL con salida en formato texto de Prometheus.
+
+Cada petición se mide por ruta y por ``accion`` del formulario (cargar_excel, guardar_bd,
+exportar_excel, eliminar...), igual que los trabajos en segundo plano. Solo las acciones
+conocidas (``ACCIONES``) son etiqueta; cualquier otro valor cuenta como ``otra``, así un
+formulario manipulado no puede crear series sin límite. Los eventos del
+motor de SQLAlchemy suman, para la petición o trabajo en curso del hilo, el número de
+consultas, el tiempo de SQL, las filas (``cursor.rowcount``: en PostgreSQL incluye las
+filas devueltas por un SELECT, en SQLite solo las afectadas por INSERT/UPDATE/DELETE)
+y la espera por una conexión del pool. Las consultas lentas quedan en una lista corta
+con sus parámetros.
+
+El costo es un par de ``perf_counter`` y sumas por consulta, así que está siempre activa.
+"""
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+PREFIJO = 'notificados'
+# Límites (en segundos) de los buckets del histograma de duración
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+UMBRAL_LENTA_MS = 200
+MAX_LENTAS = 50
+# Valores de 'accion' de los formularios de registrar_notificados y verificar_notificados
+ACCIONES = ('cargar_excel', 'guardar_bd', 'exportar_excel', 'eliminar', 'cambiar_pagina', 'buscar',
+            'simular_mantenimiento', 'mantenimiento')
+OTRA_ACCION = 'otra'
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(**valores):
+    return '{' + ','.join(f'{k}="{_escapar(v)}"' for k, v in valores.items()) + '}'
+
+
+class Metricas:
+    def __init__(self, umbral_lenta_ms=UMBRAL_LENTA_MS, max_lentas=MAX_LENTAS):
+        self.umbral_lenta = umbral_lenta_ms / 1000
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._duraciones = {}  # (ruta, accion, estado) -> [buckets..., suma, cantidad]
+        self._sql = {}  # (ruta, accion) -> [consultas, segundos, filas, espera_pool, conexiones]
+        self.lentas = deque(maxlen=max_lentas)
+
+    # --- Tramos: una petición o un trabajo en segundo plano ---
+    def iniciar(self, ruta, accion=''):
+        self._local.actual = {'ruta': ruta, 'accion': accion, 'inicio': time.perf_counter(),
+                              'consultas': 0, 'sql': 0.0, 'filas': 0, 'pool': 0.0, 'conexiones': 0}
+
+    def terminar(self, estado=''):
+        actual = getattr(self._local, 'actual', None)
+        if actual is None:
+            return None
+        self._local.actual = None
+        duracion = time.perf_counter() - actual['inicio']
+        with self._lock:
+            fila = self._duraciones.setdefault((actual['ruta'], actual['accion'], str(estado)),
+                                               [0] * (len(BUCKETS) + 2))
+            for i, limite in enumerate(BUCKETS):
+                if duracion <= limite:
+                    fila[i] += 1
+            fila[-2] += duracion
+            fila[-1] += 1
+            sql = self._sql.setdefault((actual['ruta'], actual['accion']), [0, 0.0, 0, 0.0, 0])
+            for i, clave in enumerate(('consultas', 'sql', 'filas', 'pool', 'conexiones')):
+                sql[i] += actual[clave]
+        actual['duracion'] = duracion
+        return actual
+
+    @contextmanager
+    def tramo(self, ruta, accion=''):
+        # Para medir trabajos fuera de una petición: with metricas.tramo('trabajo', 'importacion'): ...
+        self.iniciar(ruta, accion)
+        estado = 'ok'
+        try:
+            yield
+        except Exception:
+            estado = 'error'
+            raise
+        finally:
+            self.terminar(estado)
+
+    def medido(self, ruta, accion=''):
+        # Decorador equivalente a tramo() para funciones completas (p. ej. los trabajos)
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                with self.tramo(ruta, accion):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+
+    # --- Integración con Flask y SQLAlchemy ---
+    def instalar_flask(self, app, server_timing=False, acciones=ACCIONES):
+        from flask import request
+
+        @app.before_request
+        def _iniciar_peticion():
+            # Corre antes de login_required: el valor del formulario no se usa tal cual como etiqueta
+            accion = request.form.get('accion', '') if request.method == 'POST' else ''
+            if accion and accion not in acciones:
+                accion = OTRA_ACCION
+            self.iniciar(request.endpoint or 'sin_ruta', accion)
+
+        @app.after_request
+        def _server_timing(respuesta):
+            # Solo anota el estado y la cabecera: la medición se cierra en teardown_request
+            actual = getattr(self._local, 'actual', None)
+            if actual is None:
+                return respuesta
+            actual['estado'] = respuesta.status_code
+            if server_timing:
+                respuesta.headers['Server-Timing'] = (
+                    f"app;dur={(time.perf_counter() - actual['inicio']) * 1000:.1f}, "
+                    f"sql;dur={actual['sql'] * 1000:.1f};desc=\"{actual['consultas']} consultas\", "
+                    f"pool;dur={actual['pool'] * 1000:.1f}")
+            return respuesta
+
+        @app.teardown_request
+        def _terminar_peticion(error):
+            # Corre siempre, también cuando una excepción sin manejar se saltó after_request:
+            # así los 500 se cuentan y la medición no queda abierta en el hilo
+            actual = getattr(self._local, 'actual', None)
+            if actual is not None:
+                self.terminar(500 if error is not None else actual.get('estado', 500))
+
+    def instalar_motor(self, engine):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def _antes(conn, cursor, sentencia, parametros, contexto, executemany):
+            conn.info.setdefault('metricas_inicio', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def _despues(conn, cursor, sentencia, parametros, contexto, executemany):
+            duracion = time.perf_counter() - conn.info['metricas_inicio'].pop()
+            actual = getattr(self._local, 'actual', None)
+            if actual is not None:
+                actual['consultas'] += 1
+                actual['sql'] += duracion
+                actual['filas'] += max(cursor.rowcount, 0)
+            if duracion >= self.umbral_lenta:
+                self.lentas.append({
+                    'cuando': datetime.now().isoformat(timespec='seconds'),
+                    'ms': round(duracion * 1000, 1),
+                    'ruta': actual['ruta'] if actual else None,
+                    'accion': actual['accion'] if actual else None,
+                    'sql': sentencia[:2000],
+                    'parametros': repr(parametros[:5] if executemany else parametros)[:1000],
+                })
+
+        # El pool no tiene un evento "antes de pedir conexión": se envuelve pool.connect
+        pool = engine.pool
+        conectar = pool.connect
+
+        def connect_medido():
+            inicio = time.perf_counter()
+            try:
+                return conectar()
+            finally:
+                actual = getattr(self._local, 'actual', None)
+                if actual is not None:
+                    actual['pool'] += time.perf_counter() - inicio
+                    actual['conexiones'] += 1
+        pool.connect = connect_medido
+
+    # --- Salida ---
+    def texto_prometheus(self):
+        with self._lock:
+            duraciones = {k: list(v) for k, v in self._duraciones.items()}
+            sql = {k: list(v) for k, v in self._sql.items()}
+
+        nombre = f'{PREFIJO}_solicitud_segundos'
+        lineas = [f'# HELP {nombre} Duración de peticiones y trabajos por ruta y acción.',
+                  f'# TYPE {nombre} histogram']
+        for (ruta, accion, estado), fila in sorted(duraciones.items()):
+            for limite, acumulado in zip(BUCKETS, fila):
+                lineas.append(f'{nombre}_bucket{_etiquetas(ruta=ruta, accion=accion, estado=estado, le=limite)} {acumulado}')
+            lineas.append(f'{nombre}_bucket{_etiquetas(ruta=ruta, accion=accion, estado=estado, le="+Inf")} {fila[-1]}')
+            lineas.append(f'{nombre}_sum{_etiquetas(ruta=ruta, accion=accion, estado=estado)} {fila[-2]:.6f}')
+            lineas.append(f'{nombre}_count{_etiquetas(ruta=ruta, accion=accion, estado=estado)} {fila[-1]}')
+
+        series = [
+            ('sql_consultas_total', 'Consultas SQL ejecutadas.', 0),
+            ('sql_segundos_total', 'Tiempo total en SQL.', 1),
+            ('sql_filas_total', 'Filas según cursor.rowcount.', 2),
+            ('pool_espera_segundos_total', 'Tiempo esperando una conexión del pool.', 3),
+            ('pool_conexiones_total', 'Conexiones tomadas del pool.', 4),
+        ]
+        for sufijo, ayuda, indice in series:
+            nombre = f'{PREFIJO}_{sufijo}'
+            lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} counter']
+            for (ruta, accion), fila in sorted(sql.items()):
+                valor = fila[indice]
+                valor = f'{valor:.6f}' if isinstance(valor, float) else valor
+                lineas.append(f'{nombre}{_etiquetas(ruta=ruta, accion=accion)} {valor}')
+
+        nombre = f'{PREFIJO}_sql_lentas'
+        lineas += [f'# HELP {nombre} Consultas lentas guardadas (ver /metrics/consultas-lentas).',
+                   f'# TYPE {nombre} gauge', f'{nombre} {len(self.lentas)}']
+        return '\n'.join(lineas) + '\n'
@@ -0,0 +1,126 @@
+"""Escritura masiva de notificados.
+
+Inserta por bloques con transacciones cortas: COPY en PostgreSQL y executemany de
+``insert()`` en el resto (SQLite en local). En los modos ``actualizar`` y ``omitir``
+cada bloque se cruza con la tabla por la clave natural, de modo que volver a subir
+el mismo padrón no duplica registros.
+"""
+import io
+
+from sqlalchemy import bindparam, insert, select, update
+
+MODOS = ('insertar', 'actualizar', 'omitir')
+CLAVE_NATURAL = ('dni', 'codigo_libro', 'idioma')
+TAM_BLOQUE = 1000
+
+
+def clave_natural(registro):
+    # None y '' cuentan como el mismo valor dentro de la clave
+    return tuple((registro.get(c) or '') for c in CLAVE_NATURAL)
+
+
+def _en_bloques(filas, tam_bloque):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= tam_bloque:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def _valor_copy(valor):
+    # Formato texto de COPY: \N para NULL y escapes para los separadores
+    if valor is None:
+        return '\\N'
+    if hasattr(valor, 'isoformat'):
+        return valor.isoformat()
+    return (str(valor).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _copiar_postgresql(session, tabla, registros):
+    columnas = [c.name for c in tabla.columns if c.name in registros[0]]
+    buffer = io.StringIO()
+    for registro in registros:
+        buffer.write('\t'.join(_valor_copy(registro.get(c)) for c in columnas))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {tabla.name} ({', '.join(columnas)}) FROM STDIN", buffer)
+    finally:
+        cursor.close()
+
+
+def insertar_bloque(session, tabla, registros):
+    if not registros:
+        return
+    if session.get_bind().dialect.name == 'postgresql':
+        _copiar_postgresql(session, tabla, registros)
+    else:
+        session.execute(insert(tabla), registros)
+
+
+def _existentes(session, tabla, claves):
+    # Un solo SELECT ... WHERE dni IN (...) por bloque; el resto de la clave se compara en memoria
+    dnis = list({clave[0] for clave in claves})
+    consulta = select(tabla.c.id, *(tabla.c[c] for c in CLAVE_NATURAL)).where(tabla.c.dni.in_(dnis))
+    encontrados = {}
+    for fila in session.execute(consulta):
+        clave = tuple((v or '') for v in fila[1:])
+        if clave in claves:
+            encontrados.setdefault(clave, []).append(fila.id)
+    return encontrados
+
+
+def escribir_notificados(session, tabla, filas, modo='insertar', tam_bloque=TAM_BLOQUE,
+                         antes_de_confirmar=None, al_confirmar=None):
+    # Confirma cada bloque por separado y devuelve los contadores acumulados.
+    # antes_de_confirmar(session, altas, bajas) corre dentro de la transacción del bloque con las
+    # filas que entran y las versiones anteriores de las que se reemplazan (p. ej. para el resumen).
+    # al_confirmar(resumen) se llama después de cada commit para reportar el avance.
+    if modo not in MODOS:
+        raise ValueError(f'Modo de guardado desconocido: {modo}')
+    resumen = {'insertados': 0, 'actualizados': 0, 'omitidos': 0, 'bloques': 0}
+
+    for bloque in _en_bloques(filas, tam_bloque):
+        cambios, anteriores = [], []
+        if modo == 'insertar':
+            nuevos = bloque
+        else:
+            # Filas repetidas dentro del mismo bloque: en 'actualizar' gana la última, en 'omitir' la primera
+            por_clave = {}
+            for registro in bloque:
+                clave = clave_natural(registro)
+                if clave in por_clave:
+                    resumen['omitidos'] += 1
+                    if modo == 'omitir':
+                        continue
+                por_clave[clave] = registro
+
+            existentes = _existentes(session, tabla, por_clave)
+            nuevos = [r for clave, r in por_clave.items() if clave not in existentes]
+            if modo == 'actualizar':
+                cambios = [dict(por_clave[clave], id_existente=id_)
+                           for clave, ids in existentes.items() for id_ in ids]
+                if cambios:
+                    if antes_de_confirmar:
+                        ids = [c['id_existente'] for c in cambios]
+                        anteriores = session.execute(select(tabla).where(tabla.c.id.in_(ids))).mappings().all()
+                    session.execute(update(tabla).where(tabla.c.id == bindparam('id_existente')), cambios)
+                resumen['actualizados'] += len(existentes)
+            else:
+                resumen['omitidos'] += len(existentes)
+
+        insertar_bloque(session, tabla, nuevos)
+        resumen['insertados'] += len(nuevos)
+        if antes_de_confirmar:
+            antes_de_confirmar(session, nuevos + cambios, anteriores)
+        session.commit()
+        resumen['bloques'] += 1
+        if al_confirmar:
+            al_confirmar(resumen)
+
+    return resumen
@@ -0,0 +1,159 @@
+"""Proyección mensual de certificados por idioma y/o modalidad.
+
+Las series salen de los conteos mensuales del resumen (año, mes y desglose; ver
+estadisticas.contar_notificados) y se ajustan todas a la vez con mínimos cuadrados de
+NumPy. Cada serie se modela como
+
+    y(t) = a + b·t + Σ_k [c_k·cos(2πkt/12) + d_k·sin(2πkt/12)]
+
+(tendencia lineal más estacionalidad anual con k armónicos; con 6 armónicos cada mes del
+año tiene su propio efecto, lo que captura picos como los cierres de ciclo). Todas las series comparten
+los mismos meses, así que comparten la matriz de diseño X: un solo ``lstsq`` resuelve la
+matriz de series completa y la varianza de cada pronóstico es
+σ²·(1 + xᵀ(XᵀX)⁻¹x), con σ² propia de cada serie.
+
+El modelo ajustado (coeficientes, σ y (XᵀX)⁻¹) es JSON y se guarda en la caché de
+resultados, que cambia de versión con cada escritura en notificado: solo se vuelve a
+ajustar cuando llegan datos nuevos, y pronosticar N meses es un producto de matrices.
+NumPy se importa al primer uso, como en importacion.py.
+"""
+from datetime import date
+
+from estadisticas import ETIQUETAS_VACIAS
+
+np = None
+
+DESGLOSES = ('idioma', 'modalidad', 'idioma,modalidad')
+HORIZONTE = 12
+HORIZONTE_MAXIMO = 36
+VENTANA_MESES = 72  # Historia usada para el ajuste: la tendencia de hace más de 6 años ya no aplica
+MIN_MESES = 6
+MAX_ARMONICOS = 6
+Z_CONFIANZA = 1.96  # Bandas del 95 %
+TOTAL = 'Total'
+
+
+def _cargar_numpy():
+    global np
+    if np is None:
+        import numpy as np
+
+
+def _indice_mes(anio, mes):
+    return anio * 12 + mes - 1
+
+
+def _etiqueta_mes(indice):
+    return f'{indice // 12}-{indice % 12 + 1:02d}'
+
+
+def _nombre_serie(fila, dimensiones):
+    return ' · '.join(str(fila[d]) if fila[d] not in (None, '') else ETIQUETAS_VACIAS.get(d, '')
+                      for d in dimensiones)
+
+
+def armonicos(meses):
+    # Con pocos meses no se puede separar la estacionalidad del ruido: 0 armónicos con menos
+    # de un año, 1 con uno, 3 con dos y los 6 (un efecto por mes) desde tres años de historia
+    if meses >= 36:
+        return MAX_ARMONICOS
+    return {0: 0, 1: 1}.get(meses // 12, 3)
+
+
+def matriz_diseno(t, k, inicio=0):
+    # Columnas: 1, t y cos/sin de cada armónico; t cuenta meses desde el inicio de la historia
+    # y la fase usa el mes absoluto (inicio + t), así marzo cae siempre en el mismo punto del ciclo
+    t = np.asarray(t, dtype=float)
+    columnas = [np.ones_like(t), t]
+    for armonico in range(1, k + 1):
+        angulo = 2 * np.pi * armonico * (inicio + t) / 12
+        columnas.append(np.cos(angulo))
+        if 2 * armonico < 12:  # sin(π·t) vale 0 en meses enteros
+            columnas.append(np.sin(angulo))
+    return np.column_stack(columnas)
+
+
+def series_mensuales(filas, dimensiones, hasta):
+    # filas: conteos con anio_elaboracion, mes_elaboracion, las dimensiones y total.
+    # Devuelve (primer mes, nombres, matriz series × meses) hasta el mes anterior a 'hasta'
+    # (el mes en curso está incompleto); los meses sin registros cuentan 0.
+    _cargar_numpy()
+    fin = _indice_mes(hasta.year, hasta.month)
+    validas = [f for f in filas if f['anio_elaboracion'] and _indice_mes(f['anio_elaboracion'], f['mes_elaboracion']) < fin]
+    if not validas:
+        return None, [], np.zeros((0, 0))
+    meses = np.array([_indice_mes(f['anio_elaboracion'], f['mes_elaboracion']) for f in validas])
+    inicio = max(int(meses.min()), fin - VENTANA_MESES)
+    etiquetas = [_nombre_serie(f, dimensiones) for f in validas]
+    nombres = sorted(set(etiquetas))
+    posicion = {nombre: i for i, nombre in enumerate(nombres)}
+    series = np.array([posicion[e] for e in etiquetas])
+    totales = np.array([f['total'] for f in validas], dtype=float)
+    dentro = meses >= inicio
+
+    matriz = np.zeros((len(nombres), fin - inicio))
+    np.add.at(matriz, (series[dentro], meses[dentro] - inicio), totales[dentro])
+    return inicio, nombres, matriz
+
+
+def ajustar_modelos(filas, dimensiones, hasta=None):
+    # Ajusta todas las series (más la serie Total) en un solo lstsq; devuelve un dict JSON o None
+    _cargar_numpy()
+    inicio, nombres, matriz = series_mensuales(filas, dimensiones, hasta or date.today())
+    meses = matriz.shape[1]
+    if meses < MIN_MESES:
+        return None
+    if len(nombres) > 1:
+        nombres = nombres + [TOTAL]
+        matriz = np.vstack([matriz, matriz.sum(axis=0)])
+
+    k = armonicos(meses)
+    x = matriz_diseno(np.arange(meses), k, inicio)
+    coeficientes, _, rango, _ = np.linalg.lstsq(x, matriz.T, rcond=None)  # parámetros × series
+    ajuste = x @ coeficientes
+    libres = max(meses - rango, 1)
+    sigma = np.sqrt(((matriz.T - ajuste) ** 2).sum(axis=0) / libres)
+    return {
+        'inicio': inicio,
+        'meses': meses,
+        'armonicos': k,
+        'series': nombres,
+        'historico': matriz.tolist(),
+        'ajuste': ajuste.T.tolist(),
+        'coeficientes': coeficientes.tolist(),
+        'sigma': sigma.tolist(),
+        'covarianza': np.linalg.pinv(x.T @ x).tolist(),
+    }
+
+
+def pronosticar(modelo, horizonte=HORIZONTE):
+    # Pronóstico de los próximos 'horizonte' meses para todas las series, listo para Chart.js
+    _cargar_numpy()
+    inicio, meses = modelo['inicio'], modelo['meses']
+    t = np.arange(meses, meses + horizonte)
+    x = matriz_diseno(t, modelo['armonicos'], inicio)
+    coeficientes = np.array(modelo['coeficientes'])
+    prediccion = x @ coeficientes  # horizonte × series
+    apalancamiento = np.einsum('ij,jk,ik->i', x, np.array(modelo['covarianza']), x)
+    margen = Z_CONFIANZA * np.outer(np.sqrt(1 + apalancamiento), np.array(modelo['sigma']))
+
+    # Conteos: nada por debajo de 0
+    pronostico = np.clip(prediccion, 0, None)
+    inferior = np.clip(prediccion - margen, 0, None)
+    superior = np.clip(prediccion + margen, 0, None)
+    return {
+        'labels': [_etiqueta_mes(inicio + i) for i in range(meses + horizonte)],
+        'ultimo_historico': meses - 1,
+        'horizonte': horizonte,
+        'armonicos': modelo['armonicos'],
+        'nivel_confianza': 0.95,
+        'series': [{
+            'nombre': nombre,
+            'historico': [int(v) for v in modelo['historico'][i]],
+            'ajuste': [round(v, 1) for v in modelo['ajuste'][i]],
+            'pronostico': np.round(pronostico[:, i], 1).tolist(),
+            'inferior': np.round(inferior[:, i], 1).tolist(),
+            'superior': np.round(superior[:, i], 1).tolist(),
+            'sigma': round(modelo['sigma'][i], 2),
+        } for i, nombre in enumerate(modelo['series'])],
+    }
@@ -0,0 +1,79 @@
+"""Tabla resumen (rollup) de notificados por año, mes, idioma y modalidad.
+
+Se mantiene de forma incremental en las mismas transacciones que escriben en
+notificado (guardar_bd y los borrados), así los gráficos pueden contestar con unas
+pocas filas sin recorrer la tabla grande. ``comparar_resumen`` / ``reconstruir_resumen``
+la recalculan desde cero para detectar y corregir desviaciones.
+"""
+from collections import Counter
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Dimensiones que guarda el resumen; sin fecha se guarda año/mes 0 y sin idioma/modalidad ''
+CLAVES = ('anio', 'mes', 'idioma', 'modalidad')
+
+
+def clave_resumen(fila):
+    # fila: dict / Row con las columnas de notificado
+    return (fila['anio_elaboracion'] or 0, fila['mes_elaboracion'] or 0,
+            fila['idioma'] or '', fila['modalidad'] or '')
+
+
+def _expresiones_clave(tabla):
+    return (func.coalesce(tabla.c.anio_elaboracion, 0), func.coalesce(tabla.c.mes_elaboracion, 0),
+            func.coalesce(tabla.c.idioma, ''), func.coalesce(tabla.c.modalidad, ''))
+
+
+def conteos_notificado(session, tabla, *condiciones):
+    # Conteos por clave directamente desde notificado (para borrados y para verificar)
+    expresiones = _expresiones_clave(tabla)
+    consulta = select(*expresiones, func.count()).where(*condiciones).group_by(*expresiones)
+    return Counter({tuple(fila[:4]): fila[4] for fila in session.execute(consulta)})
+
+
+def aplicar_deltas(session, tabla_resumen, deltas):
+    # Suma los deltas con INSERT ... ON CONFLICT DO UPDATE (SQLite y PostgreSQL) y limpia los ceros
+    deltas = {clave: d for clave, d in deltas.items() if d}
+    if not deltas:
+        return
+    dialecto = session.get_bind().dialect.name
+    modulo = postgresql if dialecto == 'postgresql' else sqlite
+    sentencia = modulo.insert(tabla_resumen)
+    sentencia = sentencia.on_conflict_do_update(
+        index_elements=list(CLAVES),
+        set_={'total': tabla_resumen.c.total + sentencia.excluded.total},
+    )
+    session.execute(sentencia, [dict(zip(CLAVES, clave), total=d) for clave, d in deltas.items()])
+    session.execute(delete(tabla_resumen).where(tabla_resumen.c.total <= 0))
+
+
+def registrar_cambios(session, tabla_resumen, altas=(), bajas=()):
+    # altas / bajas: filas (dicts) que entran o salen de notificado en esta transacción
+    deltas = Counter(clave_resumen(f) for f in altas)
+    deltas.subtract(Counter(clave_resumen(f) for f in bajas))
+    aplicar_deltas(session, tabla_resumen, deltas)
+
+
+def registrar_borrado(session, tabla, tabla_resumen, *condiciones):
+    # Llamar ANTES del DELETE, con las mismas condiciones, dentro de la misma transacción
+    conteos = conteos_notificado(session, tabla, *condiciones)
+    aplicar_deltas(session, tabla_resumen, {clave: -n for clave, n in conteos.items()})
+
+
+def comparar_resumen(session, tabla, tabla_resumen):
+    # Devuelve [(clave, en_resumen, real)] para cada clave que no coincide
+    real = conteos_notificado(session, tabla)
+    guardado = Counter({tuple(f[:4]): f[4] for f in session.execute(
+        select(*(tabla_resumen.c[c] for c in CLAVES), tabla_resumen.c.total))})
+    return [(clave, guardado.get(clave, 0), real.get(clave, 0))
+            for clave in sorted(set(real) | set(guardado), key=str)
+            if guardado.get(clave, 0) != real.get(clave, 0)]
+
+
+def reconstruir_resumen(session, tabla, tabla_resumen):
+    session.execute(delete(tabla_resumen))
+    real = conteos_notificado(session, tabla)
+    if real:
+        session.execute(insert(tabla_resumen), [dict(zip(CLAVES, clave), total=n) for clave, n in real.items()])
+    return len(real)
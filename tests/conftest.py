@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+
+from datetime import date
+
+import pytest
+
+# app.py crea el motor al importarse: la base de pruebas se elige antes
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'pruebas.db')
+
+
+@pytest.fixture(scope='session')
+def app_bd():
+    from app import app, db, Notificado, User, actualizar_esquema
+    from benchmarks.generador import poblar_notificados
+
+    with app.app_context():
+        actualizar_esquema()
+        poblar_notificados(db.session, Notificado.__table__, 2000)
+        usuario = User(nombres='Prueba', apellidos='Prueba', dni='00000001', celular='900000001',
+                       email='prueba@colegio.pe', fecha_nacimiento=date(1990, 1, 1))
+        usuario.set_password('prueba')
+        db.session.add(usuario)
+        db.session.commit()
+        app.config['ID_USUARIO_PRUEBA'] = usuario.id
+    # Sin contexto abierto durante las pruebas: cada petición del cliente tiene su propia sesión
+    return app, db
+
+
+@pytest.fixture
+def cliente(app_bd):
+    # Cliente de pruebas con la sesión del usuario de prueba ya iniciada
+    app, _ = app_bd
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(app.config['ID_USUARIO_PRUEBA'])
+        sesion['_fresh'] = True
+    return cliente
+
+
+@pytest.fixture(scope='session')
+def motor_postgresql():
+    # Motor de una base PostgreSQL de pruebas (TEST_DATABASE_URL); sin ella la prueba se salta
+    url = os.environ.get('TEST_DATABASE_URL', '').replace('postgres://', 'postgresql://', 1)
+    if not url.startswith('postgresql'):
+        pytest.skip('TEST_DATABASE_URL no apunta a una base PostgreSQL de pruebas')
+    from sqlalchemy import create_engine
+
+    motor = create_engine(url)
+    yield motor
+    motor.dispose()
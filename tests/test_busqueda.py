@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from busqueda import pagina_notificados, total_filtrado
+
+IDIOMA = 'Paginacion'
+
+
+@pytest.fixture(scope='module')
+def paginables(app_bd):
+    # 30 filas de un idioma propio: 12 con la misma fecha (empates), 10 con fechas distintas y 8 sin fecha
+    app, db = app_bd
+    from app import Notificado
+
+    fechas = [date(2024, 6, 1)] * 12 + [date(2024, 6, 1) + timedelta(days=d) for d in range(-5, 5) if d] + \
+        [date(2023, 1, 1)] + [None] * 8
+    tabla = Notificado.__table__
+    with app.app_context():
+        db.session.execute(insert(tabla), [
+            {'nombres_apellidos': f'PAGINA {i}', 'dni': f'{75000000 + i}', 'idioma': IDIOMA, 'codigo_libro': f'PG-{i}',
+             'fecha_elaboracion': fecha} for i, fecha in enumerate(fechas)])
+        db.session.commit()
+    return app, db, tabla
+
+
+def recorrer(session, tabla, filtros, limite):
+    filas, cursor = [], None
+    while True:
+        pagina, cursor = pagina_notificados(session, tabla, filtros, cursor=cursor, limite=limite)
+        assert len(pagina) <= limite
+        filas += pagina
+        if cursor is None:
+            return filas
+
+
+def orden(fila):
+    # Clave del orden esperado: primero las fechas más recientes, luego las filas sin fecha; id DESC
+    return (fila['fecha_elaboracion'] is None, -(fila['fecha_elaboracion'] or date.min).toordinal(), -fila['id'])
+
+
+@pytest.mark.parametrize('limite', [1, 3, 7, 12, 30, 31])
+def test_recorrer_todas_las_paginas(paginables, limite):
+    app, db, tabla = paginables
+    filtros = {'idiomas': [IDIOMA]}
+    with app.app_context():
+        filas = recorrer(db.session, tabla, filtros, limite)
+        total = total_filtrado(db.session, tabla, filtros)
+    ids = [f['id'] for f in filas]
+    assert total == 30
+    assert len(ids) == len(set(ids)) == total  # Sin repetidas ni huecos
+    assert filas == sorted(filas, key=orden)
+
+
+def test_recorrer_la_tabla_completa(paginables):
+    app, db, tabla = paginables
+    with app.app_context():
+        filas = recorrer(db.session, tabla, {}, 97)
+        total = total_filtrado(db.session, tabla, {})
+    assert len({f['id'] for f in filas}) == len(filas) == total
+    assert filas == sorted(filas, key=orden)
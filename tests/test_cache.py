@@ -0,0 +1,95 @@
+import time
+from urllib.parse import parse_qs, urlparse
+
+from sqlalchemy import insert, select
+
+from cache import AlmacenMemoria, crear_cache
+from texto import texto_busqueda
+from trabajos import TERMINADO
+
+
+def test_memoria_vence_lo_escrito_por_otro_proceso():
+    # La versión en memoria no ve un invalidar() de otro proceso: el resultado vence solo
+    cache = crear_cache('memoria', segundos_vida=0.05)
+    calculos = []
+    calcular = lambda: calculos.append(1) or len(calculos)  # noqa: E731
+    assert cache.obtener_o_calcular('total', {}, calcular) == 1
+    assert cache.obtener_o_calcular('total', {}, calcular) == 1
+    time.sleep(0.06)
+    assert cache.obtener_o_calcular('total', {}, calcular) == 2
+
+
+def test_memoria_lru_y_version():
+    almacen = AlmacenMemoria(tam_maximo=2)
+    for clave in 'abc':
+        almacen.guardar(clave, clave.upper())
+    assert almacen.obtener('a') == (False, None)
+    assert almacen.obtener('c') == (True, 'C')
+    almacen.incrementar_version()
+    assert almacen.tamano() == 0
+
+
+def test_sqlite_comparte_la_version_entre_procesos(tmp_path):
+    # Dos CacheResultados sobre el mismo archivo son como dos workers (o un worker y un comando flask)
+    ruta = str(tmp_path / 'cache.db')
+    worker, comando = crear_cache('sqlite', ruta), crear_cache('sqlite', ruta)
+    assert worker.obtener_o_calcular('total', {}, lambda: 1) == 1
+    assert worker.obtener_o_calcular('total', {}, lambda: 2) == 1
+    comando.invalidar()
+    assert worker.obtener_o_calcular('total', {}, lambda: 2) == 2
+
+
+def total_api(cliente, texto):
+    return cliente.get('/api/notificados', query_string={'q': texto}).get_json()['total']
+
+
+def insertar(app, db, nombre, dni):
+    from app import Notificado
+
+    with app.app_context():
+        # Directo a la tabla, sin invalidar: la caché sigue con el total anterior hasta la escritura probada
+        db.session.execute(insert(Notificado.__table__).values(
+            nombres_apellidos=nombre, dni=dni, idioma='Ingles', codigo_libro=f'C-{dni}', modalidad='ESTUDIO',
+            texto_busqueda=texto_busqueda({'nombres_apellidos': nombre, 'dni': dni, 'codigo_libro': f'C-{dni}'})))
+        db.session.commit()
+        return db.session.scalar(select(Notificado.id).where(Notificado.dni == dni))
+
+
+def test_guardar_bd_invalida_el_total(app_bd, cliente):
+    assert total_api(cliente, 'CACHE GUARDAR') == 0
+    cliente.post('/registrar_notificados', data={
+        'accion': 'guardar_bd', 'fila_id[]': [''], 'nombres_apellidos[]': ['CACHE GUARDAR UNO'],
+        'dni[]': ['71000001'], 'idioma[]': ['Ingles'], 'codigo_libro[]': ['CG-1'], 'modalidad[]': ['ESTUDIO']})
+    assert total_api(cliente, 'CACHE GUARDAR') == 1
+
+
+def test_eliminar_invalida_el_total(app_bd, cliente):
+    app, db = app_bd
+    id_ = insertar(app, db, 'CACHE ELIMINAR UNO', '71000002')
+    assert total_api(cliente, 'CACHE ELIMINAR') == 1
+    cliente.post('/verificar_notificados', data={'accion': 'eliminar', 'eliminar_ids': [str(id_)]})
+    assert total_api(cliente, 'CACHE ELIMINAR') == 0
+
+
+def test_mantenimiento_invalida_el_total(app_bd, cliente):
+    app, db = app_bd
+    insertar(app, db, 'CACHE MANTENIMIENTO UNO', '71000003')
+    assert total_api(cliente, 'CACHE MANTENIMIENTO') == 1
+    respuesta = cliente.post('/verificar_notificados', data={
+        'accion': 'mantenimiento', 'modo_mantenimiento': 'eliminar', 'q': 'CACHE MANTENIMIENTO'})
+    trabajo_id = parse_qs(urlparse(respuesta.location).query)['trabajo'][0]
+    for _ in range(50):
+        if cliente.get(f'/api/trabajos/{trabajo_id}').get_json()['estado'] == TERMINADO:
+            break
+        time.sleep(0.1)
+    assert total_api(cliente, 'CACHE MANTENIMIENTO') == 0
+
+
+def test_comando_mantenimiento_invalida_el_total(app_bd, cliente):
+    app, db = app_bd
+    insertar(app, db, 'CACHE COMANDO UNO', '71000004')
+    assert total_api(cliente, 'CACHE COMANDO') == 1
+    resultado = app.test_cli_runner().invoke(args=['mantenimiento', '--modo', 'eliminar', '--q', 'CACHE COMANDO',
+                                                   '--si'])
+    assert resultado.exit_code == 0, resultado.output
+    assert total_api(cliente, 'CACHE COMANDO') == 0
@@ -0,0 +1,24 @@
+from duplicados import DUPLICADO, NUEVO, PROBABLE, detectar_duplicados, normalizar_nombre
+from texto import doblar
+
+
+def test_normalizar_nombre_usa_el_doblado_de_texto():
+    assert normalizar_nombre('Quispe Flores, José') == normalizar_nombre('JOSE QUISPE FLORES') == 'FLORES JOSE QUISPE'
+    assert normalizar_nombre('Ñaupari Pérez, Noemí') == ' '.join(sorted(doblar('Ñaupari Pérez Noemí').split()))
+    assert normalizar_nombre(None) == ''
+
+
+def test_nombre_casi_igual_con_dni_cercano_dentro_del_archivo(app_bd):
+    app, db = app_bd
+    from app import Notificado
+
+    filas = [
+        (1, 1, 'Zoila Yupanqui Tello', '41234567', 'Ingles', 'ZZ-1'),
+        (2, 2, 'YUPANQUI TELLO ZOILA', '41234568', 'Ingles', 'ZZ-2'),  # Un dígito distinto
+        (3, 3, 'Zoila Yupanqui Tello', '41234567', 'Ingles', 'ZZ-1'),  # Repetida
+    ]
+    with app.app_context():
+        revision = detectar_duplicados(db.session, Notificado.__table__, filas)
+    assert revision[1] == (NUEVO, None)
+    assert revision[2][0] == PROBABLE and 'DNI casi igual' in revision[2][1]
+    assert revision[3][0] == DUPLICADO
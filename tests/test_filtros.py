@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+from werkzeug.datastructures import MultiDict
+
+from filtros import FILTROS_EJEMPLO, condiciones_filtros, leer_filtros, plan_consulta, usa_indice
+from texto import instalar_indice_texto
+
+# Además de los ejemplos de "flask explicar-filtros", combinaciones que usan las pantallas
+COMBINACIONES = FILTROS_EJEMPLO + [
+    {'meses': [3], 'idiomas': ['Ingles']},
+    {'anios': [2024], 'modalidades': ['ESTUDIO']},
+    {'anios': [2022, 2024], 'meses': [12]},
+    {'idiomas': ['Ingles'], 'texto': 'QUISPE'},
+]
+
+
+@pytest.mark.parametrize('filtros', COMBINACIONES, ids=str)
+def test_filtros_usan_indice(app_bd, filtros):
+    app, db = app_bd
+    from app import Notificado
+
+    tabla = Notificado.__table__
+    consulta = db.select(tabla.c.id).where(*condiciones_filtros(tabla, filtros))
+    with app.app_context():
+        plan = plan_consulta(db.session, consulta)
+    assert usa_indice(plan), plan
+
+
+@pytest.fixture(scope='module')
+def notificado_postgresql(motor_postgresql):
+    # notificado con sus índices y datos sintéticos en la base de pruebas; se borra al terminar
+    from app import Notificado
+    from benchmarks.generador import poblar_notificados
+
+    tabla = Notificado.__table__
+    tabla.drop(motor_postgresql, checkfirst=True)
+    tabla.create(motor_postgresql)
+    try:
+        instalar_indice_texto(motor_postgresql, tabla)
+        with Session(motor_postgresql) as session:
+            poblar_notificados(session, tabla, 2000)
+        with motor_postgresql.begin() as conn:
+            conn.execute(text(f'ANALYZE {tabla.name}'))
+        yield tabla
+    finally:
+        tabla.drop(motor_postgresql)
+
+
+@pytest.mark.parametrize('filtros', COMBINACIONES, ids=str)
+def test_filtros_usan_indice_postgresql(motor_postgresql, notificado_postgresql, filtros):
+    tabla = notificado_postgresql
+    consulta = select(tabla.c.id).where(*condiciones_filtros(tabla, filtros))
+    with Session(motor_postgresql) as session:
+        plan = plan_consulta(session, consulta)
+        session.rollback()  # Descarta el SET LOCAL enable_seqscan
+    assert usa_indice(plan), plan
+
+
+def test_usa_indice_detecta_recorrido_completo():
+    assert not usa_indice(['SCAN notificado'])
+    assert not usa_indice(['Seq Scan on notificado  (cost=0.00..1.00 rows=1 width=4)'])
+    assert usa_indice(['SEARCH notificado USING INDEX ix_notificado_fecha_elaboracion (fecha_elaboracion>? AND fecha_elaboracion<?)',
+                       'SCAN notificado_fts VIRTUAL TABLE INDEX 0:M1'])
+
+
+def test_leer_filtros_descarta_anios_y_meses_fuera_de_rango():
+    filtros = leer_filtros(MultiDict([('anio', '0'), ('anio', '99999'), ('anio', '2024'), ('anio', 'x'),
+                                      ('mes', '13'), ('mes', '3'), ('q', 'José  Peña')]))
+    assert filtros['anios'] == [2024]
+    assert filtros['meses'] == [3]
+    assert filtros['texto'] == 'JOSE PENA'
+
+
+def test_anio_invalido_no_rompe_las_rutas(app_bd, cliente):
+    assert cliente.get('/api/notificados?anio=0&anio=99999').status_code == 200
+    assert cliente.post('/verificar_notificados', data={'accion': 'buscar', 'anio': '0'}).status_code == 200
+    assert cliente.post('/graficos_proyeccion', data={'anio': '99999'}).status_code == 200
@@ -0,0 +1,33 @@
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from mantenimiento import mantener_notificados
+from trabajos import MENSAJE_ERROR_INTERNO, mensaje_error
+
+REGISTRO = {'nombres_apellidos': 'ARCHIVO PRUEBA UNO', 'dni': '70000001', 'idioma': 'Ingles',
+            'codigo_libro': 'ARC-1', 'modalidad': 'ESTUDIO', 'texto_busqueda': 'ARCHIVO PRUEBA UNO 70000001 ARC 1'}
+
+
+def test_archivar_dos_veces_el_mismo_id(app_bd):
+    # SQLite reutiliza los ids de una tabla vaciada: un id ya archivado puede volver a archivarse
+    app, db = app_bd
+    from app import Notificado, NotificadoArchivo, ResumenNotificado
+
+    tabla, archivo = Notificado.__table__, NotificadoArchivo.__table__
+    filtros = {'texto': 'ARCHIVO PRUEBA UNO'}
+    with app.app_context():
+        for _ in range(2):
+            db.session.execute(insert(tabla).values(id=10 ** 7, **REGISTRO))
+            db.session.commit()
+            assert mantener_notificados(db.session, tabla, ResumenNotificado.__table__, filtros, 'archivar',
+                                        tabla_archivo=archivo) == 1
+        archivados = db.session.execute(select(archivo.c.id, archivo.c.id_original)
+                                        .where(archivo.c.id_original == 10 ** 7)).all()
+        assert len(archivados) == 2 and len({a.id for a in archivados}) == 2
+        assert db.session.scalar(select(func.count()).where(tabla.c.id == 10 ** 7)) == 0
+
+
+def test_mensaje_de_error_sin_sql():
+    error = IntegrityError("INSERT INTO notificado_archivo ... ('70000001', 'ARCHIVO PRUEBA UNO')", {}, Exception('UNIQUE'))
+    assert mensaje_error(error) == MENSAJE_ERROR_INTERNO
+    assert mensaje_error(ValueError('Seleccione al menos un filtro.')) == 'Seleccione al menos un filtro.'
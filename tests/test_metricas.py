@@ -0,0 +1,46 @@
+import uuid
+
+import pytest
+
+EXTERNA = {'REMOTE_ADDR': '203.0.113.5'}
+
+
+def test_accion_desconocida_no_crea_series(app_bd):
+    app, _ = app_bd
+    from app import metricas
+
+    cliente = app.test_client()
+    inventadas = [uuid.uuid4().hex for _ in range(20)]
+    for accion in inventadas:
+        cliente.post('/login', data={'accion': accion, 'email': 'x@x.pe', 'password': 'x'})
+    texto = metricas.texto_prometheus()
+    assert not any(accion in texto for accion in inventadas)
+    assert 'accion="otra"' in texto
+
+
+def test_metrics_requiere_token_fuera_de_la_maquina(app_bd, monkeypatch):
+    app, _ = app_bd
+    cliente = app.test_client()
+    assert cliente.get('/metrics').status_code == 200
+    assert cliente.get('/metrics', environ_base=EXTERNA).status_code == 401
+
+    monkeypatch.setitem(app.config, 'METRICAS_TOKEN', 'secreto')
+    assert cliente.get('/metrics', environ_base=EXTERNA).status_code == 401
+    assert cliente.get('/metrics', environ_base=EXTERNA,
+                       headers={'Authorization': 'Bearer secreto'}).status_code == 200
+
+
+def test_excepcion_sin_manejar_cuenta_como_500(app_bd, monkeypatch):
+    # Con PROPAGATE_EXCEPTIONS Flask no llama a after_request; teardown_request sí corre
+    app, _ = app_bd
+    from app import metricas
+
+    def rota():
+        raise RuntimeError('falla de prueba')
+
+    monkeypatch.setitem(app.config, 'PROPAGATE_EXCEPTIONS', True)
+    monkeypatch.setitem(app.view_functions, 'logout', rota)
+    with pytest.raises(RuntimeError):
+        app.test_client().get('/logout')
+    assert getattr(metricas._local, 'actual', None) is None
+    assert 'ruta="logout",accion="",estado="500"' in metricas.texto_prometheus()
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import func, select
+
+from persistencia import escribir_notificados
+
+
+def registro(dni, nombre='PERSISTENCIA PRUEBA', libro='PER-1', idioma='Ingles'):
+    return {'nombres_apellidos': nombre, 'dni': dni, 'idioma': idioma, 'codigo_libro': libro,
+            'modalidad': 'ESTUDIO'}
+
+
+def guardados(session, tabla, dnis):
+    # {dni: [nombres]} de los registros con esos DNIs
+    filas = session.execute(select(tabla.c.dni, tabla.c.nombres_apellidos).where(tabla.c.dni.in_(dnis))
+                            .order_by(tabla.c.id)).all()
+    resultado = {}
+    for dni, nombre in filas:
+        resultado.setdefault(dni, []).append(nombre)
+    return resultado
+
+
+@pytest.fixture
+def notificado(app_bd):
+    # (session, tabla) dentro de un contexto de la app
+    app, db = app_bd
+    from app import Notificado
+
+    with app.app_context():
+        yield db.session, Notificado.__table__
+
+
+def test_insertar_no_cruza_con_la_tabla(notificado):
+    session, tabla = notificado
+    filas = [registro('73000001'), registro('73000002')]
+    avance = []
+    resumen = escribir_notificados(session, tabla, filas, tam_bloque=1,
+                                   al_confirmar=lambda r: avance.append(r['bloques']))
+    assert resumen == {'insertados': 2, 'actualizados': 0, 'omitidos': 0, 'bloques': 2}
+    assert avance == [1, 2]
+    # Volver a subir lo mismo en 'insertar' duplica: para eso están 'actualizar' y 'omitir'
+    assert escribir_notificados(session, tabla, filas)['insertados'] == 2
+    assert {dni: len(n) for dni, n in guardados(session, tabla, ['73000001', '73000002']).items()} == \
+        {'73000001': 2, '73000002': 2}
+
+
+def test_actualizar_dos_veces_el_mismo_padron(notificado):
+    session, tabla = notificado
+    filas = [registro('73000011'), registro('73000012'), registro('73000012', idioma='Italiano')]
+    assert escribir_notificados(session, tabla, filas, modo='actualizar') == \
+        {'insertados': 3, 'actualizados': 0, 'omitidos': 0, 'bloques': 1}
+
+    corregidas = [dict(f, nombres_apellidos='PERSISTENCIA CORREGIDA') for f in filas]
+    assert escribir_notificados(session, tabla, corregidas, modo='actualizar') == \
+        {'insertados': 0, 'actualizados': 3, 'omitidos': 0, 'bloques': 1}
+    assert guardados(session, tabla, ['73000011', '73000012']) == {
+        '73000011': ['PERSISTENCIA CORREGIDA'], '73000012': ['PERSISTENCIA CORREGIDA'] * 2}
+
+
+def test_omitir_dos_veces_el_mismo_padron(notificado):
+    session, tabla = notificado
+    filas = [registro('73000021'), registro('73000022')]
+    assert escribir_notificados(session, tabla, filas, modo='omitir')['insertados'] == 2
+
+    otra_vez = [dict(f, nombres_apellidos='PERSISTENCIA IGNORADA') for f in filas] + [registro('73000023')]
+    assert escribir_notificados(session, tabla, otra_vez, modo='omitir') == \
+        {'insertados': 1, 'actualizados': 0, 'omitidos': 2, 'bloques': 1}
+    assert guardados(session, tabla, ['73000021', '73000022', '73000023']) == \
+        {dni: ['PERSISTENCIA PRUEBA'] for dni in ('73000021', '73000022', '73000023')}
+
+
+@pytest.mark.parametrize('modo, dni, gana', [('actualizar', '73000031', 'SEGUNDA'), ('omitir', '73000032', 'PRIMERA')])
+def test_repetidas_dentro_del_bloque(notificado, modo, dni, gana):
+    # Misma clave (dni, codigo_libro, idioma): None y '' en el libro cuentan como iguales
+    session, tabla = notificado
+    filas = [registro(dni, nombre='PRIMERA', libro=None), registro(dni, nombre='SEGUNDA', libro=''),
+             registro(dni, nombre='OTRO IDIOMA', libro='', idioma='Quechua')]
+    assert escribir_notificados(session, tabla, filas, modo=modo) == \
+        {'insertados': 2, 'actualizados': 0, 'omitidos': 1, 'bloques': 1}
+    assert guardados(session, tabla, [dni]) == {dni: [gana, 'OTRO IDIOMA']}
+
+
+def test_repetidas_en_bloques_distintos(notificado):
+    # La segunda aparición ya está confirmada en la tabla cuando llega su bloque
+    session, tabla = notificado
+    filas = [registro('73000041', nombre='PRIMERA'), registro('73000041', nombre='SEGUNDA')]
+    assert escribir_notificados(session, tabla, filas, modo='actualizar', tam_bloque=1) == \
+        {'insertados': 1, 'actualizados': 1, 'omitidos': 0, 'bloques': 2}
+    assert guardados(session, tabla, ['73000041']) == {'73000041': ['SEGUNDA']}
+    assert session.scalar(select(func.count()).where(tabla.c.dni == '73000041')) == 1
+
+
+def test_modo_desconocido(notificado):
+    session, tabla = notificado
+    with pytest.raises(ValueError):
+        escribir_notificados(session, tabla, [registro('73000051')], modo='reemplazar')
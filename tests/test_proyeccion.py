@@ -0,0 +1,97 @@
+import json
+import math
+from datetime import date
+
+import pytest
+
+from proyeccion import DESGLOSES, MIN_MESES, TOTAL, ajustar_modelos, armonicos, pronosticar
+
+HASTA = date(2025, 1, 1)
+IDIOMAS = ('Ingles', 'Quechua')
+MODALIDADES = ('ESTUDIO', '')
+
+
+def conteos(meses, total=lambda i, t: 20 + t + 10 * math.sin(t * math.pi / 6) + 5 * i, hasta=HASTA):
+    # Filas como las de contar_notificados: 'meses' meses completos antes de 'hasta', por idioma y modalidad
+    filas = []
+    fin = hasta.year * 12 + hasta.month - 1
+    for t, indice in enumerate(range(fin - meses, fin)):
+        for i, (idioma, modalidad) in enumerate((a, b) for a in IDIOMAS for b in MODALIDADES):
+            filas.append({'anio_elaboracion': indice // 12, 'mes_elaboracion': indice % 12 + 1, 'idioma': idioma,
+                          'modalidad': modalidad, 'total': max(0, round(total(i, t)))})
+    return filas
+
+
+@pytest.mark.parametrize('desglose, series', [
+    ('idioma', ['Ingles', 'Quechua', TOTAL]),
+    ('modalidad', ['ESTUDIO', 'Sin Modalidad', TOTAL]),
+    ('idioma,modalidad', ['Ingles · ESTUDIO', 'Ingles · Sin Modalidad', 'Quechua · ESTUDIO',
+                          'Quechua · Sin Modalidad', TOTAL]),
+])
+def test_forma_por_desglose(desglose, series):
+    assert desglose in DESGLOSES
+    modelo = ajustar_modelos(conteos(40), desglose.split(','), HASTA)
+    json.dumps(modelo)  # Se guarda en la caché de resultados
+    resultado = pronosticar(json.loads(json.dumps(modelo)), horizonte=12)
+    assert [s['nombre'] for s in resultado['series']] == series
+    assert len(resultado['labels']) == 40 + 12
+    assert resultado['labels'][resultado['ultimo_historico']] == '2024-12'
+    assert resultado['labels'][-1] == '2025-12'
+    for serie in resultado['series']:
+        assert len(serie['historico']) == len(serie['ajuste']) == 40
+        assert len(serie['pronostico']) == len(serie['inferior']) == len(serie['superior']) == 12
+    total = resultado['series'][-1]['historico']
+    assert total == [sum(s['historico'][m] for s in resultado['series'][:-1]) for m in range(40)]
+
+
+@pytest.mark.parametrize('meses', [MIN_MESES, 13, 30, 72])
+def test_bandas_ordenadas_y_no_negativas(meses):
+    resultado = pronosticar(ajustar_modelos(conteos(meses), ['idioma'], HASTA), horizonte=36)
+    for serie in resultado['series']:
+        for inferior, pronostico, superior in zip(serie['inferior'], serie['pronostico'], serie['superior']):
+            assert 0 <= inferior <= pronostico <= superior
+
+
+def test_serie_en_caida_no_baja_de_cero():
+    # Una tendencia que cruza el cero dentro del horizonte: se recorta a 0, bandas incluidas
+    modelo = ajustar_modelos(conteos(24, total=lambda i, t: 60 - 2.5 * t), ['idioma'], HASTA)
+    resultado = pronosticar(modelo, horizonte=24)
+    assert modelo['coeficientes'][1][0] < 0
+    for serie in resultado['series']:
+        assert serie['pronostico'][-1] == 0
+        assert min(serie['inferior'] + serie['pronostico'] + serie['superior']) >= 0
+
+
+@pytest.mark.parametrize('meses, esperado', [(6, 0), (11, 0), (12, 1), (23, 1), (24, 3), (35, 3), (36, 6), (90, 6)])
+def test_armonicos_segun_historia(meses, esperado):
+    assert armonicos(meses) == esperado
+    modelo = ajustar_modelos(conteos(meses), ['idioma'], HASTA)
+    assert modelo['armonicos'] == esperado
+    assert modelo['meses'] == min(meses, 72)  # VENTANA_MESES
+
+
+def test_historia_corta_o_vacia():
+    assert ajustar_modelos([], ['idioma'], HASTA) is None
+    assert ajustar_modelos(conteos(MIN_MESES - 1), ['idioma'], HASTA) is None
+    # Sin fecha (año 0) y el mes en curso no cuentan como historia
+    sin_fecha = [dict(f, anio_elaboracion=None, mes_elaboracion=None) for f in conteos(24)]
+    assert ajustar_modelos(sin_fecha, ['idioma'], HASTA) is None
+    en_curso = conteos(1, hasta=date(2025, 2, 1))
+    assert ajustar_modelos(conteos(MIN_MESES - 1) + en_curso, ['idioma'], HASTA) is None
+
+
+def test_una_sola_serie_sin_total():
+    filas = [f for f in conteos(24) if f['idioma'] == 'Ingles']
+    resultado = pronosticar(ajustar_modelos(filas, ['idioma'], HASTA))
+    assert [s['nombre'] for s in resultado['series']] == ['Ingles']
+
+
+@pytest.mark.parametrize('desglose', DESGLOSES)
+def test_api_por_desglose(cliente, desglose):
+    respuesta = cliente.get('/api/graficos/proyeccion', query_string={'desglose': desglose, 'horizonte': 6})
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    assert datos['desglose'] == desglose
+    for serie in datos['series']:
+        assert len(serie['pronostico']) == 6
+    assert cliente.get('/api/graficos/proyeccion', query_string={'desglose': 'dni'}).status_code == 400
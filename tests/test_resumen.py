@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import insert, select, update
+
+from resumen import comparar_resumen, reconstruir_resumen
+
+FORMULARIO = {'accion': 'guardar_bd', 'fila_id[]': ['', ''], 'nombres_apellidos[]': ['RESUMEN UNO', 'RESUMEN DOS'],
+              'dni[]': ['74000001', '74000002'], 'idioma[]': ['Ingles', 'Quechua'], 'codigo_libro[]': ['RS-1', 'RS-2'],
+              'fecha_elaboracion[]': ['2023-05-10', ''], 'modalidad[]': ['ESTUDIO', 'UBICACIÓN']}
+
+
+@pytest.fixture
+def tablas(app_bd):
+    # Parte de un resumen recién reconstruido: otras pruebas escriben en notificado sin pasar por él
+    app, db = app_bd
+    from app import Notificado, ResumenNotificado
+
+    with app.app_context():
+        reconstruir_resumen(db.session, Notificado.__table__, ResumenNotificado.__table__)
+        db.session.commit()
+    return app, db, Notificado.__table__, ResumenNotificado.__table__
+
+
+def diferencias(app, db, tabla, resumen):
+    with app.app_context():
+        return comparar_resumen(db.session, tabla, resumen)
+
+
+def ids_por_dni(app, db, tabla, *dnis):
+    with app.app_context():
+        return [i for (i,) in db.session.execute(select(tabla.c.id).where(tabla.c.dni.in_(dnis)))]
+
+
+@pytest.mark.parametrize('modo', ['insertar', 'actualizar', 'omitir'])
+def test_guardar_bd(tablas, cliente, modo):
+    app, db, tabla, resumen = tablas
+    cliente.post('/registrar_notificados', data=dict(FORMULARIO, modo_guardado=modo))
+    # Segunda vez con otro idioma y sin fecha: en 'actualizar' los registros cambian de grupo
+    cliente.post('/registrar_notificados', data=dict(FORMULARIO, modo_guardado=modo, **{
+        'idioma[]': ['Ingles', 'Italiano'], 'fecha_elaboracion[]': ['', '2024-01-31']}))
+    assert ids_por_dni(app, db, tabla, '74000001', '74000002')
+    assert diferencias(app, db, tabla, resumen) == []
+
+
+def test_eliminar(tablas, cliente):
+    app, db, tabla, resumen = tablas
+    cliente.post('/registrar_notificados', data=dict(FORMULARIO, **{'dni[]': ['74000011', '74000012']}))
+    ids = ids_por_dni(app, db, tabla, '74000011', '74000012')
+    cliente.post('/verificar_notificados', data={'accion': 'eliminar', 'eliminar_ids': [str(i) for i in ids]})
+    assert ids_por_dni(app, db, tabla, '74000011', '74000012') == []
+    assert diferencias(app, db, tabla, resumen) == []
+
+
+@pytest.mark.parametrize('modo, anio', [('eliminar', 2021), ('archivar', 2022)])
+def test_mantenimiento(tablas, modo, anio):
+    app, db, tabla, resumen = tablas
+    from app import ejecutar_mantenimiento
+
+    with app.app_context():
+        filtros = {'anios': [anio], 'idiomas': ['Ingles']}
+        filas, _ = ejecutar_mantenimiento(filtros, modo, 'tabla')
+        assert filas > 0
+        assert comparar_resumen(db.session, tabla, resumen) == []
+
+
+def test_reconstruir_corrige_desvios(tablas):
+    app, db, tabla, resumen = tablas
+    with app.app_context():
+        db.session.execute(update(resumen).values(total=resumen.c.total + 1))
+        db.session.execute(insert(resumen).values(anio=1999, mes=1, idioma='Latin', modalidad='', total=3))
+        db.session.commit()
+        assert comparar_resumen(db.session, tabla, resumen)
+
+        reconstruir_resumen(db.session, tabla, resumen)
+        db.session.commit()
+        assert comparar_resumen(db.session, tabla, resumen) == []
@@ -0,0 +1,134 @@
+import io
+import time
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from openpyxl import Workbook
+from sqlalchemy import func, select, update
+
+from trabajos import TERMINADO
+
+FILAS = 250  # Tres páginas de vista previa (FILAS_POR_PAGINA = 100)
+
+
+def padron(filas=FILAS):
+    libro = Workbook()
+    hoja = libro.active
+    hoja.append(['NOMBRES Y APELLIDOS', 'DNI', 'IDIOMA', 'CODIGO', 'F. ELABORACION', 'MODALIDAD'])
+    for i in range(1, filas + 1):
+        hoja.append([f'STAGING ALUMNO {i}', f'{76000000 + i}', 'Ingles', f'ST-{i}', datetime(2024, 3, 1), 'ESTUDIO'])
+    hoja.append([None] * 6)  # Fila en blanco al final, como deja Excel
+    salida = io.BytesIO()
+    libro.save(salida)
+    salida.seek(0)
+    return salida
+
+
+@pytest.fixture(scope='module')
+def importacion_subida(app_bd):
+    # Sube el padrón por la API de trabajos y devuelve el ID de la importación en staging
+    app, _ = app_bd
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(app.config['ID_USUARIO_PRUEBA'])
+    respuesta = cliente.post('/api/trabajos/importacion', content_type='multipart/form-data',
+                             data={'file': (padron(), 'padron.xlsx')})
+    url_estado = respuesta.get_json()['url_estado']
+    for _ in range(100):
+        trabajo = cliente.get(url_estado).get_json()
+        if trabajo['estado'] not in ('pendiente', 'en_curso'):
+            break
+        time.sleep(0.1)
+    assert trabajo['estado'] == TERMINADO, trabajo['mensaje']
+    return parse_qs(urlparse(trabajo['url_resultado']).query)['import_id'][0]
+
+
+def filas_staging(app, db, import_id):
+    from app import FilaImportacion
+
+    tabla = FilaImportacion.__table__
+    with app.app_context():
+        return db.session.execute(select(tabla).where(tabla.c.importacion_id == import_id)
+                                  .order_by(tabla.c.fila)).mappings().all()
+
+
+def test_subir_deja_las_filas_en_staging(app_bd, importacion_subida):
+    app, db = app_bd
+    from app import Importacion
+
+    filas = filas_staging(app, db, importacion_subida)
+    assert [f['fila'] for f in filas] == list(range(1, FILAS + 1))  # Sin la fila en blanco
+    assert filas[0]['dni'] == '76000001' and filas[0]['fecha_elaboracion'] == '2024-03-01'
+    assert {f['estado_duplicado'] for f in filas} == {'nuevo'}
+    with app.app_context():
+        assert db.session.get(Importacion, importacion_subida).total_filas == FILAS
+
+
+def test_paginar_la_vista_previa(cliente, importacion_subida):
+    pagina = cliente.get('/registrar_notificados', query_string={'import_id': importacion_subida, 'pagina': 3})
+    html = pagina.get_data(as_text=True)
+    assert pagina.status_code == 200
+    assert 'value="76000201"' in html and 'value="76000250"' in html
+    assert 'value="76000200"' not in html
+    # Una página fuera de rango muestra la última
+    html = cliente.get('/registrar_notificados', query_string={'import_id': importacion_subida, 'pagina': 99}
+                       ).get_data(as_text=True)
+    assert 'value="76000250"' in html
+
+
+def test_editar_una_fila_y_cambiar_de_pagina(app_bd, cliente, importacion_subida):
+    app, db = app_bd
+    fila = filas_staging(app, db, importacion_subida)[4]
+    formulario = {'accion': 'cambiar_pagina', 'fila_id[]': [str(fila['id'])],
+                  'nombres_apellidos[]': ['STAGING EDITADO'], 'dni[]': ['76000001'], 'idioma[]': ['Ingles'],
+                  'codigo_libro[]': ['ST-1'], 'fecha_elaboracion[]': ['2024-03-01'], 'modalidad[]': ['ESTUDIO']}
+    respuesta = cliente.post(f'/registrar_notificados?import_id={importacion_subida}&pagina=2', data=formulario)
+    assert respuesta.status_code == 302 and 'pagina=2' in respuesta.location
+
+    filas = filas_staging(app, db, importacion_subida)
+    editada = filas[4]
+    assert (editada['nombres_apellidos'], editada['dni'], editada['codigo_libro']) == \
+        ('STAGING EDITADO', '76000001', 'ST-1')
+    # Se vuelven a revisar los duplicados: ahora repite la clave de la fila 1
+    assert editada['estado_duplicado'] == 'duplicado'
+    assert filas[5]['nombres_apellidos'] == 'STAGING ALUMNO 6'
+    assert len(filas) == FILAS
+
+
+def test_no_edita_filas_de_otra_importacion(app_bd, cliente, importacion_subida):
+    app, db = app_bd
+    from app import Importacion, agregar_filas_importacion
+
+    with app.app_context():
+        ajena = Importacion(id='ajena' + '0' * 27, usuario_id=app.config['ID_USUARIO_PRUEBA'] + 1, total_filas=0)
+        db.session.add(ajena)
+        agregar_filas_importacion(ajena, [{'nombres_apellidos': 'AJENA', 'dni': '76999999'}])
+        db.session.commit()
+        ajena_id = ajena.id
+    fila_ajena = filas_staging(app, db, ajena_id)[0]
+    cliente.post(f'/registrar_notificados?import_id={importacion_subida}', data={
+        'accion': 'cambiar_pagina', 'fila_id[]': [str(fila_ajena['id'])], 'nombres_apellidos[]': ['INTRUSO'],
+        'dni[]': ['76999999']})
+    assert filas_staging(app, db, ajena_id)[0]['nombres_apellidos'] == 'AJENA'
+
+
+def test_importaciones_vencidas_se_limpian(app_bd):
+    app, db = app_bd
+    from app import HORAS_VIDA_IMPORTACION, FilaImportacion, Importacion, agregar_filas_importacion, crear_importacion
+
+    with app.app_context():
+        usuario = app.config['ID_USUARIO_PRUEBA']
+        vieja = crear_importacion('vieja.xlsx', usuario_id=usuario)
+        agregar_filas_importacion(vieja, [{'dni': '76888888'}, {'dni': '76888889'}])
+        db.session.execute(update(Importacion.__table__).where(Importacion.__table__.c.id == vieja.id)
+                           .values(creado=datetime.now() - timedelta(hours=HORAS_VIDA_IMPORTACION + 1)))
+        db.session.commit()
+        vieja_id = vieja.id
+
+        nueva = crear_importacion('nueva.xlsx', usuario_id=usuario)  # Cada importación nueva purga las vencidas
+        db.session.commit()
+        assert db.session.get(Importacion, vieja_id) is None
+        assert db.session.scalar(select(func.count()).select_from(FilaImportacion.__table__)
+                                 .where(FilaImportacion.__table__.c.importacion_id == vieja_id)) == 0
+        assert db.session.get(Importacion, nueva.id) is not None
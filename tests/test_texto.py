@@ -0,0 +1,116 @@
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, delete, func, insert, select, text, update
+
+from busqueda import MAX_POSICION_RELEVANCIA, codificar_posicion, pagina_notificados
+from texto import (coincide_texto, doblar, instalar_indice_texto, orden_relevancia, rellenar_texto_busqueda,
+                   texto_busqueda)
+
+
+def registro(nombre, dni, libro):
+    datos = {'nombres_apellidos': nombre, 'dni': dni, 'idioma': 'Ingles', 'codigo_libro': libro, 'modalidad': 'ESTUDIO'}
+    return dict(datos, texto_busqueda=texto_busqueda(datos))
+
+
+def encontrados(session, tabla, consulta):
+    # ids que devuelve la búsqueda por texto (en SQLite, a través de la tabla FTS5)
+    return {i for (i,) in session.execute(select(tabla.c.id).where(coincide_texto(tabla, doblar(consulta))))}
+
+
+def test_triggers_mantienen_el_indice_fts(app_bd):
+    app, db = app_bd
+    from app import Notificado
+
+    tabla = Notificado.__table__
+    with app.app_context():
+        id_ = db.session.execute(insert(tabla).values(**registro('Zoila Trigger Vásquez', '72000001', 'TRG-1'))
+                                 .returning(tabla.c.id)).scalar()
+        db.session.commit()
+        assert encontrados(db.session, tabla, 'zoila vasquez') == {id_}
+
+        nuevo = registro('Zoila Trigger Cárdenas', '72000001', 'TRG-1')
+        db.session.execute(update(tabla).where(tabla.c.id == id_).values(**nuevo))
+        db.session.commit()
+        assert encontrados(db.session, tabla, 'zoila vasquez') == set()
+        assert encontrados(db.session, tabla, 'zoila cardenas') == {id_}
+
+        db.session.execute(delete(tabla).where(tabla.c.id == id_))
+        db.session.commit()
+        assert encontrados(db.session, tabla, 'zoila cardenas') == set()
+
+
+def test_rellenar_texto_busqueda(app_bd):
+    app, db = app_bd
+    from app import Notificado
+
+    tabla = Notificado.__table__
+    with app.app_context():
+        datos = registro('Ñusta Relleno Pérez', '72000002', 'REL-2')
+        id_ = db.session.execute(insert(tabla).values(**dict(datos, texto_busqueda=None))
+                                 .returning(tabla.c.id)).scalar()
+        db.session.commit()
+        assert encontrados(db.session, tabla, 'nusta relleno') == set()
+
+        total = rellenar_texto_busqueda(db.session, tabla, tam_lote=500)
+        assert total == db.session.scalar(select(func.count()).select_from(tabla))
+        assert db.session.scalar(select(tabla.c.texto_busqueda).where(tabla.c.id == id_)) == \
+            'NUSTA RELLENO PEREZ 72000002 REL 2'
+        assert encontrados(db.session, tabla, 'nusta relleno') == {id_}
+
+
+def ordenados(session, tabla, consulta):
+    texto = doblar(consulta)
+    return [i for (i,) in session.execute(select(tabla.c.id).where(coincide_texto(tabla, texto))
+                                          .order_by(*orden_relevancia(tabla, texto)))]
+
+
+def test_orden_relevancia(app_bd):
+    app, db = app_bd
+    from app import Notificado
+
+    tabla = Notificado.__table__
+    filas = [registro('Rank Xab 123 2020', '72000010', 'XX-1'),        # coincide, pero dentro de una palabra
+             registro('Ab 123 2020 Rank', '72000011', 'XX-2'),         # el nombre empieza con la consulta
+             registro('Rank Otra', '72000012', 'AB-123/2020'),          # código exacto, con signos
+             registro('Rank Palabra Ab 123 2020', '72000013', 'XX-3')]  # una palabra empieza con la consulta
+    with app.app_context():
+        ids = [db.session.execute(insert(tabla).values(**f).returning(tabla.c.id)).scalar() for f in filas]
+        db.session.commit()
+        assert ordenados(db.session, tabla, 'ab-123/2020') == [ids[2], ids[1], ids[3], ids[0]]
+        assert ordenados(db.session, tabla, '72000011')[0] == ids[1]
+        db.session.execute(delete(tabla).where(tabla.c.id.in_(ids)))
+        db.session.commit()
+
+
+def test_busqueda_por_texto_con_tope_de_profundidad(app_bd):
+    app, db = app_bd
+    from app import Notificado
+
+    tabla = Notificado.__table__
+    with app.app_context():
+        ultima = codificar_posicion(MAX_POSICION_RELEVANCIA - 10)
+        _, siguiente = pagina_notificados(db.session, tabla, {'texto': '7'}, cursor=ultima, limite=10)
+        assert siguiente is None
+        with pytest.raises(ValueError):
+            pagina_notificados(db.session, tabla, {'texto': '7'}, cursor=codificar_posicion(MAX_POSICION_RELEVANCIA))
+
+
+def test_pg_trgm(motor_postgresql):
+    tabla = Table('prueba_texto', MetaData(), Column('id', Integer, primary_key=True),
+                  *(Column(c, String(255)) for c in ('nombres_apellidos', 'dni', 'idioma', 'codigo_libro',
+                                                     'correo_entrega', 'modalidad', 'texto_busqueda')))
+    tabla.drop(motor_postgresql, checkfirst=True)
+    tabla.create(motor_postgresql)
+    try:
+        instalar_indice_texto(motor_postgresql, tabla)
+        instalar_indice_texto(motor_postgresql, tabla)  # Idempotente
+        with motor_postgresql.begin() as conn:
+            indice = "SELECT count(*) FROM pg_indexes WHERE indexname = 'ix_prueba_texto_texto_trgm'"
+            assert conn.scalar(text(indice)) == 1
+            conn.execute(insert(tabla), [registro('Rank Otra', '72000012', 'AB-123/2020'),
+                                         registro('Ab 123 2020 Rank', '72000011', 'XX-2'),
+                                         registro('Sin Relacion', '72000099', 'ZZ-9')])
+            assert [f.codigo_libro for f in conn.execute(
+                select(tabla.c.codigo_libro).where(coincide_texto(tabla, doblar('ab-123/2020')))
+                .order_by(*orden_relevancia(tabla, doblar('ab-123/2020'))))] == ['AB-123/2020', 'XX-2']
+    finally:
+        tabla.drop(motor_postgresql)
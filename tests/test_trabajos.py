@@ -0,0 +1,127 @@
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, select, update
+
+from trabajos import FALLIDO, MENSAJE_ERROR_INTERNO, TERMINADO, crear_trabajo, purgar_trabajos_vencidos
+
+
+def trabajo_vencido(db, tabla):
+    trabajo_id = crear_trabajo(db.session, tabla, 1, 'exportacion', 'reporte.xlsx')
+    db.session.execute(update(tabla).where(tabla.c.id == trabajo_id)
+                       .values(estado=TERMINADO, creado=datetime.now() - timedelta(days=2)))
+    db.session.commit()
+    return trabajo_id
+
+
+def test_purgar_sin_carpeta_borra_las_filas(app_bd, tmp_path):
+    app, db = app_bd
+    from app import Trabajo
+
+    tabla = Trabajo.__table__
+    with app.app_context():
+        trabajo_id = trabajo_vencido(db, tabla)
+        purgar_trabajos_vencidos(db.session, tabla, str(tmp_path / 'no_existe'))
+        db.session.commit()
+        assert db.session.scalar(select(func.count()).where(tabla.c.id == trabajo_id)) == 0
+
+
+def test_exportacion_tras_perder_la_carpeta(app_bd, cliente, tmp_path):
+    # Render borra /tmp al reiniciar, pero las filas de trabajo siguen en la base
+    app, db = app_bd
+    from app import Trabajo
+
+    with app.app_context():
+        trabajo_vencido(db, Trabajo.__table__)
+    carpeta = app.config['TRABAJOS_DIR']
+    app.config['TRABAJOS_DIR'] = str(tmp_path / 'trabajos')
+    try:
+        respuesta = cliente.post('/api/trabajos/exportacion', data={'anio': '2024', 'formato': 'csv'})
+        assert respuesta.status_code == 202
+        assert esperar(cliente, respuesta.get_json()['url_estado'])['estado'] == TERMINADO
+    finally:
+        app.config['TRABAJOS_DIR'] = carpeta
+
+
+def esperar(cliente, url_estado):
+    for _ in range(50):
+        trabajo = cliente.get(url_estado).get_json()
+        if trabajo['estado'] not in ('pendiente', 'en_curso'):
+            return trabajo
+        time.sleep(0.1)
+    return trabajo
+
+
+def test_latido_mantiene_vivo_un_paso_largo(app_bd, monkeypatch):
+    # Un paso sin avance (guardar el libro, revisar duplicados) renueva igual 'actualizado'
+    app, db = app_bd
+    import trabajos
+    from app import Trabajo, ejecutor_trabajos
+
+    monkeypatch.setattr(trabajos, 'SEGUNDOS_LATIDO', 0.05)
+    tabla = Trabajo.__table__
+    with app.app_context():
+        trabajo_id = crear_trabajo(db.session, tabla, 1, 'exportacion', 'reporte.xlsx')
+        db.session.commit()
+        creado = db.session.scalar(select(tabla.c.actualizado).where(tabla.c.id == trabajo_id))
+    vistos = []
+
+    def paso_largo(avance):
+        time.sleep(0.3)
+        with app.app_context():
+            vistos.append(db.session.scalar(select(tabla.c.actualizado).where(tabla.c.id == trabajo_id)))
+        return 'listo'
+
+    ejecutor_trabajos.lanzar(trabajo_id, paso_largo).result()
+    assert vistos[0] > creado
+
+
+def test_consultar_avance_no_escribe(app_bd, cliente):
+    app, db = app_bd
+    from app import Trabajo
+
+    with app.app_context():
+        trabajo_id = crear_trabajo(db.session, Trabajo.__table__, app.config['ID_USUARIO_PRUEBA'], 'exportacion')
+        db.session.commit()
+    escrituras = []
+
+    def contar(conn, cursor, sentencia, *args):
+        if sentencia.lstrip().upper().startswith(('UPDATE', 'INSERT', 'DELETE')):
+            escrituras.append(sentencia)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', contar)
+    try:
+        assert cliente.get(f'/api/trabajos/{trabajo_id}').status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', contar)
+    assert escrituras == []
+
+
+def test_descarga_sin_archivo_vence_el_trabajo(app_bd, cliente):
+    app, db = app_bd
+    from app import Trabajo, ruta_trabajo
+
+    respuesta = cliente.post('/api/trabajos/exportacion', data={'anio': '2024', 'formato': 'csv'})
+    trabajo = esperar(cliente, respuesta.get_json()['url_estado'])
+    assert trabajo['estado'] == TERMINADO
+    with app.app_context():
+        resultado = db.session.scalar(select(Trabajo.__table__.c.resultado)
+                                      .where(Trabajo.__table__.c.id == trabajo['id']))
+    os.remove(ruta_trabajo(resultado))
+    assert cliente.get(trabajo['url_resultado']).status_code == 302
+    assert cliente.get(trabajo['url_estado']).get_json()['estado'] == 'fallido'
+
+
+def test_importar_un_archivo_que_no_es_excel(app_bd, cliente):
+    # Un zip dañado (BadZipFile) no es ValueError: sin traducirlo la página mostraría el error genérico
+    respuesta = cliente.post('/api/trabajos/importacion', content_type='multipart/form-data',
+                             data={'file': (io.BytesIO(b'DNI;NOMBRES\n12345678;ANA\n'), 'padron.xlsx')})
+    assert respuesta.status_code == 202
+    trabajo = esperar(cliente, respuesta.get_json()['url_estado'])
+    assert trabajo['estado'] == FALLIDO
+    assert trabajo['mensaje'] != MENSAJE_ERROR_INTERNO
+    assert 'padron.xlsx' in trabajo['mensaje']
@@ -0,0 +1,170 @@
+"""Búsqueda de texto libre sobre notificado (nombre, DNI, código de libro y correo).
+
+Cada registro guarda en ``texto_busqueda`` esos cuatro campos doblados igual que las
+cabeceras del Excel (``normalize_header``: mayúsculas, sin tildes ni signos), y la consulta
+se dobla de la misma forma, así "José Peña" encuentra "JOSE PENA". Cada palabra de la
+consulta debe aparecer como subcadena (también como prefijo) del texto.
+
+El índice depende del motor:
+- SQLite: tabla virtual FTS5 ``notificado_fts`` con el tokenizador ``trigram`` sobre
+  ``texto_busqueda`` (contenido externo, sincronizada con triggers). Las palabras de
+  menos de 3 letras no tienen trigramas y se comparan con LIKE sobre las candidatas.
+- PostgreSQL: índice GIN ``gin_trgm_ops`` de pg_trgm, que acelera ``LIKE '%...%'``.
+
+El orden por relevancia pone primero el DNI o el código de libro exactos, luego los
+nombres que empiezan con la consulta, luego los que tienen una palabra que empieza con
+ella y al final el resto, con los nombres más cortos (más parecidos) antes. El código de
+libro se compara compacto (en mayúsculas y sin signos ni espacios) de ambos lados, así
+"ab-123/2020" (doblado "AB 123 2020") encuentra "AB-123/2020".
+"""
+import re
+
+from sqlalchemy import and_, bindparam, case, column, func, literal_column, select, table, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+
+from importacion import normalize_header
+
+CAMPOS_TEXTO = ('nombres_apellidos', 'dni', 'codigo_libro', 'correo_entrega')
+TABLA_FTS = 'notificado_fts'
+MIN_TRIGRAMA = 3  # FTS5 trigram no indexa palabras más cortas
+MAX_PALABRAS = 8
+TAM_LOTE = 5000
+_SEPARADORES = re.compile(r'[\s,;]+')
+# Lo que normalize_header convierte en espacio, más el espacio mismo: se quita al compactar
+_SIGNOS_CODIGO = ('.', '°', '-', '_', '/', '\\', '(', ')', ':', ' ')
+
+
+def doblar(texto):
+    # Mismo doblado que las cabeceras del Excel; None y '' quedan como ''
+    return normalize_header(texto) if texto else ''
+
+
+def palabras_busqueda(texto):
+    # Palabras de una consulta ya doblada, sin repetir y en su orden
+    palabras = []
+    for palabra in _SEPARADORES.split(texto):
+        if palabra and palabra not in palabras:
+            palabras.append(palabra)
+    return palabras[:MAX_PALABRAS]
+
+
+def texto_busqueda(registro):
+    # Valor de la columna texto_busqueda para un dict (o fila) de notificado
+    obtener = registro.get if isinstance(registro, dict) else lambda c: getattr(registro, c)
+    return ' '.join(filter(None, (doblar(obtener(c)) for c in CAMPOS_TEXTO)))
+
+
+class CoincideTexto(ColumnElement):
+    # Predicado "todas las palabras aparecen en texto_busqueda"; se compila según el motor.
+    # Sin tipo Boolean: en SQLite SQLAlchemy le agregaría "= 1" y el planificador dejaría el índice.
+    inherit_cache = False
+
+    def __init__(self, tabla, palabras):
+        self.tabla = tabla
+        self.palabras = palabras
+
+
+def _como_subcadena(tabla, palabras):
+    return and_(*(tabla.c.texto_busqueda.contains(p, autoescape=True) for p in palabras))
+
+
+@compiles(CoincideTexto)
+def _compilar_generico(elemento, compilador, **kw):
+    return compilador.process(_como_subcadena(elemento.tabla, elemento.palabras), **kw)
+
+
+@compiles(CoincideTexto, 'sqlite')
+def _compilar_sqlite(elemento, compilador, **kw):
+    largas = [p for p in elemento.palabras if len(p) >= MIN_TRIGRAMA]
+    cortas = [p for p in elemento.palabras if len(p) < MIN_TRIGRAMA]
+    condiciones = []
+    if largas:
+        # Cada palabra como frase entre comillas: con trigram una frase es una subcadena
+        consulta = ' '.join('"' + p.replace('"', '""') + '"' for p in largas)
+        fts = table(TABLA_FTS, column('rowid'))
+        condiciones.append(elemento.tabla.c.id.in_(
+            select(fts.c.rowid).where(literal_column(TABLA_FTS).op('MATCH')(
+                bindparam('consulta_fts', consulta, unique=True)))))
+    if cortas:
+        condiciones.append(_como_subcadena(elemento.tabla, cortas))
+    return compilador.process(and_(*condiciones), **kw)
+
+
+def coincide_texto(tabla, texto):
+    # texto ya doblado (filtros['texto']); None si no tiene palabras
+    palabras = palabras_busqueda(texto)
+    return CoincideTexto(tabla, palabras) if palabras else None
+
+
+def _codigo_compacto(columna):
+    # upper(codigo_libro) sin signos ni espacios; solo en ORDER BY sobre las filas ya filtradas
+    compacto = func.upper(columna)
+    for signo in _SIGNOS_CODIGO:
+        compacto = func.replace(compacto, signo, '')
+    return compacto
+
+
+def orden_relevancia(tabla, texto):
+    # Expresiones para ORDER BY: categoría de coincidencia, largo del nombre e id
+    primera = (palabras_busqueda(texto) or [''])[0]
+    categoria = case(
+        (tabla.c.dni == texto, 0),
+        (_codigo_compacto(tabla.c.codigo_libro) == texto.replace(' ', ''), 0),
+        (tabla.c.texto_busqueda.startswith(texto, autoescape=True), 1),
+        (tabla.c.texto_busqueda.contains(' ' + primera, autoescape=True), 2),
+        else_=3)
+    return [categoria, func.length(tabla.c.nombres_apellidos), tabla.c.id.desc()]
+
+
+def rellenar_texto_busqueda(session, tabla, tam_lote=TAM_LOTE):
+    # Calcula texto_busqueda de los registros existentes por rangos de id; devuelve cuántos
+    columnas = [tabla.c.id] + [tabla.c[c] for c in CAMPOS_TEXTO]
+    sentencia = tabla.update().where(tabla.c.id == bindparam('id_registro'))
+    ultimo, total = 0, 0
+    while True:
+        lote = session.execute(select(*columnas).where(tabla.c.id > ultimo)
+                               .order_by(tabla.c.id).limit(tam_lote)).all()
+        if not lote:
+            return total
+        session.execute(sentencia, [{'id_registro': f.id, 'texto_busqueda': texto_busqueda(f._mapping)}
+                                    for f in lote])
+        session.commit()
+        ultimo = lote[-1].id
+        total += len(lote)
+
+
+def instalar_indice_texto(engine, tabla):
+    # Crea el índice de texto si falta (idempotente); en SQLite también los triggers
+    with engine.begin() as conn:
+        if engine.dialect.name == 'sqlite':
+            nueva = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"), {'n': TABLA_FTS}).first() is None
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5("
+                f"texto_busqueda, content='{tabla.name}', content_rowid='id', tokenize='trigram')"))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON {tabla.name} BEGIN "
+                f"INSERT INTO {TABLA_FTS} (rowid, texto_busqueda) VALUES (new.id, new.texto_busqueda); END"))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON {tabla.name} BEGIN "
+                f"INSERT INTO {TABLA_FTS} ({TABLA_FTS}, rowid, texto_busqueda) "
+                f"VALUES ('delete', old.id, old.texto_busqueda); END"))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF texto_busqueda ON {tabla.name} BEGIN "
+                f"INSERT INTO {TABLA_FTS} ({TABLA_FTS}, rowid, texto_busqueda) "
+                f"VALUES ('delete', old.id, old.texto_busqueda); "
+                f"INSERT INTO {TABLA_FTS} (rowid, texto_busqueda) VALUES (new.id, new.texto_busqueda); END"))
+            if nueva:
+                # Indexa lo que ya estaba en la tabla
+                conn.execute(text(f"INSERT INTO {TABLA_FTS} ({TABLA_FTS}) VALUES ('rebuild')"))
+        elif engine.dialect.name == 'postgresql':
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{tabla.name}_texto_trgm "
+                              f"ON {tabla.name} USING gin (texto_busqueda gin_trgm_ops)"))
+
+
+def eliminar_indice_texto(engine):
+    # Antes de recrear notificado: la tabla FTS de contenido externo no se borra con ella
+    if engine.dialect.name == 'sqlite':
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {TABLA_FTS}"))
@@ -0,0 +1,170 @@
+"""Trabajos en segundo plano para las importaciones y exportaciones grandes.
+
+La petición solo guarda la entrada, crea la fila en la tabla ``trabajo`` y devuelve su
+ID; el trabajo corre en un pool de hilos del mismo proceso (sin broker externo) y va
+guardando su avance en la tabla, así cualquier worker de gunicorn puede contestar el
+estado. Mientras el trabajo corre, un latido renueva ``actualizado`` cada minuto aunque
+no haya avance (guardar el libro de Excel, revisar duplicados); un trabajo activo sin
+latido (p. ej. porque el worker se reinició) se marca como fallido al lanzar otro trabajo
+o al consultarlo.
+"""
+import os
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select, update
+
+# Lo que ve el usuario cuando un trabajo falla por algo que no es un error de validación
+MENSAJE_ERROR_INTERNO = 'El trabajo falló por un error interno; los detalles quedaron en el registro del servidor.'
+
+PENDIENTE, EN_CURSO, TERMINADO, FALLIDO = 'pendiente', 'en_curso', 'terminado', 'fallido'
+ACTIVOS = (PENDIENTE, EN_CURSO)
+MINUTOS_SIN_AVANCE = 15
+SEGUNDOS_ENTRE_AVANCES = 1
+SEGUNDOS_LATIDO = 60
+HORAS_VIDA_TRABAJO = 24
+
+
+def crear_trabajo(session, tabla, usuario_id, tipo, nombre_archivo=None):
+    trabajo_id = uuid.uuid4().hex
+    ahora = datetime.now()
+    session.execute(insert(tabla).values(id=trabajo_id, usuario_id=usuario_id, tipo=tipo, estado=PENDIENTE,
+                                         progreso=0, nombre_archivo=nombre_archivo,
+                                         creado=ahora, actualizado=ahora))
+    return trabajo_id
+
+
+def actualizar_trabajo(session, tabla, trabajo_id, **valores):
+    session.execute(update(tabla).where(tabla.c.id == trabajo_id)
+                    .values(actualizado=datetime.now(), **valores))
+
+
+def obtener_trabajo(session, tabla, trabajo_id, usuario_id):
+    # Solo el usuario que lo lanzó puede ver su trabajo o descargar el resultado
+    if not trabajo_id:
+        return None
+    fila = session.execute(select(tabla).where(tabla.c.id == trabajo_id, tabla.c.usuario_id == usuario_id)).first()
+    return dict(fila._mapping) if fila else None
+
+
+def abandonado(trabajo):
+    # Activo y sin latido reciente: se puede decidir sin escribir en la base
+    return (trabajo['estado'] in ACTIVOS and
+            trabajo['actualizado'] < datetime.now() - timedelta(minutes=MINUTOS_SIN_AVANCE))
+
+
+def marcar_abandonados(session, tabla):
+    # Trabajos activos sin latido reciente: el hilo que los corría ya no existe
+    limite = datetime.now() - timedelta(minutes=MINUTOS_SIN_AVANCE)
+    resultado = session.execute(update(tabla).where(tabla.c.estado.in_(ACTIVOS), tabla.c.actualizado < limite)
+                                .values(estado=FALLIDO, actualizado=datetime.now(),
+                                        mensaje='El trabajo se interrumpió (reinicio del servidor). Vuelva a lanzarlo.'))
+    return resultado.rowcount
+
+
+def purgar_trabajos_vencidos(session, tabla, directorio):
+    # Borra los trabajos viejos y sus archivos (entrada subida y resultado generado). La carpeta
+    # puede no existir o haber perdido archivos (p. ej. /tmp tras un reinicio): las filas se borran igual
+    limite = datetime.now() - timedelta(hours=HORAS_VIDA_TRABAJO)
+    vencidos = {f.id for f in session.execute(select(tabla.c.id).where(tabla.c.creado < limite,
+                                                                         tabla.c.estado.not_in(ACTIVOS)))}
+    if not vencidos:
+        return
+    nombres = os.listdir(directorio) if os.path.isdir(directorio) else []
+    for nombre in nombres:
+        # Los archivos de un trabajo empiezan con su ID (uuid4().hex, 32 caracteres)
+        if nombre[:32] in vencidos:
+            try:
+                os.remove(os.path.join(directorio, nombre))
+            except FileNotFoundError:
+                pass
+    session.execute(tabla.delete().where(tabla.c.id.in_(list(vencidos))))
+
+
+def mensaje_error(error):
+    # Solo los ValueError (validaciones, Excel ilegible) llegan tal cual a la página; los demás,
+    # p. ej. los de la base de datos, incluyen la sentencia y sus parámetros (DNIs, nombres)
+    if isinstance(error, ValueError):
+        return str(error)[:500]
+    return MENSAJE_ERROR_INTERNO
+
+
+def porcentaje(trabajo):
+    if trabajo['estado'] == TERMINADO:
+        return 100
+    if not trabajo['total']:
+        return None
+    return min(99, int(trabajo['progreso'] * 100 / trabajo['total']))
+
+
+class EjecutorTrabajos:
+    # Pool de hilos que corre cada trabajo dentro de un contexto de la app. La función del
+    # trabajo recibe avance(progreso, total=None) y devuelve el resultado (ID de importación
+    # o nombre del archivo). avance hace commit: llamarlo entre bloques, sin cursores abiertos.
+
+    def __init__(self, app, db, tabla, max_hilos=2):
+        self.app = app
+        self.db = db
+        self.tabla = tabla
+        self.max_hilos = max_hilos
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _obtener_pool(self):
+        # Se crea al primer uso: con gunicorn cada worker (proceso) tiene su propio pool
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_hilos, thread_name_prefix='trabajo')
+            return self._pool
+
+    def lanzar(self, trabajo_id, funcion, *args):
+        return self._obtener_pool().submit(self._ejecutar, trabajo_id, funcion, args)
+
+    def _latido(self, engine, trabajo_id, detener):
+        # Conexión propia: la sesión del trabajo puede estar en medio de una transacción larga
+        while not detener.wait(SEGUNDOS_LATIDO):
+            try:
+                with engine.begin() as conn:
+                    conn.execute(update(self.tabla).where(self.tabla.c.id == trabajo_id,
+                                                          self.tabla.c.estado == EN_CURSO)
+                                 .values(actualizado=datetime.now()))
+            except Exception:
+                # Base ocupada (p. ej. SQLite bloqueado por el propio trabajo): se reintenta en el próximo latido
+                traceback.print_exc()
+
+    def _ejecutar(self, trabajo_id, funcion, args):
+        with self.app.app_context():
+            session = self.db.session
+            estado = {'progreso': 0, 'total': None, 'guardado': datetime.min}
+            detener = threading.Event()
+            threading.Thread(target=self._latido, args=(self.db.engine, trabajo_id, detener), daemon=True,
+                             name=f'latido-{trabajo_id[:8]}').start()
+
+            def avance(progreso, total=None):
+                estado['progreso'] = progreso
+                if total is not None:
+                    estado['total'] = total
+                ahora = datetime.now()
+                if (ahora - estado['guardado']).total_seconds() < SEGUNDOS_ENTRE_AVANCES:
+                    return
+                estado['guardado'] = ahora
+                actualizar_trabajo(session, self.tabla, trabajo_id, progreso=progreso, total=estado['total'])
+                session.commit()
+
+            try:
+                actualizar_trabajo(session, self.tabla, trabajo_id, estado=EN_CURSO)
+                session.commit()
+                resultado = funcion(avance, *args)
+                actualizar_trabajo(session, self.tabla, trabajo_id, estado=TERMINADO, resultado=resultado,
+                                   progreso=estado['progreso'], total=estado['total'])
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                traceback.print_exc()
+                actualizar_trabajo(session, self.tabla, trabajo_id, estado=FALLIDO, mensaje=mensaje_error(e))
+                session.commit()
+            finally:
+                detener.set()